@@ -0,0 +1,549 @@
+"""Бенчмарки рушія бази даних.
+
+    python bench.py NAME [SIZES...]
+    python bench.py suite [SIZES...] [--json results.json] [--compare baseline.json] [--threshold 0.2]
+
+Набір suite вимірює основні операції при 10k/100k/1M рядків (за замовчуванням),
+може записати результати у JSON і порівняти їх з попереднім запуском: метрика,
+що погіршилась більше ніж на поріг, вважається регресією (код виходу 1).
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from task import CHAR, DATE, DATE_INTERVAL, INT, REAL, STRING, Database, DateInterval, Table, column_type
+
+
+# Схема, що містить усі типи даних, з якими працює таблиця
+BENCH_SCHEMA = [("id", int), ("score", float), ("name", str), ("dob", date), ("period", DateInterval),
+                ("grade", CHAR)]
+BASE_DATE = date(2000, 1, 1)
+
+
+def _random_interval(rng, i, count):
+    start = BASE_DATE + timedelta(days=rng.randrange(9000))
+    return DateInterval(start, start + timedelta(days=rng.randrange(30)))
+
+
+# Генератори значень для кожного типу колонки: generator(rng, номер рядка, кількість рядків)
+GENERATORS = {
+    INT: lambda rng, i, count: i,
+    REAL: lambda rng, i, count: rng.random() * 100,
+    CHAR: lambda rng, i, count: rng.choice("ABCDEF"),
+    STRING: lambda rng, i, count: f"name{rng.randrange(count)}",
+    DATE: lambda rng, i, count: BASE_DATE + timedelta(days=rng.randrange(9000)),
+    DATE_INTERVAL: _random_interval,
+}
+
+
+def generate_rows(count, seed=0, schema=BENCH_SCHEMA):
+    """Генерує випадкові рядки для схеми (за замовчуванням BENCH_SCHEMA)"""
+    rng = random.Random(seed)
+    generators = [GENERATORS[column_type(field_type)] for _, field_type in schema]
+    return [[generate(rng, i, count) for generate in generators] for i in range(count)]
+
+
+def make_table(name, rows, storage="rows"):
+    table = Table(name, BENCH_SCHEMA, storage)
+    table.rows.extend(rows)
+    return table
+
+
+def save_pickle(database, filename, compression=None):
+    """Знімок у форматі pickle попередніх версій (для порівняння; читається з convert=False)"""
+    with open(filename, "wb") as f:
+        pickle.dump(database, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def save(database, filename, format, compression=None):
+    """Зберігає знімок у поточному (binary) або попередньому (pickle) форматі"""
+    (save_pickle if format == "pickle" else Database.save_to_disk)(database, filename, compression)
+
+
+def load(filename, **options):
+    """Повністю завантажує базу: відкриття і декодування всіх таблиць"""
+    database = Database.load_from_disk(filename, convert=False, **options)
+    for table_name in database.tables:
+        database.tables[table_name]
+    return database
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_set_operations(sizes):
+    """Вимірює час множинних операцій; час на рядок має лишатися сталим"""
+    for size in sizes:
+        rows = generate_rows(size)
+        left = make_table("left", rows)
+        # Половина рядків спільна, половина — нова
+        right = make_table("right", rows[size // 2:] + generate_rows(size // 2, seed=1))
+        for operation in ("difference", "union", "intersection"):
+            for bag in (False, True):
+                seconds, result = timed(getattr(left, operation), right, bag)
+                label = operation + ("(bag)" if bag else "")
+                print(f"{label:<20} n={size:>9,} {seconds:8.3f}s "
+                      f"{seconds / size * 1e6:7.2f} us/row  -> {len(result):,} rows")
+
+
+def bench_cache(sizes, changes=10):
+    """Порівнює повторну різницю таблиць: без кешу, перше обчислення в кеші, влучання та
+    інкрементне оновлення після кількох змін рядків"""
+    from cache import ResultCache
+
+    for size in sizes:
+        rows = generate_rows(size)
+        for bag in (False, True):
+            left = make_table("left", rows)
+            right = make_table("right", rows[size // 4:] + generate_rows(size // 20, seed=1))
+            cache = ResultCache(max_bytes=2 ** 40)
+            plain_seconds, _ = timed(left.difference, right, bag)
+            miss_seconds, _ = timed(cache.difference, left, right, bag)
+            hit_seconds, _ = timed(cache.difference, left, right, bag)
+            for i in range(changes):
+                left.edit_row(i * 7, rows[-i - 1])
+                right.delete_row(i)
+            update_seconds, result = timed(cache.difference, left, right, bag)
+            assert result == left.difference(right, bag)
+            label = "difference" + ("(bag)" if bag else "")
+            print(f"{label:<16} n={size:>9,} plain {plain_seconds:7.3f}s  miss {miss_seconds:7.3f}s  "
+                  f"hit {hit_seconds * 1e3:7.2f} ms  update({2 * changes}) {update_seconds * 1e3:7.2f} ms  "
+                  f"entry {cache.size / 2 ** 20:6.1f}MB")
+
+
+def bench_storage(sizes):
+    """Порівнює пам'ять і швидкість заповнення рядкового та колонкового сховищ"""
+    for size in sizes:
+        rows = generate_rows(size)
+        for storage in ("rows", "columnar"):
+            seconds, table = timed(make_table, "bench", rows, storage)
+            usage = table.memory_usage()
+            columns = ", ".join(f"{name}={nbytes / 2 ** 20:.1f}MB" for name, nbytes in usage.items())
+            print(f"{storage:<9} n={size:>9,} fill {seconds:6.3f}s "
+                  f"total {sum(usage.values()) / 2 ** 20:8.1f}MB  [{columns}]")
+
+
+def bench_intervals(sizes, queries=1000):
+    """Порівнює запити на перетин інтервалів з індексом і без нього"""
+    rng = random.Random(2)
+    base = date(2000, 1, 1)
+    for size in sizes:
+        table = Table("bookings", [("id", int), ("period", DateInterval)])
+        for i in range(size):
+            start = base + timedelta(days=rng.randrange(9000))
+            table.rows.append([i, DateInterval(start, start + timedelta(days=rng.randrange(30)))])
+        build_seconds, _ = timed(table.create_index, "period", "interval")
+
+        windows = []
+        for _ in range(queries):
+            start = base + timedelta(days=rng.randrange(9000))
+            windows.append((start, start + timedelta(days=rng.randrange(14))))
+
+        # Та сама таблиця без індексу — для порівняння з повним переглядом
+        plain = Table("plain", table.schema)
+        plain.rows = table.rows
+
+        start_time = time.perf_counter()
+        found = sum(len(table.overlaps("period", lo, hi)) for lo, hi in windows)
+        indexed = (time.perf_counter() - start_time) / queries
+        # Повний перегляд дуже повільний, тому вимірюємо його лише на кількох запитах
+        scanned, _ = timed(lambda: [plain.overlaps("period", lo, hi) for lo, hi in windows[:3]])
+        print(f"intervals n={size:>9,} build {build_seconds:6.2f}s  overlaps: index {indexed * 1e6:9.1f} us/query "
+              f"(avg {found / queries:.1f} hits), scan {scanned / 3 * 1e6:11.1f} us/query")
+
+
+def bench_wal(sizes, edits=100):
+    """Порівнює час збереження однієї зміни: повний знімок проти журналу WAL"""
+    directory = tempfile.mkdtemp()
+    for size in sizes:
+        database = Database("bench")
+        database.create_table("bench", BENCH_SCHEMA)
+        table = database.tables["bench"]
+        table.rows.extend(generate_rows(size))
+
+        snapshot = os.path.join(directory, "snapshot.db")
+        start_time = time.perf_counter()
+        for _ in range(edits):
+            table.delete_row(len(table.rows) - 1)
+            database.save_to_disk(snapshot)
+        full = (time.perf_counter() - start_time) / edits
+
+        database.enable_wal(os.path.join(directory, "wal.db"), group_commit=1)
+        start_time = time.perf_counter()
+        for _ in range(edits):
+            table.delete_row(len(table.rows) - 1)
+            database.save_to_disk(os.path.join(directory, "wal.db"))
+        logged = (time.perf_counter() - start_time) / edits
+        database.disable_wal()
+        print(f"save n={size:>9,} full snapshot {full * 1e3:9.2f} ms/change, wal {logged * 1e3:7.3f} ms/change")
+
+
+def bench_open(sizes):
+    """Порівнює час відкриття бази: pickle попередніх версій проти бінарного формату з лінивим читанням"""
+    directory = tempfile.mkdtemp()
+    for size in sizes:
+        database = Database("bench")
+        database.create_table("bench", BENCH_SCHEMA)
+        database.tables["bench"].rows.extend(generate_rows(size))
+        for format in ("pickle", "binary"):
+            filename = os.path.join(directory, f"bench.{format}")
+            save_seconds, _ = timed(save, database, filename, format)
+            open_seconds, loaded = timed(lambda: Database.load_from_disk(filename, convert=False))
+            access_seconds, _ = timed(loaded.tables.__getitem__, "bench")
+            print(f"{format:<7} n={size:>9,} {os.path.getsize(filename) / 2 ** 20:8.1f}MB save {save_seconds:6.2f}s "
+                  f"open {open_seconds * 1e3:9.2f}ms first access {access_seconds:6.2f}s")
+
+
+def bench_snapshot(sizes, workers=4):
+    """Порівнює розмір і час повного збереження та завантаження знімка: pickle проти
+    бінарного формату з кодуванням колонок (без стиснення, zlib, lzma, паралельне декодування)"""
+    directory = tempfile.mkdtemp()
+    variants = [("pickle", "pickle", None, None), ("binary", "binary", None, None),
+                ("zlib", "binary", "zlib", None), ("lzma", "binary", "lzma", None),
+                (f"zlib/{workers}p", "binary", "zlib", workers)]
+    for size in sizes:
+        database = Database("bench")
+        database.create_table("bench", BENCH_SCHEMA)
+        database.tables["bench"].rows.extend(generate_rows(size))
+        pickle_size = None
+        for name, format, compression, decode_workers in variants:
+            filename = os.path.join(directory, f"bench.{name.replace('/', '_')}")
+            save_seconds, _ = timed(save, database, filename, format, compression)
+            load_seconds, _ = timed(lambda: load(filename, decode_workers=decode_workers))
+            file_size = os.path.getsize(filename)
+            pickle_size = pickle_size or file_size
+            print(f"{name:<8} n={size:>9,} {file_size / 2 ** 20:8.1f}MB ({file_size / pickle_size:5.1%} of pickle) "
+                  f"save {save_seconds:6.2f}s load {load_seconds:6.2f}s")
+
+
+def bench_records(sizes):
+    """Порівнює кодування записів журналу WAL (JSON) з pickle попередніх версій"""
+    from wal import _typed_rows, decode_record, encode_record
+
+    column_types = make_table("bench", []).column_types
+    for size in sizes:
+        events = [("bench", row, i) for i, row in enumerate(generate_rows(size))]
+        encode_seconds, records = timed(lambda: [encode_record("add_row", args) for args in events])
+        # Відтворення ще відновлює типи значень за схемою таблиці
+        decode_seconds, _ = timed(lambda: [_typed_rows(column_types, [decode_record(record[8:])[1][1]])
+                                           for record in records])
+        pickle_encode, pickled = timed(lambda: [pickle.dumps(("add_row", args[:2]), pickle.HIGHEST_PROTOCOL)
+                                                for args in events])
+        pickle_decode, _ = timed(lambda: [pickle.loads(data) for data in pickled])
+        print(f"records n={size:>9,} json encode {encode_seconds / size * 1e6:6.2f} us decode "
+              f"{decode_seconds / size * 1e6:6.2f} us {sum(map(len, records)) / size:6.1f} B/record | pickle encode "
+              f"{pickle_encode / size * 1e6:6.2f} us decode {pickle_decode / size * 1e6:6.2f} us "
+              f"{sum(map(len, pickled)) / size:6.1f} B/record")
+
+
+def bench_bulk(sizes):
+    """Вимірює швидкість потокового експорту та масового завантаження CSV і JSON-lines"""
+    directory = tempfile.mkdtemp()
+    for size in sizes:
+        source = make_table("source", generate_rows(size))
+        for file_format in ("csv", "jsonl"):
+            filename = os.path.join(directory, "bench." + file_format)
+            export_seconds, _ = timed(source.export, filename, file_format)
+            target = Table("target", BENCH_SCHEMA)
+            load_seconds, report = timed(target.bulk_load, filename, file_format)
+            print(f"{file_format:<5} n={size:>9,} export {size / export_seconds:10,.0f} rows/s  "
+                  f"load {size / load_seconds:10,.0f} rows/s  (loaded {report.loaded:,}, rejected {report.rejected:,})")
+
+
+async def _load_test(label, client, size, clients, batch_rows=100):
+    """Навантаження на сервер із clients одночасних задач; друкує операції за секунду та затримки"""
+    table = f"load{size}"
+    rng = random.Random(3)
+    rows = [[i, f"name{i}", (BASE_DATE + timedelta(days=i % 9000)).isoformat()] for i in range(size)]
+
+    async def run(name, requests, rows_per_request=1):
+        latencies = []
+
+        async def worker(calls):
+            for call in calls:
+                start = time.perf_counter()
+                await call()
+                latencies.append(time.perf_counter() - start)
+
+        seconds, _ = await _timed_async(asyncio.gather(*(worker(requests[i::clients]) for i in range(clients))))
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"{label:<5} {name:<9} n={len(requests):>9,} {len(requests) / seconds:10,.0f} ops/s "
+              f"{len(requests) * rows_per_request / seconds:10,.0f} rows/s  p50 {quantiles[49] * 1e3:7.2f} ms  "
+              f"p99 {quantiles[98] * 1e3:7.2f} ms")
+
+    async with client:
+        await client.create_table(table, [["id", "int"], ["name", "string"], ["dob", "date"]])
+        await client.create_index(table, "id")
+        await run("add_row", [lambda row=row: client.add_row(table, row) for row in rows])
+        await run("get_row", [lambda: client.get_row(table, rng.randrange(size)) for _ in range(size)])
+        await run("lookup", [lambda: client.query(table, where=[["id", "==", rng.randrange(size)]])
+                             for _ in range(size)])
+        batches = [rows[start:start + batch_rows] for start in range(0, size, batch_rows)]
+        await run("add_rows", [lambda batch=batch: client.add_rows(table, batch) for batch in batches], batch_rows)
+        seconds, count = await _timed_async(_count_rows(client.iter_query(table)))
+        print(f"{label:<5} {'stream':<9} n={count:>9,} {count / seconds:10,.0f} rows/s")
+
+
+async def _timed_async(awaitable):
+    start = time.perf_counter()
+    result = await awaitable
+    return time.perf_counter() - start, result
+
+
+async def _count_rows(rows):
+    count = 0
+    async for _ in rows:
+        count += 1
+    return count
+
+
+def bench_server(sizes, clients=32, pool_size=4):
+    """Навантажувальний тест сервера на localhost (TCP та Unix-сокет): add_row, get_row,
+    запит за індексом, пачки add_rows і потокове читання всієї таблиці"""
+    from client import Client
+
+    for transport in ("tcp", "unix"):
+        with tempfile.TemporaryDirectory() as directory:
+            command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+                       os.path.join(directory, "bench.db"), "--port", "0"]
+            if transport == "unix":
+                command += ["--unix", os.path.join(directory, "bench.sock")]
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+            try:
+                address = process.stdout.readline().split()[-1]  # "Listening on ADDRESS"
+                if transport == "unix":
+                    options = {"path": address}
+                else:
+                    options = {"port": int(address.rsplit(":", 1)[1])}
+                for size in sizes:
+                    asyncio.run(_load_test(transport, Client(pool_size=pool_size, **options), size, clients))
+            finally:
+                process.terminate()
+                process.wait()
+
+
+def legacy_validate_row(schema, row_data):
+    """Перевірка рядка у вигляді до компіляції схем (для порівняння)"""
+    if len(row_data) != len(schema):
+        raise Exception("Row length does not match table schema.")
+    for (field_name, field_type), value in zip(schema, row_data):
+        if field_type == str and len(value) > 1:
+            raise Exception(f"Invalid type for field '{field_name}'. Expected char, got string with length > 1.")
+        if not isinstance(value, field_type) and not (
+                field_type == DateInterval and isinstance(value, DateInterval)):
+            raise Exception(
+                f"Invalid type for field '{field_name}'. Expected {field_type.__name__}, got {type(value).__name__}.")
+
+
+def bench_validation(sizes):
+    """Порівнює швидкість перевірки рядків до і після компіляції схеми"""
+    schema = [("id", int), ("score", float), ("initial", str), ("dob", date), ("period", DateInterval)]
+    for size in sizes:
+        # Односимвольні рядки, щоб стара перевірка (char для str) їх приймала
+        rows = [row[:2] + [row[2][0]] + row[3:5] for row in generate_rows(size)]
+        table = Table("bench", schema)
+
+        legacy, _ = timed(lambda: [legacy_validate_row(schema, row) for row in rows])
+        compiled, _ = timed(lambda: [table.validate_row(row) for row in rows])
+        batch, _ = timed(table.validate_rows, rows)
+        print(f"validate n={size:>9,} legacy {size / legacy:12,.0f} rows/s  compiled {size / compiled:12,.0f} rows/s  "
+              f"batch {size / batch:12,.0f} rows/s")
+
+
+def bench_import(sizes):
+    """Вимірює час імпорту ядра та інтерфейсу командного рядка в новому процесі (sizes — кількість запусків)"""
+    code = "import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)"
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for runs in sizes:
+        for modules in ("task", "task, cli"):
+            times = [float(subprocess.run([sys.executable, "-c", code.format(modules)], cwd=directory, check=True,
+                                          capture_output=True, text=True).stdout) for _ in range(runs)]
+            print(f"import {modules:<10} runs={runs:>4} median {statistics.median(times) * 1000:7.1f} ms  "
+                  f"max {max(times) * 1000:7.1f} ms")
+
+
+# Набір вимірювань з результатами у JSON
+
+def _record(results, name, size, value, unit, higher_is_better=False):
+    results[f"{name}/{size}"] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_of(func, *args, repeats=3):
+    """Найменший час із кількох запусків (для операцій, які можна повторювати)"""
+    return min(timed(func, *args)[0] for _ in range(repeats))
+
+
+def _peak_memory(func, *args):
+    """Пікове виділення пам'яті (у байтах) під час виклику func"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _indexed_database(rows):
+    database = Database("bench")
+    database.create_table("bench", BENCH_SCHEMA)
+    table = database.tables["bench"]
+    table.rows.extend(rows)
+    table.create_index("id")
+    table.create_index("dob", kind="sorted")
+    table.create_index("period", kind="interval")
+    return database
+
+
+def bench_suite(sizes, operations=1000, deletes=None, queries=200, verbose=True):
+    """Вимірює вставку, редагування, видалення, різницю, збереження і завантаження, пам'ять та запити;
+    повертає словник метрик 'назва/кількість рядків' -> значення з одиницями.
+    Видаляється deletes випадкових рядків за ідентифікатором (за замовчуванням десята частина таблиці)."""
+    from query import Query
+
+    results = {}
+    directory = tempfile.mkdtemp()
+    rng = random.Random(3)
+    for size in sizes:
+        rows = generate_rows(size)
+
+        database = Database("bench")
+        database.create_table("bench", BENCH_SCHEMA)
+        table = database.tables["bench"]
+        seconds, _ = timed(lambda: [table.add_row(row) for row in rows])
+        _record(results, "add_row", size, size / seconds, "rows/s", higher_is_better=True)
+
+        database = _indexed_database(rows)
+        table = database.tables["bench"]
+        replacements = generate_rows(operations, seed=4)
+        positions = [rng.randrange(size) for _ in range(operations)]
+        seconds = best_of(lambda: [table.edit_row(position, row) for position, row in zip(positions, replacements)])
+        _record(results, "edit_row", size, seconds / operations * 1e6, "us/op")
+        row_ids = rng.sample(table.row_ids(), deletes or size // 10)
+        seconds, _ = timed(lambda: [table.delete_row(row_id, by_id=True) for row_id in row_ids])
+        _record(results, "delete_row", size, seconds / len(row_ids) * 1e6, "us/op")
+
+        left = make_table("left", rows)
+        right = make_table("right", rows[size // 2:] + generate_rows(size // 2, seed=1))
+        seconds = best_of(left.difference, right)
+        _record(results, "difference", size, seconds, "s")
+
+        database = _indexed_database(rows)
+        for format in ("pickle", "binary"):
+            filename = os.path.join(directory, f"bench.{format}")
+            seconds = best_of(save, database, filename, format)
+            _record(results, f"save_{format}", size, seconds, "s")
+            seconds = best_of(load, filename)
+            _record(results, f"load_{format}", size, seconds, "s")
+            _record(results, f"peak_memory_load_{format}", size, _peak_memory(load, filename) / 2 ** 20, "MB")
+        _record(results, "file_size_binary", size, os.path.getsize(filename) / 2 ** 20, "MB")
+
+        table = database.tables["bench"]
+        days = [BASE_DATE + timedelta(days=rng.randrange(9000)) for _ in range(queries)]
+        query_kinds = {
+            "query_lookup": (lambda i: table.query().where("id", "==", rng.randrange(size)), queries),
+            "query_range": (lambda i: table.query().where("dob", "between", (days[i], days[i] + timedelta(days=3))),
+                            queries),
+            "query_overlaps": (lambda i: table.query().where("period", "overlaps", (days[i], days[i])), queries),
+            "query_scan": (lambda i: table.query().where("score", ">", 99.9), max(1, queries // 50)),
+            "query_group": (lambda i: table.query().group_by("grade").agg(n="count", avg=("avg", "score")),
+                            max(1, queries // 50)),
+        }
+        for name, (build, count) in query_kinds.items():
+            queries_built = [build(i) for i in range(count)]
+            seconds = best_of(lambda: [Query.all(query) for query in queries_built])
+            _record(results, name, size, seconds / count * 1e3, "ms/query")
+
+        if verbose:
+            for key, metric in results.items():
+                if key.endswith(f"/{size}"):
+                    print(f"{key:<32} {metric['value']:14,.3f} {metric['unit']}")
+    return results
+
+
+def write_results(results, filename):
+    document = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """Порівнює метрики з базовими; повертає список регресій (назва, було, стало, зміна)"""
+    regressions = []
+    for name, metric in current.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], metric["value"]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if metric["higher_is_better"] else change
+        if worse > threshold:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+BENCHMARKS = {
+    "setops": bench_set_operations,
+    "cache": bench_cache,
+    "storage": bench_storage,
+    "intervals": bench_intervals,
+    "wal": bench_wal,
+    "open": bench_open,
+    "snapshot": bench_snapshot,
+    "records": bench_records,
+    "bulk": bench_bulk,
+    "validate": bench_validation,
+    "import": bench_import,
+    "server": bench_server,
+    "suite": bench_suite,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.py", description="Storage engine benchmarks.")
+    parser.add_argument("benchmark", nargs="?", default="setops", choices=BENCHMARKS)
+    parser.add_argument("sizes", nargs="*", type=int)
+    parser.add_argument("--json", metavar="FILE", help="write suite results to a JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare suite results with a JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before a regression")
+    args = parser.parse_args(argv)
+
+    if args.benchmark != "suite":
+        BENCHMARKS[args.benchmark](args.sizes or [10_000, 50_000, 200_000])
+        return 0
+    results = bench_suite(args.sizes or [10_000, 100_000, 1_000_000])
+    if args.json:
+        write_results(results, args.json)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(baseline, results, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name:<32} {old:14,.3f} -> {new:14,.3f} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
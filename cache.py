@@ -0,0 +1,320 @@
+"""Кеш результатів повторюваних запитів і множинних операцій над таблицями.
+
+Результат зберігається за ключем (операція, версії таблиць, параметри). Кожна зміна
+рядків дає таблиці нову версію (Table.version), тож після змін старий результат
+просто не знаходиться, а найдавніше використані результати витісняються, коли кеш
+перевищує max_bytes або max_entries. Результат difference при цьому не
+перераховується заново: якщо з моменту обчислення змінилось небагато рядків, він
+оновлюється за журналом змін таблиць (Table.changes_since).
+
+Кеш не бачить змін в обхід методів таблиці (наприклад, table.rows[i] = ...), а умови
+where з функціями мають бути чистими: у ключ входить сам об'єкт функції.
+"""
+import sys
+import threading
+from bisect import insort
+from collections import Counter, OrderedDict
+from itertools import chain, islice
+
+
+def _rows_size(rows):
+    """Приблизний розмір списку рядків (за першим рядком; спільні з таблицею рядки теж рахуються)"""
+    size = sys.getsizeof(rows)
+    if rows:
+        size += len(rows) * sys.getsizeof(rows[0])
+    return size
+
+
+def _freeze(value):
+    """Хешоване подання параметрів запиту"""
+    if isinstance(value, (list, tuple)):
+        return tuple(map(_freeze, value))
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(_freeze, value))
+    return value
+
+
+def _query_key(query):
+    """Таблиці запиту (разом із приєднаними) та його кроки у хешованому вигляді"""
+    tables, steps = [query.table], []
+    for step in query.steps:
+        if step[0] == "join":
+            other_tables, other_steps = _query_key(step[1])
+            tables += other_tables
+            step = ("join", other_steps) + step[2:]
+        steps.append(_freeze(step))
+    return tables, tuple(steps)
+
+
+class _Entry:
+    """Закешований результат і його приблизний розмір у байтах"""
+    family = None  # Ключ без версій для результатів, що оновлюються інкрементно
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.size = _rows_size(rows)
+
+
+class _Difference(_Entry):
+    """Результат difference разом зі станом для інкрементного оновлення.
+
+    own — ідентифікатори рядків першої таблиці за ключем рядка (число або
+    зростаючий список), other — кратність ключів другої таблиці, result — рядки
+    результату за ідентифікатором. Рядки з ключем k потрапляють у результат, якщо
+    k немає в другій таблиці, а з bag — усі, крім перших other[k].
+    """
+
+    def __init__(self, table, other_table, bag):
+        self.bag = bag
+        self.own = own = {}
+        self.other = other = Counter(map(tuple, other_table.iter_rows()))
+        self.result = result = {}
+        remaining = other.copy() if bag else other
+        for row_id, row in table._items():
+            key = tuple(row)
+            ids = own.get(key)
+            if ids is None:
+                own[key] = row_id
+            elif type(ids) is int:
+                own[key] = [ids, row_id]
+            else:
+                ids.append(row_id)
+            if key in remaining:
+                if bag:
+                    remaining[key] -= 1
+                    if not remaining[key]:
+                        del remaining[key]
+            else:
+                result[row_id] = row
+        self._finish()
+
+    def _finish(self):
+        # Ідентифікатори зростають у порядку позицій рядків, тож результат упорядковано за ними
+        result = self.result
+        self.rows = [result[row_id] for row_id in sorted(result)]
+        self.size = (_rows_size(self.rows) + sys.getsizeof(result) + sys.getsizeof(self.own)
+                     + sys.getsizeof(self.other))
+        if self.own:
+            key = next(iter(self.own))
+            self.size += (len(self.own) + len(self.other)) * sys.getsizeof(key)
+
+    def _included(self, key):
+        """Ідентифікатори рядків із ключем key, що входять у результат"""
+        ids = self.own.get(key)
+        if ids is None:
+            return ()
+        if type(ids) is int:
+            ids = (ids,)
+        count = self.other.get(key, 0)
+        if not count:
+            return ids
+        return ids[count:] if self.bag else ()
+
+    def update(self, table, changes, other_changes):
+        """Застосовує зміни обох таблиць (див. Table.changes_since) до результату"""
+        removed, added = changes
+        other_removed, other_added = other_changes
+        keys = {tuple(row) for row_changes in (removed, added, other_removed, other_added) for _, row in row_changes}
+        result, own, other = self.result, self.own, self.other
+        for key in keys:
+            for row_id in self._included(key):
+                del result[row_id]
+        for row_id, row in removed:
+            key = tuple(row)
+            ids = own[key]
+            if type(ids) is int:
+                del own[key]
+            else:
+                ids.remove(row_id)
+                if len(ids) == 1:
+                    own[key] = ids[0]
+        for row_id, row in added:
+            key = tuple(row)
+            ids = own.get(key)
+            if ids is None:
+                own[key] = row_id
+            else:
+                if type(ids) is int:
+                    ids = own[key] = [ids]
+                insort(ids, row_id)
+        for _, row in other_removed:
+            key = tuple(row)
+            other[key] -= 1
+            if not other[key]:
+                del other[key]
+        for _, row in other_added:
+            other[tuple(row)] += 1
+        for key in keys:
+            for row_id in self._included(key):
+                result[row_id] = table.get_row(row_id)
+        self._finish()
+
+
+class ResultCache:
+    """LRU-кеш результатів, обмежений за пам'яттю та кількістю записів"""
+
+    # Частка змінених рядків, до якої difference оновлюється, а не обчислюється заново
+    update_ratio = 0.25
+
+    def __init__(self, max_bytes=64 * 2 ** 20, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # Ключ -> _Entry, від найдавніше використаного
+        self.latest = {}  # (операція, імена таблиць, параметри) -> ключ останнього результату difference
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.evictions = 0
+
+    def _hit(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def _store(self, key, entry, tables, versions):
+        # Таблиця могла змінитись під час обчислення — тоді результат не відповідає ключу
+        if tuple(table.version for table in tables) != versions or entry.size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = entry
+            self.size += entry.size
+            if entry.family is not None:
+                self.latest[entry.family] = key
+            while self.size > self.max_bytes or len(self.entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        key, entry = self.entries.popitem(last=False)
+        self.size -= entry.size
+        self.evictions += 1
+        if entry.family is not None and self.latest.get(entry.family) == key:
+            del self.latest[entry.family]
+
+    def get(self, operation, tables, params, compute):
+        """Повертає список рядків compute() — з кешу, якщо таблиці з того часу не змінювались"""
+        versions = tuple(table.version for table in tables)
+        key = (operation, versions, params)
+        with self.lock:
+            entry = self._hit(key)
+            if entry is None:
+                self.misses += 1
+        if entry is None:
+            entry = _Entry(list(compute()))
+            self._store(key, entry, tables, versions)
+        return list(entry.rows)
+
+    def stream(self, operation, tables, params, compute, limit):
+        """Ітератор рядків compute() для передачі частинами.
+
+        Закешований результат віддається без копіювання (рядки записів кешу не
+        змінюються на місці), інакше результат обчислюється ліниво. У кеш потрапляє
+        лише результат, не довший за limit рядків: довший цілком у пам'яті не тримається.
+        """
+        versions = tuple(table.version for table in tables)
+        key = (operation, versions, params)
+        with self.lock:
+            entry = self._hit(key)
+            if entry is None:
+                self.misses += 1
+        if entry is not None:
+            return iter(entry.rows)
+        rows = iter(compute())
+        head = list(islice(rows, limit + 1))
+        if len(head) > limit:
+            return chain(head, rows)
+        self._store(key, _Entry(head), tables, versions)
+        return iter(head)
+
+    def difference(self, table, other_table, bag=False):
+        """Table.difference з кешу; після невеликих змін таблиць результат оновлюється інкрементно"""
+        table._check_same_schema(other_table, "difference")
+        table.track_changes()
+        other_table.track_changes()
+        tables = (table, other_table)
+        versions = (table.version, other_table.version)
+        key = ("difference", versions, bag)
+        family = ("difference", table.name, other_table.name, bag)
+        with self.lock:
+            entry = self._hit(key)
+            if entry is not None:
+                return list(entry.rows)
+            stale = self.entries.pop(self.latest.pop(family, None), None)
+            if stale is not None:
+                self.size -= stale.size
+        entry = None
+        if stale is not None:
+            changes = table.changes_since(stale.versions[0])
+            other_changes = other_table.changes_since(stale.versions[1])
+            if changes is not None and other_changes is not None:
+                changed = sum(map(len, changes + other_changes))
+                if changed <= (len(stale.own) + len(stale.other)) * self.update_ratio:
+                    try:
+                        stale.update(table, changes, other_changes)
+                        entry = stale
+                    except (KeyError, ValueError):
+                        pass  # Рядки змінено в обхід таблиці — результат обчислюється заново
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.updates += 1
+        if entry is None:
+            entry = _Difference(table, other_table, bag)
+        entry.versions = versions
+        entry.family = family
+        self._store(key, entry, tables, versions)
+        return list(entry.rows)
+
+    def union(self, table, other_table, bag=False):
+        """Table.union з кешу"""
+        return self.get("union", (table, other_table), bag, lambda: table.iter_union(other_table, bag))
+
+    def intersection(self, table, other_table, bag=False):
+        """Table.intersection з кешу"""
+        return self.get("intersection", (table, other_table), bag,
+                        lambda: table.iter_intersection(other_table, bag))
+
+    def query(self, query):
+        """Рядки запиту query.Query з кешу; запити з нехешованими параметрами виконуються напряму"""
+        tables, steps = _query_key(query)
+        try:
+            hash(steps)
+        except TypeError:
+            return query.all()
+        return self.get("query", tables, steps, query.all)
+
+    def stream_query(self, query, limit):
+        """Ітератор рядків запиту query.Query (див. stream)"""
+        tables, steps = _query_key(query)
+        try:
+            hash(steps)
+        except TypeError:
+            return iter(query)
+        return self.stream("query", tables, steps, lambda: query, limit)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.latest.clear()
+            self.size = 0
+
+    def stats(self):
+        """Кількість і розмір записів та лічильники звернень"""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "updates": self.updates,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,258 @@
+"""Командний рядок для роботи з базою без графічного інтерфейсу.
+
+    python cli.py create-table DB TABLE id:int name:string [--storage columnar]
+    python cli.py import DB TABLE FILE [--format csv|jsonl|json] [--no-header]
+    python cli.py export DB TABLE [FILE] [--format csv|jsonl] [--no-header]
+    python cli.py query DB TABLE [--where "колонка оператор значення"]... [--select a,b]
+                                 [--order-by a,b] [--desc] [--limit N] [--explain]
+    python cli.py diff DB TABLE OTHER [--bag]
+    python cli.py compact DB [--compression zlib|lzma]
+    python cli.py stats DB [--json]
+
+Параметр --profile FILE (перед командою) вмикає профілювання і записує лічильники
+операцій у FILE: текст Prometheus для .prom/.txt, інакше JSON.
+
+Кожна команда, що змінює базу, записує новий знімок файлу DB у бінарному форматі
+і видаляє вже врахований журнал змін.
+"""
+import argparse
+import json
+import os
+import sys
+
+from errors import DatabaseError, SchemaError, TableError
+from task import DATE_INTERVAL, Database, column_type, format_value, parse_date
+
+
+def _file_format(filename, format):
+    return format or os.path.splitext(filename)[1].lstrip(".").lower() or "csv"
+
+
+def load_database(filename, create=False):
+    """Відкриває базу з файлу (разом із журналом змін) або створює нову"""
+    if os.path.exists(filename):
+        return Database.load_from_disk(filename)
+    if create:
+        return Database(os.path.splitext(os.path.basename(filename))[0])
+    raise DatabaseError(f"Database file '{filename}' does not exist.")
+
+
+def store_database(database, filename, compression=None):
+    """Записує повний знімок бази; журнал змін після цього більше не потрібен"""
+    database.write_snapshot(filename, compression)
+    if os.path.exists(filename + ".wal"):
+        os.remove(filename + ".wal")
+
+
+def get_table(database, table_name):
+    if table_name not in database.tables:
+        raise TableError(f"Table '{table_name}' does not exist.")
+    return database.tables[table_name]
+
+
+def parse_schema(specs):
+    """Розбирає опис колонок 'ім'я:тип'"""
+    schema = []
+    for spec in specs:
+        field_name, separator, type_name = spec.partition(":")
+        if not separator or not field_name:
+            raise SchemaError(f"Invalid column '{spec}', expected 'name:type'.")
+        schema.append((field_name, column_type(type_name)))
+    return schema
+
+
+def parse_condition(table, text):
+    """Розбирає умову 'колонка оператор значення' у аргументи Query.where"""
+    parts = text.split(None, 2)
+    if len(parts) != 3:
+        raise SchemaError(f"Invalid condition '{text}', expected 'column operator value'.")
+    column, op, raw = parts
+    field_type = table.column_types[table._field_position(column)]
+    if op == "in":
+        value = [field_type.parse(item.strip()) for item in raw.split(",")]
+    elif op == "between":
+        value = tuple(field_type.parse(item.strip()) for item in raw.split(",", 1))
+    elif field_type is DATE_INTERVAL and op in ("overlaps", "within"):
+        value = tuple(parse_date(item.strip()) for item in raw.split(",", 1))
+    elif field_type is DATE_INTERVAL and op == "contains":
+        value = parse_date(raw)
+    else:
+        value = field_type.parse(raw)
+    return column, op, value
+
+
+def write_rows(columns, rows, out):
+    import csv
+
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([format_value(value) for value in row])
+        count += 1
+    return count
+
+
+# Команди
+
+def create_table(args):
+    database = load_database(args.database, create=True)
+    database.create_table(args.table, parse_schema(args.columns), args.storage)
+    store_database(database, args.database)
+    print(f"Created table '{args.table}'.")
+    return 0
+
+
+def import_rows(args):
+    database = load_database(args.database)
+    table = get_table(database, args.table)
+    report = table.bulk_load(args.file, format=_file_format(args.file, args.format), header=not args.no_header,
+                             source_table=args.json_table)
+    store_database(database, args.database)
+    print(f"Loaded {report.loaded} rows, rejected {report.rejected}.")
+    for number, message in report.errors:
+        print(f"line {number}: {message}", file=sys.stderr)
+    return 1 if report.rejected else 0
+
+
+def export_rows(args):
+    table = get_table(load_database(args.database), args.table)
+    if args.file in (None, "-"):
+        table.export(sys.stdout, format=args.format or "csv", header=not args.no_header)
+    else:
+        count = table.export(args.file, format=_file_format(args.file, args.format), header=not args.no_header)
+        print(f"Exported {count} rows to '{args.file}'.")
+    return 0
+
+
+def query_rows(args):
+    table = get_table(load_database(args.database), args.table)
+    query = table.query()
+    for condition in args.where:
+        query = query.where(*parse_condition(table, condition))
+    if args.select:
+        query = query.select(*args.select.split(","))
+    if args.order_by:
+        query = query.order_by(*args.order_by.split(","), descending=args.desc)
+    if args.limit is not None:
+        query = query.limit(args.limit)
+    if args.explain:
+        print(query.explain())
+        return 0
+    write_rows(query.columns, query, sys.stdout)
+    return 0
+
+
+def diff_tables(args):
+    database = load_database(args.database)
+    table = get_table(database, args.table)
+    rows = table.iter_difference(get_table(database, args.other), bag=args.bag)
+    write_rows([field_name for field_name, _ in table.schema], rows, sys.stdout)
+    return 0
+
+
+def compact(args):
+    size = os.path.getsize(args.database)
+    if os.path.exists(args.database + ".wal"):
+        size += os.path.getsize(args.database + ".wal")
+    database = load_database(args.database)
+    store_database(database, args.database, args.compression)
+    print(f"Compacted '{args.database}': {size} -> {os.path.getsize(args.database)} bytes.")
+    return 0
+
+
+def stats(args):
+    database = load_database(args.database)
+    if args.json:
+        print(json.dumps(database.stats(), indent=2, default=str))
+        return 0
+    print(f"database {database.name}: {len(database.tables)} tables")
+    for table_name in database.tables:
+        table = database.tables[table_name]
+        indexes = ",".join(f"{column}:{index.kind}" for column, index in table.indexes.items()) or "-"
+        memory = sum(table.memory_usage().values())
+        print(f"{table_name}\trows={len(table.rows)}\tstorage={table.storage}\tindexes={indexes}\tmemory={memory}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Database command line interface.")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="instrument operations and write their stats to FILE (.prom for Prometheus, else JSON)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("create-table", help="create a table (and the database file if needed)")
+    command.add_argument("database")
+    command.add_argument("table")
+    command.add_argument("columns", nargs="+", metavar="name:type")
+    command.add_argument("--storage", default="rows", choices=["rows", "columnar"])
+    command.set_defaults(func=create_table)
+
+    command = commands.add_parser("import", help="bulk load rows from CSV, JSON-lines or JSON")
+    command.add_argument("database")
+    command.add_argument("table")
+    command.add_argument("file")
+    command.add_argument("--format", choices=["csv", "jsonl", "json"])
+    command.add_argument("--no-header", action="store_true")
+    command.add_argument("--json-table", metavar="NAME",
+                         help="table to read from a database.json-style file (default: same name or the only one)")
+    command.set_defaults(func=import_rows)
+
+    command = commands.add_parser("export", help="export rows to CSV or JSON-lines (stdout by default)")
+    command.add_argument("database")
+    command.add_argument("table")
+    command.add_argument("file", nargs="?")
+    command.add_argument("--format", choices=["csv", "jsonl"])
+    command.add_argument("--no-header", action="store_true")
+    command.set_defaults(func=export_rows)
+
+    command = commands.add_parser("query", help="filter, project and sort rows")
+    command.add_argument("database")
+    command.add_argument("table")
+    command.add_argument("--where", action="append", default=[], metavar="CONDITION")
+    command.add_argument("--select", metavar="COLUMNS")
+    command.add_argument("--order-by", metavar="COLUMNS")
+    command.add_argument("--desc", action="store_true")
+    command.add_argument("--limit", type=int)
+    command.add_argument("--explain", action="store_true", help="print the plan instead of rows")
+    command.set_defaults(func=query_rows)
+
+    command = commands.add_parser("diff", help="rows of TABLE that are not in OTHER")
+    command.add_argument("database")
+    command.add_argument("table")
+    command.add_argument("other")
+    command.add_argument("--bag", action="store_true", help="keep duplicate rows")
+    command.set_defaults(func=diff_tables)
+
+    command = commands.add_parser("compact", help="fold the change log into a new snapshot")
+    command.add_argument("database")
+    command.add_argument("--compression", choices=["zlib", "lzma"], help="compress blocks of the snapshot")
+    command.set_defaults(func=compact)
+
+    command = commands.add_parser("stats", help="print table sizes, storage and indexes")
+    command.add_argument("database")
+    command.add_argument("--json", action="store_true", help="print database stats and operation counters as JSON")
+    command.set_defaults(func=stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        import metrics
+
+        metrics.registry.reset()
+        metrics.enable()
+    try:
+        return args.func(args)
+    except DatabaseError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.profile:
+            metrics.dump(metrics.summary(), args.profile)
+            metrics.disable()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
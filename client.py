@@ -0,0 +1,270 @@
+"""Клієнт мережевого сервера бази (див. server) з пулом з'єднань.
+
+    async with Client(port=7400) as client:  # або Client(path="db.sock")
+        row_id = await client.add_row("users", [1, "Ann", "1990-05-15"])
+        async for row in client.iter_query("users", where=[["id", ">", 0]]):
+            ...
+
+Запити надсилаються конвеєром: кілька задач можуть одночасно чекати відповідей
+з одного з'єднання. Пул відкриває нове з'єднання (до pool_size), лише коли всі
+наявні зайняті. Результати запитів читаються частинами; поки споживач не забрав
+stream_buffer частин, з'єднання не читає далі, і сервер призупиняє передачу.
+Помилки сервера піднімаються як винятки з модуля errors того ж типу.
+"""
+import asyncio
+import itertools
+
+import errors
+from errors import DatabaseError, ProtocolError
+from server import DEFAULT_PORT, MAX_MESSAGE, decode_message, encode_message
+
+
+_DISCARD = object()  # Частини результату, від якого споживач відмовився
+
+
+def _raise_error(error):
+    kind = getattr(errors, error.get("type", ""), None)
+    if not (isinstance(kind, type) and issubclass(kind, DatabaseError)):
+        kind = DatabaseError
+    raise kind(error.get("message", ""))
+
+
+class Connection:
+    """Одне з'єднання з сервером; відповіді розбирає окрема задача читання"""
+
+    def __init__(self, reader, writer, stream_buffer=16):
+        self.reader = reader
+        self.writer = writer
+        self.stream_buffer = stream_buffer
+        self.pending = {}  # Ідентифікатор запиту -> Future або черга частин результату
+        self.closed = False
+        self._ids = itertools.count()
+        self._reading = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def open(cls, host="127.0.0.1", port=DEFAULT_PORT, path=None, stream_buffer=16):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_MESSAGE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_MESSAGE)
+        return cls(reader, writer, stream_buffer)
+
+    @property
+    def in_flight(self):
+        """Кількість запитів, що чекають на відповідь"""
+        return len(self.pending)
+
+    async def _read_responses(self):
+        error = ProtocolError("Connection closed by the server.")
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = decode_message(line)
+                target = self.pending.get(message.get("id"))
+                if target is _DISCARD:
+                    if not message.get("more"):
+                        del self.pending[message["id"]]
+                    continue
+                if target is None:
+                    if "error" in message:
+                        # Сервер не зміг розібрати запит — далі відповіді не зіставити
+                        error = ProtocolError(message["error"].get("message", ""))
+                        break
+                    continue
+                if isinstance(target, asyncio.Queue):
+                    if not message.get("more"):
+                        del self.pending[message["id"]]
+                    # Повна черга зупиняє читання з'єднання — це і є зворотний тиск
+                    await target.put(message)
+                else:
+                    del self.pending[message["id"]]
+                    if not target.done():
+                        target.set_result(message)
+        except (ConnectionError, ValueError, ProtocolError) as e:
+            error = ProtocolError(f"Connection lost. {e}")
+        finally:
+            self.closed = True
+            for target in self.pending.values():
+                if isinstance(target, asyncio.Queue):
+                    while target.full():
+                        target.get_nowait()  # Результат однаково обірвано помилкою
+                    target.put_nowait({"error": {"type": "ProtocolError", "message": str(error)}})
+                elif isinstance(target, asyncio.Future) and not target.done():
+                    target.set_exception(error)
+            self.pending.clear()
+
+    async def _send(self, op, params, target):
+        if self.closed:
+            raise ProtocolError("Connection is closed.")
+        request_id = next(self._ids)
+        self.pending[request_id] = target
+        self.writer.write(encode_message({"id": request_id, "op": op, **params}))
+        await self.writer.drain()
+        return request_id
+
+    async def request(self, op, **params):
+        """Виконує запит і повертає його результат"""
+        future = asyncio.get_running_loop().create_future()
+        await self._send(op, params, future)
+        response = await future
+        if "error" in response:
+            _raise_error(response["error"])
+        return response.get("result")
+
+    async def stream(self, op, **params):
+        """Генерує рядки результату, отримуючи його частинами"""
+        queue = asyncio.Queue(self.stream_buffer)
+        request_id = await self._send(op, params, queue)
+        try:
+            while True:
+                message = await queue.get()
+                if "error" in message:
+                    _raise_error(message["error"])
+                for row in message["rows"]:
+                    yield row
+                if not message.get("more"):
+                    return
+        finally:
+            if self.pending.get(request_id) is queue:
+                # Решту результату відкидаємо, щоб не зупиняти читання з'єднання
+                self.pending[request_id] = _DISCARD
+                while not queue.empty():
+                    queue.get_nowait()
+
+    async def close(self):
+        self.closed = True
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._reading.cancel()
+        try:
+            await self._reading
+        except asyncio.CancelledError:
+            pass
+
+
+class Client:
+    """Пул з'єднань із сервером і методи для операцій протоколу"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, path=None, pool_size=4, stream_buffer=16):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.pool_size = pool_size
+        self.stream_buffer = stream_buffer
+        self.connections = []
+        self._opening = None  # Lock, створюється в циклі подій клієнта
+
+    async def __aenter__(self):
+        await self.connection()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def connection(self):
+        """Найменш зайняте з'єднання; нове відкривається, якщо всі зайняті і пул не повний"""
+        self.connections = [connection for connection in self.connections if not connection.closed]
+        idle = min(self.connections, key=lambda connection: connection.in_flight, default=None)
+        if idle is not None and (idle.in_flight == 0 or len(self.connections) >= self.pool_size):
+            return idle
+        if self._opening is None:
+            self._opening = asyncio.Lock()
+        async with self._opening:
+            if len(self.connections) < self.pool_size:
+                connection = await Connection.open(self.host, self.port, self.path, self.stream_buffer)
+                self.connections.append(connection)
+                return connection
+        return min(self.connections, key=lambda connection: connection.in_flight)
+
+    async def request(self, op, **params):
+        return await (await self.connection()).request(op, **params)
+
+    async def stream(self, op, **params):
+        rows = (await self.connection()).stream(op, **params)
+        try:
+            async for row in rows:
+                yield row
+        finally:
+            await rows.aclose()
+
+    async def close(self):
+        connections, self.connections = self.connections, []
+        for connection in connections:
+            await connection.close()
+
+    # Операції
+
+    async def ping(self):
+        return await self.request("ping")
+
+    async def tables(self):
+        return await self.request("tables")
+
+    async def schema(self, table):
+        return await self.request("schema", table=table)
+
+    async def stats(self):
+        return await self.request("stats")
+
+    async def create_table(self, table, columns, storage="rows"):
+        """columns — пари [ім'я, тип], наприклад [["id", "int"], ["dob", "date"]]"""
+        await self.request("create_table", table=table, columns=columns, storage=storage)
+
+    async def drop_table(self, table):
+        await self.request("drop_table", table=table)
+
+    async def create_index(self, table, column, kind="hash"):
+        await self.request("create_index", table=table, column=column, kind=kind)
+
+    async def add_row(self, table, row):
+        """Додає рядок; повертає його ідентифікатор"""
+        return await self.request("add_row", table=table, row=row)
+
+    async def add_rows(self, table, rows):
+        """Додає пачку рядків (усі або жоден); повертає їхні ідентифікатори"""
+        return await self.request("add_rows", table=table, rows=rows)
+
+    async def get_row(self, table, row_id):
+        return await self.request("get_row", table=table, row_id=row_id)
+
+    async def edit_row(self, table, row_id, row):
+        """Замінює рядок за ідентифікатором; повертає старі дані"""
+        return await self.request("edit_row", table=table, row_id=row_id, row=row)
+
+    async def delete_row(self, table, row_id):
+        return await self.request("delete_row", table=table, row_id=row_id)
+
+    def iter_query(self, table, where=(), select=None, order_by=None, descending=False, limit=None):
+        """Рядки запиту: where — умови [колонка, оператор, значення] (див. query.Query)"""
+        return self.stream("query", table=table, where=list(where), select=select, order_by=order_by,
+                           descending=descending, limit=limit)
+
+    async def query(self, table, **options):
+        return [row async for row in self.iter_query(table, **options)]
+
+    def iter_difference(self, table, other, bag=False):
+        return self.stream("difference", table=table, other=other, bag=bag)
+
+    async def difference(self, table, other, bag=False):
+        return [row async for row in self.iter_difference(table, other, bag)]
+
+    async def union(self, table, other, bag=False):
+        return [row async for row in self.stream("union", table=table, other=other, bag=bag)]
+
+    async def intersection(self, table, other, bag=False):
+        return [row async for row in self.stream("intersection", table=table, other=other, bag=bag)]
+
+    async def undo(self):
+        await self.request("undo")
+
+    async def redo(self):
+        await self.request("redo")
+
+    async def save(self):
+        """Зберігає базу у файл сервера (у режимі WAL — синхронізує журнал)"""
+        await self.request("save")
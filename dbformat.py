@@ -0,0 +1,690 @@
+"""Бінарний сегментований формат файлу бази даних.
+
+Структура файлу:
+    заголовок   — сигнатура, версія формату, зсув і довжина каталогу, CRC32 каталогу;
+    блоки       — кожна колонка кожної таблиці розбита на блоки по block_rows рядків;
+    каталог     — JSON з описом таблиць (схема, кількість рядків, індекси, блоки)
+                  і поколінням знімка для журналу WAL.
+
+Кодування обирається для кожної колонки, а для цілих чисел — для кожного блоку:
+рядки (string, char) кодуються словником, цілі числа, дати та кінці інтервалів —
+різницями з попереднім значенням або відступами від мінімуму блоку, упакованими
+в найменшу достатню ширину (1, 2, 4 або 8 байтів). Блок може бути додатково
+стиснутий zlib або lzma і має власну контрольну суму CRC32, тож блоки декодуються
+незалежно (за потреби — паралельно в пулі процесів).
+
+Файл відкривається через mmap: при відкритті читаються лише заголовок і каталог,
+а таблиця декодується під час першого звернення до неї. Каталог старішої версії
+формату спершу оновлюється міграціями MIGRATIONS; файли версії 1 (по одному
+нестиснутому сегменту на колонку) читаються так само.
+
+Читання не виконує коду з файлу: типи колонок задаються тегами схеми. Файли
+попередніх версій програми (pickle об'єкта Database) читаються обмеженим
+розпакувальником, що дозволяє лише класи бази та вбудовані типи даних, а файли
+у форматі database.json імпортуються як таблиці.
+"""
+import gc
+import io
+import json
+import lzma
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from itertools import accumulate, chain, repeat
+from operator import add, sub
+
+from errors import StorageError, ValidationError
+from task import (CHAR, COLUMN_CLASSES, COLUMN_TYPES, DATE, DATE_INTERVAL, STRING, ColumnStore, Database,
+                  DateIntervalColumn, INDEX_KINDS, StringColumn, Table, column_type)
+
+MAGIC = b"ITLABDB\x00"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sHHQII")  # сигнатура, версія, резерв, зсув каталогу, довжина каталогу, CRC32 каталогу
+STRING_HEADER = struct.Struct("<II")  # Версія 1: кількість рядків у словнику, довжина блоку UTF-8
+BLOCK_ROWS = 65536
+DELTA_SAMPLE = 1024  # Скільки значень блоку перевіряється, перш ніж рахувати різниці
+
+# Стиснення блоків: назва -> (стиснути, розпакувати)
+COMPRESSORS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+# Коди типів масивів за шириною в байтах
+SIGNED_TYPECODES = {array(typecode).itemsize: typecode for typecode in "lbhiq"}
+UNSIGNED_TYPECODES = {array(typecode).itemsize: typecode for typecode in "LBHIQ"}
+BLOCK_TYPECODES = {*SIGNED_TYPECODES.values(), *UNSIGNED_TYPECODES.values(), "d"}
+
+# Що дозволено створювати під час читання старих файлів pickle: (модуль, ім'я)
+LEGACY_GLOBALS = {
+    *(("builtins", name) for name in ("int", "float", "str", "bytes", "bytearray", "list", "tuple", "dict", "set",
+                                      "frozenset", "object")),
+    *(("task", name) for name in ("Database", "Table", "DateInterval", "ColumnStore", "IntColumn", "RealColumn",
+                                  "DateColumn", "StringColumn", "DateIntervalColumn", "HashIndex", "SortedIndex",
+                                  "IntervalIndex", "column_type")),
+    ("datetime", "date"),
+    ("array", "array"),
+    ("array", "_array_reconstructor"),
+    ("copyreg", "_reconstructor"),
+    ("_codecs", "encode"),
+}
+# Старі назви модулів: графічний інтерфейс запускався як task.py, тож класи записані з __main__
+LEGACY_MODULES = {"__main__": "task", "__builtin__": "builtins", "copy_reg": "copyreg"}
+# Протоколи 0–2 записують int і str під назвами Python 2
+LEGACY_NAMES = {("__builtin__", "long"): "int", ("__builtin__", "unicode"): "str"}
+
+
+def _to_bytes(values):
+    """Серіалізує масив у порядку байтів little-endian"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+@contextmanager
+def _gc_paused():
+    """Вимикає циклічний збирач сміття на час побудови рядків таблиці.
+
+    Декодування створює мільйони об'єктів без циклів (списки, дати, інтервали), і
+    збирач, що запускається через кожні кілька сотень виділень, повторно обходить усі
+    вже створені рядки — це більше половини часу завантаження.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def decode_column(field_type, data, length):
+    """Відновлює колонку з байтів сегмента файлу версії 1"""
+    column = COLUMN_CLASSES[column_type(field_type)]()
+    if isinstance(column, StringColumn):
+        count, blob_length = STRING_HEADER.unpack_from(data)
+        lengths_end = STRING_HEADER.size + count * 4
+        lengths = _from_bytes("I", data[STRING_HEADER.size:lengths_end])
+        blob = data[lengths_end:lengths_end + blob_length]
+        offset = 0
+        for size in lengths:
+            column.dictionary.append(blob[offset:offset + size].decode("utf-8"))
+            offset += size
+        column.codes = {value: code for code, value in enumerate(column.dictionary)}
+        column.values = _from_bytes("i", data[lengths_end + blob_length:])
+        sizes = [len(column.values)]
+    elif isinstance(column, DateIntervalColumn):
+        half = len(data) // 2
+        column.starts = _from_bytes("i", data[:half])
+        column.ends = _from_bytes("i", data[half:])
+        sizes = [len(column.starts), len(column.ends)]
+    else:
+        column.values = _from_bytes(column.typecode, data)
+        sizes = [len(column.values)]
+    if any(size != length for size in sizes):
+        raise StorageError("Segment length does not match the table directory.")
+    return column
+
+
+def _width(lo, hi, typecodes, signed):
+    """Найменший код типу масиву, в який вміщуються значення з [lo, hi]"""
+    for width in sorted(typecodes):
+        bits = 8 * width - signed
+        if (-(1 << bits) if signed else 0) <= lo and hi < (1 << bits):
+            return typecodes[width]
+    raise ValidationError("Integer value out of range for columnar storage.")
+
+
+def encode_ints(values):
+    """Пакує блок цілих чисел; повертає (кодування, код типу, база, байти).
+
+    delta — різниці з попереднім значенням (перша різниця нульова, база — перше значення);
+    for — відступи від бази (мінімуму блоку або нуля, якщо значення і так вміщуються).
+    Обирається вужче з двох; різниці рахуються, лише якщо вони вужчі на початку блоку.
+    """
+    lo, hi = min(values), max(values)
+    offsets_typecode = _width(0, hi - lo, UNSIGNED_TYPECODES, signed=False)
+    width = array(offsets_typecode).itemsize
+    if width > 1 and array(_deltas(values[:DELTA_SAMPLE])[0]).itemsize < width:
+        deltas_typecode, deltas = _deltas(values)
+        if array(deltas_typecode).itemsize < width:
+            return "delta", deltas_typecode, values[0], _to_bytes(array(deltas_typecode, deltas))
+    if 0 <= lo and hi >> (8 * width) == 0:
+        return "for", offsets_typecode, 0, _to_bytes(array(offsets_typecode, values))
+    return "for", offsets_typecode, lo, _to_bytes(array(offsets_typecode, map(sub, values, repeat(lo))))
+
+
+def _deltas(values):
+    """Різниці сусідніх значень і код типу для них (найширший, якщо вони не вміщуються)"""
+    deltas = list(map(sub, values, chain((values[0],), values)))
+    try:
+        return _width(min(deltas), max(deltas), SIGNED_TYPECODES, signed=True), deltas
+    except ValidationError:
+        return SIGNED_TYPECODES[8], deltas  # Різниці крайніх 64-бітних значень не вміщуються у 8 байтів
+
+
+def decode_block(data, compression, encoding, typecode, base, count, target, description):
+    """Розпаковує один блок у масив з кодом типу target (виконується і в пулі процесів)"""
+    try:
+        if typecode not in BLOCK_TYPECODES:
+            raise StorageError(f"Unknown block typecode '{typecode}'.")
+        if compression is not None:
+            data = COMPRESSORS[compression][1](data)
+        packed = _from_bytes(typecode, data)
+        if encoding == "plain":
+            values = packed if typecode == target else array(target, packed)
+        elif encoding == "for":
+            values = array(target, map(add, packed, repeat(base)) if base else packed)
+        elif encoding == "delta":
+            values = array(target, accumulate(packed, initial=base))
+            del values[0]
+        else:
+            raise StorageError(f"Unknown block encoding '{encoding}'.")
+    except Exception as e:
+        raise StorageError(f"Corrupt segment: {description}. {e}") from e
+    if len(values) != count:
+        raise StorageError("Segment length does not match the table directory.")
+    return values
+
+
+def encode_dictionary(dictionary):
+    """Словник рядкової колонки — масив JSON (розбирається одним викликом json.loads)"""
+    return json.dumps(dictionary, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_dictionary(data):
+    dictionary = json.loads(data)
+    if not isinstance(dictionary, list) or not set(map(type, dictionary)) <= {str}:
+        raise StorageError("String dictionary must be a list of strings.")
+    return dictionary
+
+
+def column_streams(rows, position, field_type):
+    """Повертає (словник рядків або None, масиви значень колонки) для запису.
+
+    Інтервал дат зберігається двома потоками: початок і довжина в днях.
+    """
+    if isinstance(rows, ColumnStore):
+        column = rows.columns[position]
+        if isinstance(column, StringColumn):
+            return column.dictionary, [column.values]
+        if isinstance(column, DateIntervalColumn):
+            return None, [column.starts, array("i", map(sub, column.ends, column.starts))]
+        return None, [column.values]
+    values = [row[position] for row in rows]
+    if field_type in (STRING, CHAR):
+        codes = {}
+        encoded = array("i", [codes.setdefault(value, len(codes)) for value in values])
+        return list(codes), [encoded]
+    if field_type is DATE_INTERVAL:
+        starts = array("i", [interval.start_date.toordinal() for interval in values])
+        ends = array("i", [interval.end_date.toordinal() for interval in values])
+        return None, [starts, array("i", map(sub, ends, starts))]
+    if field_type is DATE:
+        return None, [array("i", map(date.toordinal, values))]
+    try:
+        return None, [array(COLUMN_CLASSES[field_type].typecode, values)]
+    except OverflowError:
+        raise ValidationError("Integer value out of range for columnar storage.") from None
+
+
+class _BlockWriter:
+    """Дописує блоки у файл і повертає їхні описи для каталогу"""
+
+    def __init__(self, f, compression):
+        self.f = f
+        self.compression = compression
+
+    def write(self, data):
+        """Записує байти блоку (стиснуті, якщо це зменшує їх); повертає [зсув, довжина, CRC32, стиснення]"""
+        compression = self.compression
+        if compression is not None:
+            compressed = COMPRESSORS[compression][0](data)
+            if len(compressed) < len(data):
+                data = compressed
+            else:
+                compression = None
+        block = [self.f.tell(), len(data), zlib.crc32(data), compression]
+        self.f.write(data)
+        return block
+
+    def write_stream(self, values, block_rows):
+        """Записує потік значень блоками; опис блоку — [зсув, довжина, CRC32, стиснення,
+        кодування, код типу, база, кількість значень]"""
+        blocks = []
+        for start in range(0, len(values), block_rows):
+            chunk = values[start:start + block_rows]
+            if chunk.typecode == "d":
+                encoding, typecode, base, data = "plain", "d", 0, _to_bytes(chunk)
+            else:
+                encoding, typecode, base, data = encode_ints(chunk)
+            blocks.append(self.write(data) + [encoding, typecode, base, len(chunk)])
+        return blocks
+
+
+def _write(database, f, compression, block_rows, progress=None):
+    """Записує заголовок, блоки та каталог у відкритий файл з початку.
+
+    progress(частка) викликається після кодування кожної колонки кожної таблиці.
+    """
+    if compression is not None and compression not in COMPRESSORS:
+        raise StorageError(f"Unknown compression '{compression}'.")
+    directory = {"name": database.name, "log_generation": database.log_generation, "tables": []}
+    f.write(b"\0" * HEADER.size)
+    writer = _BlockWriter(f, compression)
+    tables = list(database.tables.values())
+    for number, table in enumerate(tables):
+        rows, ids = table.compacted()
+        columns = []
+        for position, field_type in enumerate(table.column_types):
+            dictionary, streams = column_streams(rows, position, field_type)
+            column = {"streams": [writer.write_stream(values, block_rows) for values in streams]}
+            if dictionary is not None:
+                column["dictionary"] = writer.write(encode_dictionary(dictionary))
+            columns.append(column)
+            if progress is not None:
+                progress((number + (position + 1) / len(table.column_types)) / len(tables))
+        entry = {
+            "name": table.name,
+            "storage": table.storage,
+            "schema": [[field_name, column.name] for (field_name, _), column in zip(table.schema, table.column_types)],
+            "rows": len(rows),
+            "indexes": [[column, index.kind] for column, index in table.indexes.items()],
+            "columns": columns,
+            "next_id": table._next_id,
+        }
+        if ids and ids[-1] != len(ids) - 1:
+            # Ідентифікатори з пропусками зберігаються окремим потоком; інакше це 0..rows-1
+            entry["ids"] = writer.write_stream(ids, block_rows)
+        directory["tables"].append(entry)
+    directory_data = json.dumps(directory).encode("utf-8")
+    directory_offset = f.tell()
+    f.write(directory_data)
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, directory_offset, len(directory_data), zlib.crc32(directory_data)))
+
+
+def write_database(database, filename, compression=None, block_rows=BLOCK_ROWS):
+    """Атомарно записує базу у бінарному форматі; compression — None, zlib або lzma"""
+    temp_filename = filename + ".tmp"
+    try:
+        with open(temp_filename, "wb") as f:
+            _write(database, f, compression, block_rows)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+    os.replace(temp_filename, filename)
+
+
+def dump_database(database, compression=None, block_rows=BLOCK_ROWS, progress=None):
+    """Вміст файлу бази у бінарному форматі (для запису частинами у фоні)"""
+    f = io.BytesIO()
+    _write(database, f, compression, block_rows, progress)
+    return f.getvalue()
+
+
+def stored_size(entry):
+    """Кількість байтів, які займають дані таблиці з каталогу у файлі"""
+    if "segments" in entry:
+        return sum(segment[1] for segment in entry["segments"]) + (entry["ids"][1] if "ids" in entry else 0)
+    blocks = [block for column in entry["columns"] for stream in column["streams"] for block in stream]
+    blocks += [column["dictionary"] for column in entry["columns"] if "dictionary" in column]
+    return sum(block[1] for block in blocks + entry.get("ids", []))
+
+
+def is_binary_file(filename):
+    """Перевіряє, чи записаний файл у бінарному форматі"""
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def detect_format(filename):
+    """Формат файлу бази: "binary", "pickle" (файли попередніх версій) або "json" (database.json)"""
+    with open(filename, "rb") as f:
+        start = f.read(64)
+    if start.startswith(MAGIC):
+        return "binary"
+    if start[:1] == b"\x80" or start[:1] in (b"(", b"c"):
+        return "pickle"  # Протокол 2 і новіші починаються з PROTO, протоколи 0 і 1 — з MARK або GLOBAL
+    if start.lstrip()[:1] == b"{":
+        return "json"
+    raise StorageError(f"Unknown database file format: '{filename}'.")
+
+
+# Міграції каталогу: версія -> функція, що оновлює каталог цієї версії до наступної
+def _migrate_v1(directory):
+    for entry in directory["tables"]:
+        # До версії 2 ідентифікатори рядків не зберігались окремо від позицій
+        entry.setdefault("next_id", entry["rows"])
+    return directory
+
+
+MIGRATIONS = {
+    1: _migrate_v1,
+}
+
+
+def migrate(directory, version):
+    """Оновлює каталог файлу версії version до FORMAT_VERSION"""
+    while version < FORMAT_VERSION:
+        directory = MIGRATIONS[version](directory)
+        version += 1
+    return directory
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        module, name = LEGACY_MODULES.get(module, module), LEGACY_NAMES.get((module, name), name)
+        if (module, name) not in LEGACY_GLOBALS:
+            raise StorageError(f"Legacy database file refers to '{module}.{name}', which is not allowed.")
+        return super().find_class(module, name)
+
+
+def legacy_loads(data):
+    """Розпаковує дані pickle попередніх версій, дозволяючи лише класи бази та вбудовані типи"""
+    try:
+        return _LegacyUnpickler(io.BytesIO(data)).load()
+    except StorageError:
+        raise
+    except Exception as e:
+        raise StorageError(f"Corrupt legacy database file. {e}") from e
+
+
+def read_legacy_database(filename):
+    """Зчитує базу, збережену попередніми версіями у форматі pickle"""
+    with open(filename, "rb") as f:
+        database = legacy_loads(f.read())
+    if not isinstance(database, Database):
+        raise StorageError(f"'{filename}' does not contain a database.")
+    return database
+
+
+def read_json_database(filename):
+    """Зчитує таблиці з файлу у форматі database.json; ім'я бази — ім'я файлу"""
+    database = Database(os.path.splitext(os.path.basename(filename))[0])
+    try:
+        reports = database.import_json(filename)
+    except (ValueError, KeyError, TypeError) as e:
+        raise StorageError(f"Malformed database file '{filename}'. {e}") from e
+    for table_name, report in reports.items():
+        if report.errors:
+            number, message = report.errors[0]
+            raise StorageError(f"Invalid row {number} in table '{table_name}' of '{filename}': {message}")
+    database.journal.clear()
+    return database
+
+
+class _MappedFile:
+    """Відображений у пам'ять файл, спільний для всіх ще не декодованих таблиць"""
+
+    def __init__(self, filename, workers=None):
+        with open(filename, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pending = 0
+        self.workers = workers  # Кількість процесів для паралельного декодування блоків
+        self.lock = threading.Lock()
+
+    def segment(self, offset, length, checksum, description):
+        if offset + length > len(self.map):
+            raise StorageError(f"Truncated segment: {description}.")
+        data = self.map[offset:offset + length]
+        if zlib.crc32(data) != checksum:
+            raise StorageError(f"Corrupt segment: {description}.")
+        return data
+
+    def release(self):
+        """Закриває файл, коли всі таблиці вже декодовані"""
+        with self.lock:
+            self.pending -= 1
+            if self.pending == 0:
+                self.map.close()
+
+
+class _PendingTable:
+    """Опис таблиці з каталогу, яку ще не декодовано; спільний для всіх версій словника таблиць"""
+
+    def __init__(self, source, entry):
+        self.source = source
+        self.entry = entry
+        self.table = None
+        self.owners = 1  # Кількість версій словника таблиць, що посилаються на опис
+        self.lock = threading.Lock()
+        source.pending += 1
+
+    def load(self):
+        with self.lock:
+            if self.table is None:
+                with _gc_paused():
+                    self.table = self._decode()
+            return self.table
+
+    def _decode(self):
+        entry = self.entry
+        schema = [(field_name, COLUMN_TYPES[tag]) for field_name, tag in entry["schema"]]
+        if "columns" in entry:
+            columns, ids = self._decode_blocks(schema)
+        else:
+            columns, ids = self._decode_segments(schema)
+        self.source.release()
+
+        table = Table(entry["name"], schema, entry["storage"])
+        if entry["storage"] == "columnar":
+            table.rows = ColumnStore.from_columns(schema, columns, entry["rows"])
+        else:
+            table.rows = [list(row) for row in zip(*(column.decode_all() for column in columns))]
+        if ids is not None:
+            table._ids = ids
+        table._next_id = entry["next_id"]
+        for column, kind in entry["indexes"]:
+            # Індекси перебудуються при першому запиті
+            table.indexes[column] = INDEX_KINDS[kind](column, table._field_position(column))
+        return table
+
+    def _decode_segments(self, schema):
+        """Колонки та ідентифікатори рядків з файлу версії 1"""
+        entry = self.entry
+        columns = []
+        for (field_name, field_type), (offset, length, checksum) in zip(schema, entry["segments"]):
+            description = f"table '{entry['name']}', column '{field_name}'"
+            data = self.source.segment(offset, length, checksum, description)
+            try:
+                columns.append(decode_column(field_type, data, entry["rows"]))
+            except Exception as e:
+                raise StorageError(f"Corrupt segment: {description}. {e}") from e
+        if len(columns) != len(schema):
+            raise StorageError(f"Missing segments for table '{entry['name']}'.")
+        ids = None
+        if "ids" in entry:
+            ids = _from_bytes("q", self.source.segment(*entry["ids"], f"table '{entry['name']}', row ids"))
+            if len(ids) != entry["rows"]:
+                raise StorageError("Segment length does not match the table directory.")
+        return columns, ids
+
+    def _decode_blocks(self, schema):
+        """Колонки та ідентифікатори рядків з файлу версії 2; блоки декодуються незалежно"""
+        entry = self.entry
+        if len(entry["columns"]) != len(schema):
+            raise StorageError(f"Missing segments for table '{entry['name']}'.")
+        streams = []  # Пари (код типу результату, описи блоків)
+        jobs = []  # Аргументи decode_block разом із номером потоку
+        def add_stream(blocks, target, description):
+            for offset, length, checksum, compression, encoding, typecode, base, count in blocks:
+                data = self.source.segment(offset, length, checksum, description)
+                jobs.append((len(streams), (data, compression, encoding, typecode, base, count, target, description)))
+            streams.append(array(target))
+
+        columns, dictionaries = [], []
+        for (field_name, field_type), stored in zip(schema, entry["columns"]):
+            description = f"table '{entry['name']}', column '{field_name}'"
+            column = COLUMN_CLASSES[column_type(field_type)]()
+            targets = ("i", "i") if isinstance(column, DateIntervalColumn) else (column.typecode,)
+            if len(stored["streams"]) != len(targets):
+                raise StorageError(f"Missing segments for table '{entry['name']}'.")
+            for blocks, target in zip(stored["streams"], targets):
+                add_stream(blocks, target, description)
+            if isinstance(column, StringColumn):
+                dictionaries.append((column, self._decode_dictionary(stored["dictionary"], description)))
+            columns.append(column)
+        if "ids" in entry:
+            add_stream(entry["ids"], "q", f"table '{entry['name']}', row ids")
+
+        if self.source.workers and len(jobs) > 1:
+            with ProcessPoolExecutor(self.source.workers) as pool:
+                arguments = zip(*(arguments for _, arguments in jobs))
+                parts = list(pool.map(decode_block, *arguments, chunksize=max(1, len(jobs) // (4 * self.source.workers))))
+        else:
+            parts = [decode_block(*arguments) for _, arguments in jobs]
+        for (stream, _), part in zip(jobs, parts):
+            streams[stream].extend(part)
+        if any(len(values) != entry["rows"] for values in streams):
+            raise StorageError("Segment length does not match the table directory.")
+
+        values = iter(streams)
+        for column in columns:
+            if isinstance(column, DateIntervalColumn):
+                column.starts, lengths = next(values), next(values)
+                if lengths and min(lengths) < 0:
+                    raise StorageError("Date interval ends before it starts.")
+                column.ends = array("i", map(add, column.starts, lengths))
+            else:
+                column.values = next(values)
+        for column, dictionary in dictionaries:
+            if column.values and max(column.values) >= len(dictionary):
+                raise StorageError("String code does not match the column dictionary.")
+            column.dictionary = dictionary
+            column.codes = dict(zip(dictionary, range(len(dictionary))))
+        return columns, next(values, None)
+
+    def _decode_dictionary(self, block, description):
+        offset, length, checksum, compression = block
+        data = self.source.segment(offset, length, checksum, description)
+        try:
+            if compression is not None:
+                data = COMPRESSORS[compression][1](data)
+            return decode_dictionary(data)
+        except Exception as e:
+            raise StorageError(f"Corrupt segment: {description}. {e}") from e
+
+    def discard(self):
+        self.owners -= 1
+        if self.owners == 0 and self.table is None:
+            self.source.release()
+
+
+class LazyTables(MutableMapping):
+    """Словник таблиць, що декодує таблицю з файлу під час першого звернення"""
+
+    def __init__(self, on_load):
+        self._entries = {}
+        self._on_load = on_load
+
+    def __reduce__(self):
+        # Серіалізується як звичайний словник (з декодуванням усіх таблиць)
+        return dict, (dict(self.items()),)
+
+    def copy(self):
+        """Нова версія словника; ще не декодовані таблиці спільні з цією"""
+        tables = LazyTables(self._on_load)
+        tables._entries = dict(self._entries)
+        for entry in tables._entries.values():
+            if isinstance(entry, _PendingTable):
+                entry.owners += 1
+        return tables
+
+    def __getitem__(self, name):
+        entry = self._entries[name]
+        if isinstance(entry, _PendingTable):
+            entry = self._entries[name] = entry.load()
+            self._on_load(entry)
+        return entry
+
+    def __setitem__(self, name, table):
+        if name in self._entries:
+            del self[name]
+        self._entries[name] = table
+
+    def __delitem__(self, name):
+        entry = self._entries.pop(name)
+        if isinstance(entry, _PendingTable):
+            entry.discard()
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_loaded(self, name):
+        return not isinstance(self._entries[name], _PendingTable)
+
+    def peek(self, name):
+        """Таблиця, якщо її вже декодовано (можливо, через іншу версію словника), інакше None"""
+        entry = self._entries.get(name)
+        return entry.table if isinstance(entry, _PendingTable) else entry
+
+
+def open_database(filename, workers=None):
+    """Відкриває базу в бінарному форматі, читаючи лише заголовок і каталог.
+
+    Якщо задано workers, блоки таблиці декодуються паралельно в пулі з workers процесів.
+    """
+    source = _MappedFile(filename, workers)
+    file_map = source.map
+    if len(file_map) < HEADER.size:
+        raise StorageError("Truncated database file header.")
+    magic, version, _, directory_offset, directory_length, checksum = HEADER.unpack_from(file_map)
+    if magic != MAGIC:
+        raise StorageError("Not a database file.")
+    if not 1 <= version <= FORMAT_VERSION:
+        raise StorageError(f"Unsupported database format version {version}.")
+    directory_data = source.segment(directory_offset, directory_length, checksum, "table directory")
+    try:
+        directory = migrate(json.loads(directory_data), version)
+        for entry in directory["tables"]:
+            for _, tag in entry["schema"]:
+                if tag not in COLUMN_TYPES:
+                    raise StorageError(f"Unknown column type '{tag}' in table '{entry['name']}'.")
+            for _, kind in entry["indexes"]:
+                if kind not in INDEX_KINDS:
+                    raise StorageError(f"Unknown index kind '{kind}' in table '{entry['name']}'.")
+        # Файли, записані до появи поколінь журналу, мають покоління 0
+        log_generation = directory.get("log_generation", 0)
+        if not isinstance(log_generation, int):
+            raise StorageError("Log generation must be an integer.")
+    except StorageError:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise StorageError(f"Malformed table directory. {e}") from e
+
+    database = Database(directory["name"])
+    database.log_generation = log_generation
+    tables = LazyTables(database._attach)
+    for entry in directory["tables"]:
+        tables._entries[entry["name"]] = _PendingTable(source, entry)
+    if source.pending == 0:
+        file_map.close()
+    database.tables = tables
+    return database
@@ -0,0 +1,25 @@
+"""Типи винятків бази даних; усі походять від DatabaseError"""
+
+
+class DatabaseError(Exception):
+    """Базовий виняток бази даних"""
+
+
+class ValidationError(DatabaseError):
+    """Значення або рядок не відповідає схемі таблиці"""
+
+
+class SchemaError(DatabaseError):
+    """Некоректна схема, тип, колонка або індекс"""
+
+
+class TableError(DatabaseError):
+    """Таблиця не існує або вже існує"""
+
+
+class StorageError(DatabaseError):
+    """Файл бази або журналу пошкоджений чи має непідтримуваний формат"""
+
+
+class ProtocolError(DatabaseError):
+    """Некоректний запит або відповідь мережевого протоколу чи розірване з'єднання"""
@@ -0,0 +1,591 @@
+"""Графічний інтерфейс менеджера бази даних (tkinter).
+
+Ядро (модуль task) не залежить від tkinter; цей модуль імпортується лише для
+запуску інтерфейсу: python gui.py або python task.py.
+"""
+import os
+import sys
+import tkinter as tk
+from collections import OrderedDict
+from pathlib import Path
+from tkinter import filedialog, messagebox, simpledialog, ttk
+
+import metrics
+from errors import DatabaseError, SchemaError
+from task import COLUMN_TYPES, DATE_INTERVAL, Database, DateInterval, parse_date
+from tasks import TaskExecutor, difference_job, difference_payload_job, load_job, save_job, table_snapshot
+
+
+# Віртуалізований перегляд таблиці: Treeview містить лише видимі рядки,
+# а решта підвантажується з таблиці сторінками під час прокручування
+class VirtualTableView:
+    cached_pages = 4
+
+    def __init__(self, parent, height=20, page_size=200):
+        self.height = height
+        self.page_size = page_size
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, height=height, show="headings")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scroll)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_wheel)
+
+        self.table = None
+        self.order = None  # Позиції рядків у порядку сортування або None
+        self.sort_column = None
+        self.descending = False
+        self.offset = 0
+        self.pages = OrderedDict()  # Номер сторінки -> рядки (невеликий LRU-кеш)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def show(self, table):
+        """Показує таблицю з початку, без сортування"""
+        self.table = table
+        self.order = None
+        self.sort_column = None
+        self.offset = 0
+        self.pages.clear()
+        self.tree.delete(*self.tree.get_children())
+        columns = [field_name for field_name, _ in table.get_schema()]
+        self.tree["columns"] = columns
+        for column in columns:
+            self.tree.heading(column, text=column, command=lambda column=column: self.sort_by(column))
+        self.render()
+
+    def sort_by(self, column):
+        """Сортує за колонкою; повторне натискання змінює напрямок"""
+        self.descending = not self.descending if column == self.sort_column else False
+        self.sort_column = column
+        self.order = self.table.ordered_positions(column, self.descending)
+        self.offset = 0
+        self.pages.clear()
+        self.render()
+
+    def total(self):
+        return len(self.table.rows) if self.order is None else len(self.order)
+
+    def row(self, position):
+        page_number = position // self.page_size
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.pages[page_number] = self.table.page(page_number * self.page_size, self.page_size, self.order)
+            if len(self.pages) > self.cached_pages:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(page_number)
+        return page[position % self.page_size]
+
+    def render(self):
+        if self.table is None:
+            return
+        total = self.total()
+        self.offset = max(0, min(self.offset, total - self.height))
+        rows = [self.row(position) for position in range(self.offset, min(total, self.offset + self.height))]
+        # Наявні елементи Treeview перевикористовуються замість видалення і вставки
+        items = self.tree.get_children()
+        for item, row in zip(items, rows):
+            self.tree.item(item, values=row)
+        for row in rows[len(items):]:
+            self.tree.insert("", "end", values=row)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(rows)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * self.total())
+        elif action == "scroll":
+            self.offset += int(amount) * (self.height if unit == "pages" else 1)
+        self.render()
+
+    def on_wheel(self, event):
+        self.offset += -3 if event.num == 4 or getattr(event, "delta", 0) > 0 else 3
+        self.render()
+        return "break"
+
+
+# Простий GUI для роботи з базою даних і таблицями
+class DatabaseGUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Database Manager")
+        self.database = None
+        self.save_directory = self.get_default_save_directory()
+
+        # Поле для назви бази даних
+        self.db_name_label = tk.Label(root, text="Database Name:")
+        self.db_name_label.grid(row=0, column=0)
+
+        self.db_name_entry = tk.Entry(root)
+        self.db_name_entry.grid(row=0, column=1)
+
+        # Кнопка для створення бази даних
+        self.create_db_button = tk.Button(root, text="Create Database", command=self.create_database)
+        self.create_db_button.grid(row=1, column=0, columnspan=2)
+
+        # Поле для назви таблиці
+        self.table_name_label = tk.Label(root, text="Table Name:")
+        self.table_name_label.grid(row=2, column=0)
+
+        self.table_name_entry = tk.Entry(root)
+        self.table_name_entry.grid(row=2, column=1)
+
+        # Кнопка для створення таблиці
+        self.create_table_button = tk.Button(root, text="Create Table", command=self._handler("create_table"))
+        self.create_table_button.grid(row=3, column=0, columnspan=2)
+
+        # Кнопка для видалення таблиці
+        self.drop_table_button = tk.Button(root, text="Drop Table", command=self._handler("drop_table"))
+        self.drop_table_button.grid(row=4, column=0, columnspan=2)
+
+        # Кнопка для перегляду таблиці
+        self.view_table_button = tk.Button(root, text="View Table", command=self._handler("view_table"))
+        self.view_table_button.grid(row=5, column=0, columnspan=2)
+
+        # Кнопка для додавання рядка
+        self.add_row_button = tk.Button(root, text="Add Row", command=self._handler("add_row"))
+        self.add_row_button.grid(row=6, column=0, columnspan=2)
+
+        # Кнопка для редагування рядка
+        self.edit_row_button = tk.Button(root, text="Edit Row", command=self._handler("edit_row"))
+        self.edit_row_button.grid(row=7, column=0, columnspan=2)
+
+        # Кнопка для скасування редагування
+        self.undo_button = tk.Button(root, text="Undo", command=self._handler("undo"))
+        self.undo_button.grid(row=8, column=0)
+        self.redo_button = tk.Button(root, text="Redo", command=self._handler("redo"))
+        self.redo_button.grid(row=8, column=1)
+
+        # Кнопка для збереження бази даних на диск
+        self.save_button = tk.Button(root, text="Save Database", command=self._handler("save_database"))
+        self.save_button.grid(row=9, column=0, columnspan=2)
+
+        # Кнопка для завантаження бази даних з диска
+        self.load_button = tk.Button(root, text="Load Database", command=self._handler("load_database"))
+        self.load_button.grid(row=10, column=0, columnspan=2)
+
+        # Кнопка для обчислення різниці між таблицями
+        self.difference_button = tk.Button(root, text="Difference",
+                                           command=self._handler("difference_between_tables"))
+        self.difference_button.grid(row=11, column=0, columnspan=2)
+
+        # Кнопки для масового імпорту та експорту рядків таблиці
+        self.import_button = tk.Button(root, text="Import Rows", command=self._handler("import_rows"))
+        self.import_button.grid(row=12, column=0)
+        self.export_button = tk.Button(root, text="Export Rows", command=self._handler("export_rows"))
+        self.export_button.grid(row=12, column=1)
+
+        # Віджет для перегляду даних таблиці
+        self.table_view = VirtualTableView(root)
+        self.table_view.grid(row=13, column=0, columnspan=2)
+
+        # Рядок стану фонових операцій і кнопка їх скасування
+        self.status_label = tk.Label(root, text="Ready", anchor="w")
+        self.status_label.grid(row=14, column=0, sticky="we")
+        self.cancel_button = tk.Button(root, text="Cancel", command=self.cancel_tasks, state="disabled")
+        self.cancel_button.grid(row=14, column=1)
+
+        # Статистика бази та профілювання операцій
+        self.stats_button = tk.Button(root, text="Stats", command=self.show_stats)
+        self.stats_button.grid(row=15, column=0)
+        self.profiling = tk.BooleanVar(value=metrics.enabled())
+        self.profiling_check = tk.Checkbutton(root, text="Profiling", variable=self.profiling,
+                                              command=self.toggle_profiling)
+        self.profiling_check.grid(row=15, column=1)
+
+        # Довгі операції виконуються у фоні, результати повертаються через root.after
+        self.executor = TaskExecutor()
+        self.executor.attach(root)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Автоматичне завантаження бази при запуску
+        self.auto_load_database()
+
+    def _handler(self, name):
+        """Кнопка викликає метод за іменем, тож підміна методів при профілюванні діє одразу"""
+        return lambda: getattr(self, name)()
+
+    def create_database(self):
+        db_name = self.db_name_entry.get()
+        if db_name:
+            self.database = Database(db_name)
+            messagebox.showinfo("Success", f"Database '{db_name}' created!")
+        else:
+            messagebox.showerror("Error", "Database name cannot be empty.")
+
+    def create_table(self):
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        table_name = self.table_name_entry.get()
+        if not table_name:
+            messagebox.showerror("Error", "Table name cannot be empty.")
+            return
+
+        schema_input = simpledialog.askstring("Schema Input", "Enter schema as 'field_name:type, field_name:type':")
+        if schema_input:
+            try:
+                schema = []
+                for field in schema_input.split(','):
+                    field_name, field_type = field.split(':')
+                    field_type = field_type.strip()
+                    if field_type not in COLUMN_TYPES:
+                        raise SchemaError(f"Invalid type '{field_type}' for field '{field_name.strip()}'.")
+                    schema.append((field_name.strip(), COLUMN_TYPES[field_type]))
+                with self.database.lock:
+                    self.database.create_table(table_name, schema)
+                messagebox.showinfo("Success", f"Table '{table_name}' created!")
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+
+    def drop_table(self):
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        table_name = self.table_name_entry.get()
+        if not table_name:
+            messagebox.showerror("Error", "Table name cannot be empty.")
+            return
+
+        try:
+            with self.database.lock:
+                self.database.drop_table(table_name)
+            messagebox.showinfo("Success", f"Table '{table_name}' dropped!")
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def add_row(self):
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        table_name = self.table_name_entry.get()
+        if not table_name:
+            messagebox.showerror("Error", "Table name cannot be empty.")
+            return
+
+        if table_name not in self.database.tables:
+            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
+            return
+
+        table = self.database.tables[table_name]
+        row_data = self._ask_row_values(table, "Enter value")
+        if row_data is None:
+            return
+
+        try:
+            with self.database.lock:
+                table.add_row(row_data)
+            messagebox.showinfo("Success", "Row added!")
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def _ask_row_values(self, table, prompt):
+        """Запитує значення всіх полів рядка; повертає None, якщо введення некоректне"""
+        row_data = []
+        try:
+            for (field_name, _), column in zip(table.get_schema(), table.column_types):
+                if column is DATE_INTERVAL:
+                    start_date_str = simpledialog.askstring("Input", "Enter start date (YYYY-MM-DD):")
+                    end_date_str = simpledialog.askstring("Input", "Enter end date (YYYY-MM-DD):")
+                    row_data.append(DateInterval(parse_date(start_date_str), parse_date(end_date_str)))
+                else:
+                    value = simpledialog.askstring("Input", f"{prompt} for '{field_name}' ({column.name}):")
+                    row_data.append(column.parse(value))
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return None
+        return row_data
+
+    def edit_row(self):
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        table_name = self.table_name_entry.get()
+        if not table_name:
+            messagebox.showerror("Error", "Table name cannot be empty.")
+            return
+
+        if table_name not in self.database.tables:
+            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
+            return
+
+        row_index = simpledialog.askinteger("Edit Row", "Enter row index to edit:")
+        if row_index is None or row_index < 0:
+            messagebox.showerror("Error", "Invalid row index.")
+            return
+
+        table = self.database.tables[table_name]
+        new_row_data = self._ask_row_values(table, "Enter new value")
+        if new_row_data is None:
+            return
+
+        try:
+            with self.database.lock:
+                table.edit_row(row_index, new_row_data)
+            messagebox.showinfo("Success", "Row edited!")
+        except DatabaseError as e:
+            messagebox.showerror("Error", str(e))
+
+    def undo(self):
+        if not self.database or not self.database.journal.can_undo():
+            messagebox.showerror("Error", "Nothing to undo.")
+            return
+        self.database.undo()
+        self._refresh_view()
+
+    def redo(self):
+        if not self.database or not self.database.journal.can_redo():
+            messagebox.showerror("Error", "Nothing to redo.")
+            return
+        self.database.redo()
+        self._refresh_view()
+
+    def _refresh_view(self):
+        """Показує актуальну версію відкритої таблиці, якщо вона ще є в базі"""
+        table = self.table_view.table
+        if table is not None and table.name in self.database.tables:
+            self.table_view.show(self.database.tables[table.name])
+
+    def view_table(self):
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        table_name = self.table_name_entry.get()
+        if not table_name:
+            messagebox.showerror("Error", "Table name cannot be empty.")
+            return
+
+        if table_name not in self.database.tables:
+            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
+            return
+
+        # Відображаються лише видимі рядки, тож час відкриття не залежить від розміру таблиці
+        self.table_view.show(self.database.tables[table_name])
+
+    def save_database(self):
+        db_name = self.db_name_entry.get()
+        if not db_name:
+            messagebox.showerror("Error", "Database name cannot be empty.")
+            return
+
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        filename = os.path.join(self.save_directory, f"{db_name}.db")
+
+        def saved(result):
+            if result is not None:
+                messagebox.showinfo("Success", f"Database saved to '{filename}'.")
+
+        self.run_task_io(f"Saving '{db_name}'", save_job, self.database, filename, on_done=saved)
+
+    def load_database(self):
+        db_name = self.db_name_entry.get()
+        if not db_name:
+            messagebox.showerror("Error", "Database name cannot be empty.")
+            return
+
+        filename = os.path.join(self.save_directory, f"{db_name}.db")
+        if os.path.exists(filename):
+            self.run_task_io(f"Loading '{db_name}'", load_job, filename,
+                             on_done=lambda database: self.database_loaded(database, db_name))
+        else:
+            messagebox.showerror("Error", f"Database '{db_name}' not found.")
+
+    def database_loaded(self, database, db_name):
+        self.database = database
+        messagebox.showinfo("Success", f"Database '{db_name}' loaded!")
+
+    def difference_between_tables(self):
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return
+
+        table_name_1 = simpledialog.askstring("Table 1 Name", "Enter the first table name:")
+        table_name_2 = simpledialog.askstring("Table 2 Name", "Enter the second table name:")
+
+        if not table_name_1 or not table_name_2:
+            messagebox.showerror("Error", "Both table names must be provided.")
+            return
+
+        if table_name_1 not in self.database.tables or table_name_2 not in self.database.tables:
+            messagebox.showerror("Error", "One or both tables do not exist.")
+            return
+
+        # Під блокуванням лише копіюються списки рядків; серіалізація йде у фоновому потоці,
+        # а різниця рахується в окремому процесі
+        with self.database.lock:
+            snapshots = (table_snapshot(self.database.tables[table_name_1]),
+                         table_snapshot(self.database.tables[table_name_2]))
+
+        def show_difference(diff):
+            if diff:
+                shown = "\n".join(map(str, diff[:20]))
+                more = f"\n... and {len(diff) - 20} more" if len(diff) > 20 else ""
+                messagebox.showinfo("Difference", f"Rows in '{table_name_1}' not in '{table_name_2}' "
+                                                  f"({len(diff)}):\n{shown}{more}")
+            else:
+                messagebox.showinfo("Difference", "No differences found.")
+
+        def compute(payload):
+            if payload is not None:
+                self.run_task_cpu("Computing difference", difference_job, payload, on_done=show_difference)
+
+        self.run_task_io("Preparing difference", difference_payload_job, *snapshots, on_done=compute)
+
+    def toggle_profiling(self):
+        if self.profiling.get():
+            metrics.enable()
+        else:
+            metrics.disable()
+
+    def _stats(self):
+        return self.database.stats() if self.database else metrics.summary()
+
+    def show_stats(self):
+        """Вікно зі статистикою бази та лічильниками профілювання"""
+        window = tk.Toplevel(self.root)
+        window.title("Database Stats")
+        text = tk.Text(window, width=110, height=30, font="TkFixedFont")
+        text.grid(row=0, column=0, columnspan=2)
+
+        def refresh():
+            text.config(state="normal")
+            text.delete("1.0", "end")
+            text.insert("end", metrics.format_text(self._stats()))
+            text.config(state="disabled")
+
+        def save():
+            filename = filedialog.asksaveasfilename(parent=window, defaultextension=".json",
+                                                    filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")])
+            if filename:
+                metrics.dump(self._stats(), filename)
+
+        tk.Button(window, text="Refresh", command=refresh).grid(row=1, column=0)
+        tk.Button(window, text="Save Stats", command=save).grid(row=1, column=1)
+        refresh()
+
+    def run_task_io(self, name, func, *args, on_done=None):
+        self.status_label.config(text=f"{name}...")
+        self.cancel_button.config(state="normal")
+        self.executor.submit_io(name, func, *args, on_done=self.task_finished(on_done),
+                                on_error=self.task_failed, on_progress=self.task_progress(name))
+
+    def run_task_cpu(self, name, func, *args, on_done=None):
+        self.status_label.config(text=f"{name}...")
+        self.cancel_button.config(state="normal")
+        self.executor.submit_cpu(name, func, *args, on_done=self.task_finished(on_done), on_error=self.task_failed)
+
+    def task_progress(self, name):
+        return lambda fraction, message: self.status_label.config(text=f"{name}: {fraction:.0%}")
+
+    def task_finished(self, on_done):
+        def finished(result):
+            self.update_status()
+            if on_done is not None:
+                on_done(result)
+        return finished
+
+    def task_failed(self, error):
+        self.update_status()
+        messagebox.showerror("Error", str(error))
+
+    def update_status(self):
+        # Колбек завершення виконується до видалення завдання з active, тому рахуємо інші
+        running = [task for task in self.executor.active if not task.future.done()]
+        self.status_label.config(text=f"{running[0].name}..." if running else "Ready")
+        self.cancel_button.config(state="normal" if running else "disabled")
+
+    def cancel_tasks(self):
+        for task in list(self.executor.active):
+            task.cancel()
+        self.status_label.config(text="Cancelled")
+        self.cancel_button.config(state="disabled")
+
+    def close(self):
+        self.executor.shutdown()
+        self.root.destroy()
+
+    def _selected_table(self):
+        """Повертає таблицю з поля введення або показує помилку"""
+        if not self.database:
+            messagebox.showerror("Error", "Create a database first.")
+            return None
+
+        table_name = self.table_name_entry.get()
+        if table_name not in self.database.tables:
+            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
+            return None
+        return self.database.tables[table_name]
+
+    def import_rows(self):
+        table = self._selected_table()
+        if table is None:
+            return
+
+        filename = filedialog.askopenfilename(filetypes=[("CSV", "*.csv"), ("JSON lines", "*.jsonl"),
+                                                         ("JSON", "*.json")])
+        if not filename:
+            return
+        file_format = os.path.splitext(filename)[1].lstrip(".").lower()
+        try:
+            # Увесь імпорт скасовується однією дією
+            with self.database.lock, self.database.undo_group():
+                report = table.bulk_load(filename, format=file_format)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        details = "\n".join(f"line {number}: {message}" for number, message in report.errors[:10])
+        messagebox.showinfo("Import", f"Loaded {report.loaded} rows, rejected {report.rejected}.\n{details}")
+
+    def export_rows(self):
+        table = self._selected_table()
+        if table is None:
+            return
+
+        filename = filedialog.asksaveasfilename(defaultextension=".csv",
+                                                filetypes=[("CSV", "*.csv"), ("JSON lines", "*.jsonl")])
+        if not filename:
+            return
+        try:
+            count = table.export(filename, format=os.path.splitext(filename)[1].lstrip(".").lower())
+            messagebox.showinfo("Export", f"Exported {count} rows to '{filename}'.")
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def get_default_save_directory(self):
+        """Повертає шлях до директорії Documents користувача"""
+        return str(Path.home() / "Documents")
+
+    def auto_load_database(self):
+        """Автоматично завантажує базу даних при запуску програми (у фоні)"""
+        db_name = self.db_name_entry.get() or "default_database"
+        filename = os.path.join(self.save_directory, f"{db_name}.db")
+        if os.path.exists(filename):
+            self.run_task_io(f"Loading '{db_name}'", load_job, filename,
+                             on_done=lambda database: self.database_loaded(database, db_name))
+
+
+def main():
+    root = tk.Tk()
+    DatabaseGUI(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    # Модуль, запущений як скрипт, реєструємо під власним ім'ям, щоб metrics.enable() знайшов класи інтерфейсу
+    sys.modules.setdefault("gui", sys.modules[__name__])
+    main()
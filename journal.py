@@ -0,0 +1,185 @@
+import sys
+from collections import deque
+from contextlib import contextmanager
+
+from errors import DatabaseError
+
+
+def _operation_size(operation, args):
+    """Приблизна кількість пам'яті, яку утримує запис журналу"""
+    size = sys.getsizeof(args)
+    for value in args:
+        if hasattr(value, "memory_usage"):
+            # Видалена таблиця утримується журналом повністю
+            size += sum(value.memory_usage().values())
+        elif isinstance(value, list):
+            size += sys.getsizeof(value)
+            if operation in ("edit_row", "delete_row"):
+                # Старі дані рядка більше ніде не використовуються
+                size += sum(map(sys.getsizeof, value))
+    return size
+
+
+class UndoJournal:
+    """Обмежений журнал скасування та повторення змін бази.
+
+    Кожен запис — група операцій у вигляді подій бази (операція, аргументи);
+    рядки не копіюються, а спільно використовуються з таблицями. Обернену
+    операцію обчислюємо під час скасування. Найстаріші записи витісняються,
+    коли журнал перевищує max_bytes або max_entries.
+    """
+
+    def __init__(self, database, max_bytes=16 * 2 ** 20, max_entries=1000):
+        self.database = database
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.undo_stack = deque()  # Пари (операції, розмір)
+        self.redo_stack = []
+        self.size = 0
+        self._group = None
+        self._group_depth = 0
+        self._replaying = False
+
+    def record(self, operation, args):
+        """Підписник на зміни бази"""
+        if self._replaying:
+            return
+        if self._group is not None:
+            self._group.append((operation, args))
+        else:
+            self._push([(operation, args)])
+
+    def _push(self, operations):
+        size = sum(_operation_size(operation, args) for operation, args in operations)
+        self.undo_stack.append((operations, size))
+        self.size += size
+        self.redo_stack.clear()
+        while self.undo_stack and (self.size > self.max_bytes or len(self.undo_stack) > self.max_entries):
+            _, evicted_size = self.undo_stack.popleft()
+            self.size -= evicted_size
+
+    @contextmanager
+    def group(self):
+        """Об'єднує всі зміни всередині блоку в один запис журналу"""
+        if self._group_depth == 0:
+            self._group = []
+        self._group_depth += 1
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                operations, self._group = self._group, None
+                if operations:
+                    self._push(operations)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    @contextmanager
+    def replaying(self):
+        """Зміни всередині блоку не записуються в журнал"""
+        replaying, self._replaying = self._replaying, True
+        try:
+            yield
+        finally:
+            self._replaying = replaying
+
+    def undo(self):
+        """Скасовує останній запис журналу"""
+        if not self.undo_stack:
+            raise DatabaseError("Nothing to undo.")
+        operations, size = self.undo_stack[-1]
+        self._replay([self._inverse(self.database, operation, args) for operation, args in reversed(operations)])
+        self.undo_stack.pop()
+        self.size -= size
+        self.redo_stack.append((operations, size))
+
+    def redo(self):
+        """Повторює останній скасований запис журналу"""
+        if not self.redo_stack:
+            raise DatabaseError("Nothing to redo.")
+        operations, size = self.redo_stack[-1]
+        self._replay([self._forward(self.database, operation, args) for operation, args in operations])
+        self.redo_stack.pop()
+        self.undo_stack.append((operations, size))
+        self.size += size
+
+    def _replay(self, actions):
+        with self.replaying():
+            for action in actions:
+                action()
+
+    @staticmethod
+    def _inverse(database, operation, args):
+        name = args[0]
+        table = lambda: database.tables[name]
+        if operation == "add_row":
+            _, _, row_id = args
+            return lambda: table().delete_row(row_id, by_id=True)
+        if operation == "add_rows":
+            _, rows, first_id = args
+            return lambda: [table().delete_row(row_id, by_id=True)
+                            for row_id in reversed(range(first_id, first_id + len(rows)))]
+        if operation == "restore_row":
+            _, row_id, _ = args
+            return lambda: table().delete_row(row_id, by_id=True)
+        if operation == "edit_row":
+            _, row_id, _, old_data = args
+            return lambda: table().edit_row(row_id, old_data, by_id=True)
+        if operation == "delete_row":
+            _, row_id, old_data = args
+            return lambda: table().restore_row(row_id, old_data)
+        if operation == "create_index":
+            _, column, _ = args
+            return lambda: table().drop_index(column)
+        if operation == "drop_index":
+            _, column, kind = args
+            return lambda: table().create_index(column, kind)
+        if operation in ("create_table", "restore_table"):
+            return lambda: database.drop_table(name)
+        if operation == "drop_table":
+            return lambda: database.restore_table(args[1])
+        raise DatabaseError(f"Cannot undo operation '{operation}'.")
+
+    @staticmethod
+    def _forward(database, operation, args):
+        name = args[0]
+        table = lambda: database.tables[name]
+        # Повторені рядки отримують ті самі ідентифікатори, що й до скасування
+        if operation == "add_row":
+            _, row, row_id = args
+            return lambda: table().restore_row(row_id, row)
+        if operation == "add_rows":
+            _, rows, first_id = args
+            return lambda: [table().restore_row(row_id, row) for row_id, row in enumerate(rows, first_id)]
+        if operation == "restore_row":
+            _, row_id, row = args
+            return lambda: table().restore_row(row_id, row)
+        if operation == "edit_row":
+            _, row_id, new_data, _ = args
+            return lambda: table().edit_row(row_id, new_data, by_id=True)
+        if operation == "delete_row":
+            _, row_id, _ = args
+            return lambda: table().delete_row(row_id, by_id=True)
+        if operation == "create_index":
+            _, column, kind = args
+            return lambda: table().create_index(column, kind)
+        if operation == "drop_index":
+            _, column, _ = args
+            return lambda: table().drop_index(column)
+        if operation == "create_table":
+            return lambda: database.create_table(*args)
+        if operation == "drop_table":
+            return lambda: database.drop_table(name)
+        if operation == "restore_table":
+            return lambda: database.restore_table(args[1])
+        raise DatabaseError(f"Cannot redo operation '{operation}'.")
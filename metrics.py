@@ -0,0 +1,326 @@
+"""Вбудоване профілювання гарячих операцій бази.
+
+Профілювання вмикається явно: enable() підміняє методи класів (і функції модулів)
+обгортками, що рахують виклики, помилки, затримки та байти введення-виведення,
+а disable() повертає оригінали. Поки профілювання вимкнене, код виконується без
+жодних обгорток, тож накладних витрат немає. Лічильники спільні для всього процесу
+(реєстр registry) і доступні через Database.stats(), CLI (--profile, stats --json)
+та панель статистики в графічному інтерфейсі.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from errors import DatabaseError
+
+# Межі кошиків гістограми затримок у секундах: 1, 2.5, 5 на кожен порядок від 1 мкс до 10 с
+LATENCY_BUCKETS = tuple(base * 10.0 ** exponent for exponent in range(-6, 1) for base in (1, 2.5, 5)) + (10.0,)
+
+
+class Histogram:
+    """Гістограма затримок з фіксованими кошиками"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Останній кошик — понад останню межу
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Верхня межа кошика, в який потрапляє квантиль q (оцінка зверху)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        cumulative, seen = [], 0
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            seen += count
+            cumulative.append([bound, seen])
+        return {
+            "count": self.count,
+            "seconds": self.total,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+
+class Metrics:
+    """Лічильники викликів, помилок, затримок і байтів для кожної операції"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latency = {}  # Операція -> Histogram
+            self.errors = {}
+            self.bytes_read = {}
+            self.bytes_written = {}
+
+    def observe(self, operation, seconds, failed=False):
+        with self.lock:
+            histogram = self.latency.get(operation)
+            if histogram is None:
+                histogram = self.latency[operation] = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def add_bytes(self, operation, read=0, written=0):
+        with self.lock:
+            if read:
+                self.bytes_read[operation] = self.bytes_read.get(operation, 0) + read
+            if written:
+                self.bytes_written[operation] = self.bytes_written.get(operation, 0) + written
+
+    def as_dict(self):
+        with self.lock:
+            operations = {}
+            for operation in sorted(self.latency):
+                operations[operation] = self.latency[operation].as_dict()
+                operations[operation]["errors"] = self.errors.get(operation, 0)
+            return {
+                "operations": operations,
+                "bytes_read": dict(sorted(self.bytes_read.items())),
+                "bytes_written": dict(sorted(self.bytes_written.items())),
+            }
+
+
+registry = Metrics()
+
+
+# Що інструментується: (модуль, клас або None для функції модуля, імена)
+TARGETS = [
+    ("task", "Table", ["add_row", "add_rows", "edit_row", "delete_row", "restore_row", "validate_row",
+                       "validate_rows", "bulk_load", "export", "compact", "lookup", "range", "overlaps",
+                       "contains", "within", "difference", "union", "intersection"]),
+    ("task", "Database", ["save_to_disk", "load_from_disk", "write_snapshot", "dump_bytes", "import_json",
+                          "undo", "redo"]),
+    ("wal", "WriteAheadLog", ["sync", "checkpoint", "replay"]),
+    ("wal", None, ["encode_record"]),
+    ("cache", "ResultCache", ["difference", "union", "intersection", "query"]),
+    ("dbformat", None, ["write_database", "open_database"]),
+    ("dbformat", "_PendingTable", ["_decode"]),
+    ("gui", "VirtualTableView", ["show", "render"]),
+    ("gui", "DatabaseGUI", ["create_table", "drop_table", "view_table", "add_row", "edit_row", "undo", "redo",
+                            "save_database", "load_database", "difference_between_tables", "import_rows",
+                            "export_rows"]),
+]
+
+
+def _file_size(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def _saved_bytes(args, kwargs, result):
+    database, filename = args[0], args[1]
+    wal = database._wal
+    if wal is not None and os.path.abspath(filename) == os.path.abspath(wal.filename):
+        return 0  # У режимі WAL збереження лише синхронізує журнал
+    return _file_size(filename)
+
+
+def _loaded_bytes(args, kwargs, result):
+    from dbformat import is_binary_file
+
+    filename = args[0]
+    # Бінарний файл читається ліниво — його сегменти враховує _PendingTable._decode
+    size = 0 if is_binary_file(filename) else _file_size(filename)
+    return size + _file_size(filename + ".wal")
+
+
+def _decoded_bytes(args, kwargs, result):
+    from dbformat import stored_size
+
+    return stored_size(args[0].entry)
+
+
+# Скільки байтів прочитала (read) або записала (written) операція: (напрямок, функція).
+# Байти рахуються лише на одному рівні вкладеності, щоб суми не дублювались.
+IO_SIZES = {
+    "Database.save_to_disk": ("written", _saved_bytes),
+    "Database.load_from_disk": ("read", _loaded_bytes),
+    "WriteAheadLog.checkpoint": ("written", lambda args, kwargs, result: _file_size(args[0].filename)),
+    "wal.encode_record": ("written", lambda args, kwargs, result: len(result)),
+    "_PendingTable._decode": ("read", _decoded_bytes),
+}
+
+
+def _instrument(function, operation):
+    io = IO_SIZES.get(operation)
+    perf_counter = time.perf_counter
+
+    @wraps(function)
+    def instrumented(*args, **kwargs):
+        start = perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            registry.observe(operation, perf_counter() - start, failed=True)
+            raise
+        registry.observe(operation, perf_counter() - start)
+        if io is not None:
+            direction, size = io
+            registry.add_bytes(operation, **{direction: size(args, kwargs, result)})
+        return result
+
+    return instrumented
+
+
+_originals = []  # Пари (власник, ім'я, оригінальний атрибут) для disable()
+_lock = threading.Lock()
+
+
+def enabled():
+    return bool(_originals)
+
+
+def enable():
+    """Вмикає профілювання: підміняє методи обгортками, що вимірюють операції.
+
+    Модулі, які ще не імпортовані (наприклад, графічний інтерфейс), не імпортуються
+    і не інструментуються.
+    """
+    with _lock:
+        if _originals:
+            return
+        for module_name, class_name, names in TARGETS:
+            module = sys.modules.get(module_name)
+            if module is None:
+                if module_name == "gui":
+                    continue
+                module = __import__(module_name)
+            owner = module if class_name is None else getattr(module, class_name)
+            prefix = module_name if class_name is None else class_name
+            for name in names:
+                original = owner.__dict__[name] if class_name is not None else getattr(owner, name)
+                if isinstance(original, staticmethod):
+                    replacement = staticmethod(_instrument(original.__func__, f"{prefix}.{name}"))
+                else:
+                    replacement = _instrument(original, f"{prefix}.{name}")
+                _originals.append((owner, name, original))
+                setattr(owner, name, replacement)
+
+
+def disable():
+    """Вимикає профілювання і повертає оригінальні методи; накопичені лічильники лишаються"""
+    with _lock:
+        while _originals:
+            owner, name, original = _originals.pop()
+            setattr(owner, name, original)
+
+
+# Формати вивантаження
+
+def format_prometheus(stats):
+    """Текстовий формат Prometheus для словника Database.stats() (або summary())"""
+    def label(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    lines = ["# HELP itlab_operation_seconds Latency of instrumented database operations.",
+             "# TYPE itlab_operation_seconds histogram"]
+    for operation, data in stats["operations"].items():
+        name = label(operation)
+        for bound, count in data["buckets"]:
+            le = bound if bound == "+Inf" else repr(float(bound))
+            lines.append(f'itlab_operation_seconds_bucket{{operation="{name}",le="{le}"}} {count}')
+        lines.append(f'itlab_operation_seconds_sum{{operation="{name}"}} {data["seconds"]!r}')
+        lines.append(f'itlab_operation_seconds_count{{operation="{name}"}} {data["count"]}')
+    lines += ["# HELP itlab_operation_errors_total Instrumented operations that raised an exception.",
+              "# TYPE itlab_operation_errors_total counter"]
+    for operation, data in stats["operations"].items():
+        lines.append(f'itlab_operation_errors_total{{operation="{label(operation)}"}} {data["errors"]}')
+    for direction in ("read", "written"):
+        metric = f"itlab_bytes_{direction}_total"
+        lines += [f"# HELP {metric} Bytes {direction} by instrumented operations.", f"# TYPE {metric} counter"]
+        for operation, count in stats[f"bytes_{direction}"].items():
+            lines.append(f'{metric}{{operation="{label(operation)}"}} {count}')
+    if "cache" in stats:
+        cache = stats["cache"]
+        lines += ["# HELP itlab_cache_requests_total Result cache lookups by outcome.",
+                  "# TYPE itlab_cache_requests_total counter"]
+        for result, counter in (("hit", "hits"), ("miss", "misses"), ("update", "updates")):
+            lines.append(f'itlab_cache_requests_total{{result="{result}"}} {cache[counter]}')
+        lines += ["# HELP itlab_cache_evictions_total Results evicted from the cache.",
+                  "# TYPE itlab_cache_evictions_total counter",
+                  f"itlab_cache_evictions_total {cache['evictions']}",
+                  "# HELP itlab_cache_bytes Approximate memory held by cached results.",
+                  "# TYPE itlab_cache_bytes gauge",
+                  f"itlab_cache_bytes {cache['bytes']}"]
+    if "tables" in stats:
+        database = label(stats["database"])
+        lines += ["# HELP itlab_table_rows Live rows per table.", "# TYPE itlab_table_rows gauge"]
+        for table_name, table in stats["tables"].items():
+            lines.append(f'itlab_table_rows{{database="{database}",table="{label(table_name)}"}} {table["rows"]}')
+    return "\n".join(lines) + "\n"
+
+
+def format_text(stats):
+    """Зведення для людини: таблиці та операції з кількістю викликів і затримками"""
+    lines = []
+    if "tables" in stats:
+        lines.append(f"database {stats['database']}: {len(stats['tables'])} tables, "
+                     f"undo {stats['undo']['entries']} entries ({stats['undo']['bytes']} bytes)")
+        for table_name, table in stats["tables"].items():
+            indexes = ",".join(f"{column}:{kind}" for column, kind in table["indexes"].items()) or "-"
+            lines.append(f"  {table_name}: rows={table['rows']} deleted={table['deleted']} "
+                         f"storage={table['storage']} indexes={indexes}")
+    if "cache" in stats:
+        cache = stats["cache"]
+        lines.append(f"cache: {cache['entries']} entries ({cache['bytes']} of {cache['max_bytes']} bytes), "
+                     f"hits={cache['hits']} misses={cache['misses']} updates={cache['updates']} "
+                     f"evictions={cache['evictions']}")
+    lines.append(f"profiling: {'on' if stats['profiling'] else 'off'}")
+    for operation, data in stats["operations"].items():
+        lines.append(f"  {operation:<36} calls={data['count']:<8} errors={data['errors']:<4} "
+                     f"total={data['seconds'] * 1e3:10.2f} ms  p50={data['p50'] * 1e3:8.3f} ms  "
+                     f"p99={data['p99'] * 1e3:8.3f} ms")
+    for direction in ("read", "written"):
+        for operation, count in stats[f"bytes_{direction}"].items():
+            lines.append(f"  {operation:<36} {direction} {count} bytes")
+    return "\n".join(lines)
+
+
+def summary():
+    """Лічильники профілювання без відомостей про конкретну базу"""
+    return {"profiling": enabled(), **registry.as_dict()}
+
+
+def dump(stats, filename, format=None):
+    """Записує статистику у файл: Prometheus (.prom, .txt) або JSON (інакше)"""
+    if format is None:
+        format = "prometheus" if os.path.splitext(filename)[1].lower() in (".prom", ".txt") else "json"
+    if format == "prometheus":
+        text = format_prometheus(stats)
+    elif format == "json":
+        text = json.dumps(stats, indent=2, default=str)
+    else:
+        raise DatabaseError(f"Unknown format '{format}'.")
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(text)
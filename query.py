@@ -0,0 +1,273 @@
+"""Лінивий конструктор запитів до таблиць.
+
+Запит накопичує кроки (where, select, join, group_by/agg, order_by, limit) і
+виконується потоковим конвеєром генераторів лише під час ітерації. Початкові
+умови where, які може обслужити індекс таблиці, визначають шлях доступу
+замість повного перегляду.
+"""
+import operator
+from itertools import islice
+
+from errors import SchemaError
+from task import IntervalIndex, SortedIndex
+
+
+def _overlaps(interval, bounds):
+    return interval.start_date <= bounds[1] and interval.end_date >= bounds[0]
+
+
+def _contains(interval, day):
+    return interval.start_date <= day <= interval.end_date
+
+
+def _within(interval, bounds):
+    return interval.start_date >= bounds[0] and interval.end_date <= bounds[1]
+
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, values: value in values,
+    "between": lambda value, bounds: bounds[0] <= value <= bounds[1],
+    "overlaps": _overlaps,
+    "contains": _contains,
+    "within": _within,
+}
+
+# Межі діапазону [lo, hi] для відсортованого індексу; строгість перевіряє фільтр
+RANGE_BOUNDS = {
+    "<": lambda value: (None, value),
+    "<=": lambda value: (None, value),
+    ">": lambda value: (value, None),
+    ">=": lambda value: (value, None),
+    "between": lambda value: value,
+}
+
+# Агрегатні функції: (початковий стан, крок, результат)
+AGGREGATES = {
+    "count": (lambda: 0, lambda state, value: state + 1, lambda state: state),
+    "sum": (lambda: 0, lambda state, value: state + value, lambda state: state),
+    "min": (lambda: None, lambda state, value: value if state is None or value < state else state,
+            lambda state: state),
+    "max": (lambda: None, lambda state, value: value if state is None or value > state else state,
+            lambda state: state),
+    "avg": (lambda: (0, 0), lambda state, value: (state[0] + value, state[1] + 1),
+            lambda state: state[0] / state[1] if state[1] else None),
+}
+
+
+def _position(columns, column):
+    try:
+        return columns.index(column)
+    except ValueError:
+        raise SchemaError(f"Column '{column}' does not exist.") from None
+
+
+class Query:
+    """Лінивий запит: кожен метод-конструктор повертає новий запит"""
+
+    def __init__(self, table, steps=()):
+        self.table = table
+        self.steps = tuple(steps)
+
+    def _with(self, *step):
+        return Query(self.table, self.steps + (step,))
+
+    def where(self, column, op="==", value=None):
+        """Фільтр за умовою 'колонка оператор значення' або за функцією від словника рядка"""
+        if callable(column):
+            return self._with("where", column, None, None)
+        if op not in OPERATORS:
+            raise SchemaError(f"Unknown operator '{op}'.")
+        return self._with("where", column, op, value)
+
+    def select(self, *columns):
+        """Проєкція на вказані колонки"""
+        return self._with("select", columns)
+
+    def order_by(self, *columns, descending=False):
+        return self._with("order", columns, descending)
+
+    def group_by(self, *columns):
+        return self._with("aggregate", columns, {})
+
+    def agg(self, **aggregates):
+        """Агрегати, наприклад agg(n="count", total=("sum", "salary")); після group_by — по групах"""
+        specs = {}
+        for name, spec in aggregates.items():
+            func, column = (spec, None) if isinstance(spec, str) else (spec[0], spec[1] if len(spec) > 1 else None)
+            if func not in AGGREGATES:
+                raise SchemaError(f"Unknown aggregate '{func}'.")
+            if func != "count" and column is None:
+                raise SchemaError(f"Aggregate '{func}' requires a column.")
+            specs[name] = (func, column)
+        if self.steps and self.steps[-1][0] == "aggregate" and not self.steps[-1][2]:
+            return Query(self.table, self.steps[:-1] + (("aggregate", self.steps[-1][1], specs),))
+        return self._with("aggregate", (), specs)
+
+    def join(self, other, on, other_on=None):
+        """Хеш-з'єднання з іншою таблицею або запитом за рівністю колонок"""
+        if not isinstance(other, Query):
+            other = other.query()
+        return self._with("join", other, on, other_on or on)
+
+    def limit(self, count):
+        return self._with("limit", count)
+
+    # Побудова плану виконання
+
+    def _access_path(self):
+        """Обирає шлях доступу: індекс для однієї з початкових умов where або повний перегляд"""
+        table = self.table
+        for step in self.steps:
+            if step[0] != "where":
+                break
+            _, column, op, value = step
+            if op is None:
+                continue
+            index = table.get_index(column)
+            if index is None:
+                continue
+            if op == "==" and hasattr(index, "lookup"):
+                return f"IndexLookup {table.name}.{column} == {value!r} ({index.kind})", lambda: index.lookup(value)
+            if op == "in" and hasattr(index, "lookup"):
+                return (f"IndexLookup {table.name}.{column} in {value!r} ({index.kind})",
+                        lambda: sorted(set().union(*(index.lookup(item) for item in value))))
+            if op in RANGE_BOUNDS and isinstance(index, SortedIndex):
+                lo, hi = RANGE_BOUNDS[op](value)
+                return (f"IndexRange {table.name}.{column} in [{lo!r}, {hi!r}] (sorted)",
+                        lambda: sorted(index.range(lo, hi)))
+            if op in ("overlaps", "within") and isinstance(index, IntervalIndex):
+                return (f"IntervalIndex {table.name}.{column} {op} {value!r}",
+                        lambda: getattr(index, op)(*value))
+            if op == "contains" and isinstance(index, IntervalIndex):
+                return f"IntervalIndex {table.name}.{column} contains {value!r}", lambda: index.contains(value)
+        return f"Scan {table.name}", None
+
+    def _plan(self):
+        """Повертає (колонки результату, опис кроків, функції кроків над потоком рядків)"""
+        table = self.table
+        columns = [field_name for field_name, _ in table.schema]
+        description, fetch_ids = self._access_path()
+        if fetch_ids is None:
+            source = lambda rows: table.iter_rows()
+        else:
+            source = lambda rows: table.rows_by_ids(fetch_ids())
+        descriptions, stages = [description], [source]
+        for step in self.steps:
+            kind = step[0]
+            if kind == "where":
+                _, column, op, value = step
+                if op is None:
+                    descriptions.append(f"Filter {getattr(column, '__name__', 'predicate')}(row)")
+                    stages.append(_predicate_filter(column, list(columns)))
+                else:
+                    descriptions.append(f"Filter {column} {op} {value!r}")
+                    stages.append(_condition_filter(_position(columns, column), OPERATORS[op], value))
+            elif kind == "select":
+                selected = [_position(columns, column) for column in step[1]]
+                descriptions.append(f"Project {', '.join(step[1])}")
+                stages.append(_project(selected))
+                columns = list(step[1])
+            elif kind == "join":
+                _, other, on, other_on = step
+                other_columns = other.columns
+                descriptions.append(f"HashJoin {on} = {other.table.name}.{other_on} "
+                                    f"(build: {other.table.name}; {'; '.join(other.explain().splitlines())})")
+                stages.append(_hash_join(_position(columns, on), other, _position(other_columns, other_on)))
+                columns = columns + [f"{other.table.name}.{name}" if name in columns else name
+                                     for name in other_columns]
+            elif kind == "aggregate":
+                _, keys, specs = step
+                key_positions = [_position(columns, column) for column in keys]
+                resolved = [(func, None if column is None else _position(columns, column))
+                            for func, column in specs.values()]
+                functions = ", ".join(f"{name}={func}({column or ''})" for name, (func, column) in specs.items())
+                descriptions.append(f"HashAggregate by ({', '.join(keys)}) {functions}".rstrip())
+                stages.append(_aggregate(key_positions, resolved, bool(keys)))
+                columns = list(keys) + list(specs)
+            elif kind == "order":
+                _, keys, descending = step
+                descriptions.append(f"Sort by {', '.join(keys)}{' desc' if descending else ''}")
+                stages.append(_sort([_position(columns, column) for column in keys], descending))
+            elif kind == "limit":
+                descriptions.append(f"Limit {step[1]}")
+                stages.append(_limit(step[1]))
+        return columns, descriptions, stages
+
+    @property
+    def columns(self):
+        """Назви колонок результату"""
+        return self._plan()[0]
+
+    def explain(self):
+        """Повертає текстовий опис плану виконання"""
+        return "\n".join(self._plan()[1])
+
+    def __iter__(self):
+        _, _, stages = self._plan()
+        rows = None
+        for stage in stages:
+            rows = stage(rows)
+        return iter(rows)
+
+    def all(self):
+        """Виконує запит і повертає список рядків"""
+        return list(self)
+
+
+def _predicate_filter(predicate, columns):
+    return lambda rows: (row for row in rows if predicate(dict(zip(columns, row))))
+
+
+def _condition_filter(position, compare, value):
+    return lambda rows: (row for row in rows if compare(row[position], value))
+
+
+def _project(positions):
+    return lambda rows: ([row[position] for position in positions] for row in rows)
+
+
+def _hash_join(position, other, other_position):
+    def join(rows):
+        # Фаза побудови: хеш-таблиця для правої сторони; фаза зондування — потоково для лівої
+        build = {}
+        for other_row in other:
+            build.setdefault(other_row[other_position], []).append(other_row)
+        for row in rows:
+            for other_row in build.get(row[position], ()):
+                yield list(row) + list(other_row)
+    return join
+
+
+def _aggregate(key_positions, specs, grouped):
+    functions = [AGGREGATES[func] for func, _ in specs]
+
+    def aggregate(rows):
+        groups = {}
+        for row in rows:
+            key = tuple(row[position] for position in key_positions)
+            states = groups.get(key)
+            if states is None:
+                states = groups[key] = [init() for init, _, _ in functions]
+            for i, ((_, step, _), (_, position)) in enumerate(zip(functions, specs)):
+                states[i] = step(states[i], None if position is None else row[position])
+        if not groups and not grouped:
+            # Агрегат без групування над порожнім входом дає один рядок
+            groups[()] = [init() for init, _, _ in functions]
+        for key, states in groups.items():
+            yield list(key) + [final(state) for (_, _, final), state in zip(functions, states)]
+    return aggregate
+
+
+def _sort(positions, descending):
+    return lambda rows: iter(sorted(rows, key=lambda row: [row[position] for position in positions],
+                                    reverse=descending))
+
+
+def _limit(count):
+    return lambda rows: islice(rows, count)
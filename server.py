@@ -0,0 +1,490 @@
+"""Мережевий сервер бази даних на asyncio.
+
+    python server.py DB [--host 127.0.0.1] [--port 7400] [--unix PATH] [--group-commit N]
+
+Сервер відкриває базу DB (або створює нову) у режимі журналу WAL і обслуговує
+клієнтів через TCP або Unix-сокет. Протокол — рядки JSON: запит
+{"id": 1, "op": "add_row", "table": "users", "row": [...]}, відповідь
+{"id": 1, "result": ...} або {"id": 1, "error": {"type": "TableError", "message": "..."}}.
+Значення рядків передаються як в експорті JSON-lines: дати — рядками ISO, інтервали —
+парами дат.
+
+Запити одного з'єднання можна надсилати конвеєром, не чекаючи відповідей: вони
+виконуються і отримують відповіді в порядку надходження. Послідовні add_row до
+однієї таблиці, що вже надійшли, додаються однією пачкою, але скасовуються
+(undo) кожен окремо, як і надіслані поодинці. Результати запитів
+(query, difference, union, intersection) передаються частинами
+{"id": 1, "rows": [...], "more": true}; наступна частина пишеться, лише коли
+клієнт прочитав попередні (зворотний тиск через буфер сокета). Результати
+обчислюються ліниво, частина за частиною, зі знімка таблиць (див. Database.snapshot),
+тож зміни між частинами не впливають на вже розпочату передачу. Кеш бази (див. cache)
+віддає готові результати, а зберігає лише короткі, до CACHED_ROWS рядків. Самі
+операції виконуються по черзі в циклі подій, тож довгий запит затримує інших клієнтів.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from itertools import islice
+
+from errors import DatabaseError, ProtocolError, TableError, ValidationError
+from task import DATE_INTERVAL, column_type, json_value, parse_date
+
+DEFAULT_PORT = 7400
+READ_SIZE = 1 << 16
+MAX_MESSAGE = 16 * 2 ** 20  # Найбільший рядок запиту чи відповіді в байтах
+CHUNK_ROWS = 1000  # Рядків в одній частині результату
+CACHED_ROWS = 1000  # Найдовший результат, який зберігається в кеші бази
+
+
+def _json_default(value):
+    converted = json_value(value)
+    if converted is value:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return converted
+
+
+_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_json_default)
+_DECODER = json.JSONDecoder()
+
+
+def encode_message(message):
+    """Один рядок протоколу (дати та інтервали перетворюються як в експорті JSON)"""
+    return _ENCODER.encode(message).encode("utf-8") + b"\n"
+
+
+def decode_message(line):
+    try:
+        message = _DECODER.decode(line.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"Malformed message. {e}") from e
+    if not isinstance(message, dict):
+        raise ProtocolError("Message must be a JSON object.")
+    return message
+
+
+def error_message(request_id, error):
+    """Відповідь з помилкою; тип помилки — ім'я класу з модуля errors"""
+    if isinstance(error, DatabaseError):
+        kind = type(error).__name__
+    elif isinstance(error, (ValueError, TypeError)):
+        kind = ValidationError.__name__  # Значення, яке не вдалося перетворити на тип колонки
+    else:
+        kind = DatabaseError.__name__
+    return {"id": request_id, "error": {"type": kind, "message": str(error)}}
+
+
+class Rows:
+    """Результат, який передається клієнту частинами; rows — ітератор рядків"""
+
+    def __init__(self, columns, rows, snapshot=None):
+        self.columns = columns
+        self.rows = rows
+        self.snapshot = snapshot  # Знімок, з якого ліниво читаються рядки, живе до кінця передачі
+
+
+# Розбір параметрів запиту
+
+def _parameter(request, name):
+    try:
+        return request[name]
+    except KeyError:
+        raise ProtocolError(f"Missing parameter '{name}'.") from None
+
+
+def _table(database, request, name="table"):
+    table_name = _parameter(request, name)
+    if table_name not in database.tables:
+        raise TableError(f"Table '{table_name}' does not exist.")
+    return database.tables[table_name]
+
+
+def _snapshot(database, request, *names):
+    """Знімок таблиць запиту і самі таблиці зі знімка"""
+    for name in names:
+        _table(database, request, name)
+    snapshot = database.snapshot([request[name] for name in names])
+    return snapshot, [snapshot[request[name]] for name in names]
+
+
+def _parse_row(table, row):
+    """Перетворює значення рядка з JSON на значення колонок таблиці"""
+    if not isinstance(row, list) or len(row) != len(table.column_types):
+        raise ValidationError("Row length does not match table schema.")
+    return [column.parse(value) for column, value in zip(table.column_types, row)]
+
+
+def _condition(table, condition):
+    """Умова [колонка, оператор, значення] у вигляді аргументів Query.where"""
+    if not isinstance(condition, list) or len(condition) != 3:
+        raise ProtocolError("Condition must be [column, operator, value].")
+    column, op, value = condition
+    field_type = table.column_types[table._field_position(column)]
+    if op == "in":
+        value = [field_type.parse(item) for item in value]
+    elif op == "between":
+        value = tuple(field_type.parse(item) for item in value)
+    elif field_type is DATE_INTERVAL and op in ("overlaps", "within"):
+        value = tuple(parse_date(item) for item in value)
+    elif field_type is DATE_INTERVAL and op == "contains":
+        value = parse_date(value)
+    else:
+        value = field_type.parse(value)
+    return column, op, value
+
+
+# Операції: функція (база, запит) -> результат; Rows передається частинами
+
+def _tables(database, request):
+    return list(database.tables)
+
+
+def _schema(database, request):
+    table = _table(database, request)
+    return {"columns": [[field_name, column.name] for (field_name, _), column in zip(table.schema, table.column_types)],
+            **table.stats()}
+
+
+def _create_table(database, request):
+    schema = [(field_name, column_type(type_name)) for field_name, type_name in _parameter(request, "columns")]
+    database.create_table(_parameter(request, "table"), schema, request.get("storage", "rows"))
+
+
+def _drop_table(database, request):
+    database.drop_table(_parameter(request, "table"))
+
+
+def _create_index(database, request):
+    _table(database, request).create_index(_parameter(request, "column"), request.get("kind", "hash"))
+
+
+def _add_row(database, request):
+    table = _table(database, request)
+    return table.add_row(_parse_row(table, _parameter(request, "row")))
+
+
+def _add_rows(database, request):
+    table = _table(database, request)
+    rows = []
+    for position, row in enumerate(_parameter(request, "rows")):
+        try:
+            rows.append(_parse_row(table, row))
+        except (DatabaseError, ValueError, TypeError) as e:
+            raise ValidationError(f"Row {position}: {e}") from e
+    return list(table.add_rows(rows))
+
+
+def _get_row(database, request):
+    return _table(database, request).get_row(_parameter(request, "row_id"))
+
+
+def _edit_row(database, request):
+    table = _table(database, request)
+    return table.edit_row(_parameter(request, "row_id"), _parse_row(table, _parameter(request, "row")), by_id=True)
+
+
+def _delete_row(database, request):
+    return _table(database, request).delete_row(_parameter(request, "row_id"), by_id=True)
+
+
+def _query(database, request):
+    snapshot, (table,) = _snapshot(database, request, "table")
+    query = table.query()
+    for condition in request.get("where", ()):
+        query = query.where(*_condition(table, condition))
+    # Сортування до проєкції — як у SQL, можна сортувати за невибраними колонками
+    if request.get("order_by"):
+        query = query.order_by(*request["order_by"], descending=request.get("descending", False))
+    if request.get("select"):
+        query = query.select(*request["select"])
+    if request.get("limit") is not None:
+        query = query.limit(request["limit"])
+    return Rows(query.columns, database.cache.stream_query(query, CACHED_ROWS), snapshot)
+
+
+def _set_operation(operation):
+    def run(database, request):
+        snapshot, (table, other_table) = _snapshot(database, request, "table", "other")
+        bag = bool(request.get("bag", False))
+        compute = getattr(table, "iter_" + operation)
+        rows = database.cache.stream(operation, (table, other_table), bag, lambda: compute(other_table, bag),
+                                     CACHED_ROWS)
+        return Rows([field_name for field_name, _ in table.schema], rows, snapshot)
+    return run
+
+
+def _undo(database, request):
+    database.undo()
+
+
+def _redo(database, request):
+    database.redo()
+
+
+OPERATIONS = {
+    "ping": lambda database, request: "pong",
+    "tables": _tables,
+    "schema": _schema,
+    "create_table": _create_table,
+    "drop_table": _drop_table,
+    "create_index": _create_index,
+    "add_row": _add_row,
+    "add_rows": _add_rows,
+    "get_row": _get_row,
+    "edit_row": _edit_row,
+    "delete_row": _delete_row,
+    "query": _query,
+    "difference": _set_operation("difference"),
+    "union": _set_operation("union"),
+    "intersection": _set_operation("intersection"),
+    "undo": _undo,
+    "redo": _redo,
+}
+
+
+class DatabaseServer:
+    """Обслуговує клієнтів бази через TCP або Unix-сокет (див. опис протоколу в модулі)"""
+
+    def __init__(self, database, filename=None, chunk_rows=CHUNK_ROWS):
+        self.database = database
+        self.filename = filename  # Файл бази для операції save
+        self.chunk_rows = chunk_rows
+        self.server = None
+        self.connections = 0
+        self.requests = 0
+        self._handlers = {}  # Задача обслуговування з'єднання -> його writer
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        """Починає приймати з'єднання на host:port або на Unix-сокеті path"""
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            self.server = await asyncio.start_unix_server(self.serve_connection, path, limit=MAX_MESSAGE)
+        else:
+            self.server = await asyncio.start_server(self.serve_connection, host, port, limit=MAX_MESSAGE)
+        return self.server
+
+    @property
+    def address(self):
+        """Адреса сокета: (host, port) або шлях Unix-сокета"""
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        """Перестає приймати з'єднання, закриває наявні і чекає завершення їх обслуговування"""
+        self.server.close()
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def serve_connection(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        buffer = b""
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                *lines, buffer = (buffer + data).split(b"\n")
+                if len(buffer) > MAX_MESSAGE:
+                    writer.write(encode_message(error_message(None, ProtocolError("Message is too long."))))
+                    break
+                await self.process(lines, writer)
+                # Інші з'єднання отримують свою чергу між пачками запитів
+                await asyncio.sleep(0)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            del self._handlers[task]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def process(self, lines, writer):
+        """Виконує пачку запитів, що надійшли з'єднанням, і пише відповіді в тому ж порядку"""
+        requests = []
+        for line in lines:
+            if line.strip():
+                try:
+                    requests.append(decode_message(line))
+                except ProtocolError as e:
+                    requests.append(e)
+        position = 0
+        while position < len(requests):
+            request = requests[position]
+            if isinstance(request, dict) and request.get("op") == "add_row":
+                end = position + 1
+                while (end < len(requests) and isinstance(requests[end], dict) and requests[end].get("op") == "add_row"
+                       and requests[end].get("table") == request.get("table")):
+                    end += 1
+                if end - position > 1:
+                    for response in self.add_row_batch(requests[position:end]):
+                        writer.write(encode_message(response))
+                    position = end
+                    continue
+            position += 1
+            response = self.execute(request)
+            if isinstance(response, Rows):
+                await self.send_rows(writer, request.get("id"), response)
+            else:
+                writer.write(encode_message(response))
+        await writer.drain()
+
+    def execute(self, request):
+        """Виконує один запит; повертає відповідь або Rows для передачі частинами"""
+        self.requests += 1
+        if isinstance(request, ProtocolError):
+            return error_message(None, request)
+        request_id = request.get("id")
+        try:
+            op = request.get("op")
+            if op == "stats":
+                result = {"server": {"connections": self.connections, "requests": self.requests},
+                          **self.database.stats()}
+            elif op == "save":
+                if self.filename is None:
+                    raise DatabaseError("Server has no database file.")
+                self.database.save_to_disk(self.filename)
+                result = None
+            elif op in OPERATIONS:
+                with self.database.lock:
+                    result = OPERATIONS[op](self.database, request)
+            else:
+                raise ProtocolError(f"Unknown operation '{op}'.")
+        except Exception as e:
+            return error_message(request_id, e)
+        if isinstance(result, Rows):
+            return result
+        return {"id": request_id, "result": result}
+
+    def add_row_batch(self, requests):
+        """Додає рядки кількох запитів add_row однією пачкою; некоректні рядки отримують помилку.
+
+        Пачка лише прискорює вставку: кожен запит лишається окремою зміною журналу
+        скасування, тож undo клієнта не прибирає рядки інших запитів.
+        """
+        self.requests += len(requests)
+        responses = [None] * len(requests)
+        try:
+            table = _table(self.database, requests[0])
+        except Exception as e:
+            return [error_message(request.get("id"), e) for request in requests]
+        parsed, positions = [], []
+        for position, request in enumerate(requests):
+            try:
+                parsed.append(_parse_row(table, _parameter(request, "row")))
+                positions.append(position)
+            except Exception as e:
+                responses[position] = error_message(request.get("id"), e)
+        # Події рядків надходять після вставки всієї пачки, тож у журнал WAL вони
+        # потрапляють разом, без контрольної точки посередині
+        with self.database.lock, self.database._logged_atomically():
+            invalid = dict(table.validate_rows(parsed))
+            rows = [row for index, row in enumerate(parsed) if index not in invalid]
+            try:
+                results = iter(table.add_rows(rows, each=True) if rows else ())
+            except (DatabaseError, ValueError, TypeError, OverflowError):
+                # add_rows не додає нічого з пачки, яку відхилило сховище, тож додаємо
+                # рядки поодинці: помилку отримають лише запити з некоректними рядками
+                results = iter([self._add_one(table, row) for row in rows])
+            except Exception as e:
+                results = iter([e] * len(rows))
+        for index, position in enumerate(positions):
+            request_id = requests[position].get("id")
+            if index in invalid:
+                responses[position] = error_message(request_id, ValidationError(invalid[index]))
+            else:
+                result = next(results)
+                if isinstance(result, Exception):
+                    responses[position] = error_message(request_id, result)
+                else:
+                    responses[position] = {"id": request_id, "result": result}
+        return responses
+
+    @staticmethod
+    def _add_one(table, row):
+        """Ідентифікатор доданого рядка або виняток, з яким його відхилено"""
+        try:
+            return table.add_rows([row], each=True)[0]
+        except Exception as e:
+            return e
+
+    async def send_rows(self, writer, request_id, result):
+        """Передає результат частинами, чекаючи, поки клієнт прочитає попередні.
+
+        Наступна частина обчислюється лише після відправлення попередньої; помилка
+        посеред результату надсилається замість решти частин.
+        """
+        rows, size = iter(result.rows), self.chunk_rows
+        message = {"id": request_id, "columns": result.columns}
+        chunk = []
+        while True:
+            try:
+                chunk += islice(rows, size + 1 - len(chunk))
+            except Exception as e:
+                writer.write(encode_message(error_message(request_id, e)))
+                return
+            message["rows"] = chunk[:size]
+            message["more"] = len(chunk) > size
+            writer.write(encode_message(message))
+            await writer.drain()
+            if not message["more"]:
+                return
+            chunk = chunk[size:]
+            message = {"id": request_id}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="server.py", description="Serve a database over TCP or a Unix socket.")
+    parser.add_argument("database", help="database file (created if it does not exist)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port (0 picks a free one)")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--group-commit", type=int, default=64, help="log records per disk sync")
+    args = parser.parse_args(argv)
+
+    from cli import load_database
+
+    try:
+        database = load_database(args.database, create=True)
+        database.enable_wal(args.database, group_commit=args.group_commit)
+    except DatabaseError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    server = DatabaseServer(database, args.database)
+
+    async def serve():
+        await server.start(args.host, args.port, args.unix)
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: зупинка через KeyboardInterrupt
+        address = server.address if args.unix else "%s:%d" % server.address[:2]
+        print(f"Listening on {address}", flush=True)
+        await stop.wait()
+        await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Журнал складається у новий знімок, щоб наступний запуск не відтворював його
+        database.checkpoint()
+        database.disable_wal()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
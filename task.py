@@ -1,450 +1,1939 @@
-import os
-import pickle
-from datetime import date
-import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk
-from pathlib import Path
-
-
-# Клас для інтервалу дат
-class DateInterval:
-    def __init__(self, start_date, end_date):
-        if not isinstance(start_date, date) or not isinstance(end_date, date):
-            raise Exception("Both start and end must be of type 'date'.")
-        if start_date > end_date:
-            raise Exception("Start date cannot be after end date.")
-        self.start_date = start_date
-        self.end_date = end_date
-
-    def __str__(self):
-        return f"{self.start_date} to {self.end_date}"
-
-
-# Клас для таблиці
-class Table:
-    def __init__(self, name, schema):
-        self.name = name
-        self.schema = schema  # Список пар (ім'я атрибуту, тип атрибуту)
-        self.rows = []
-
-    def validate_row(self, row_data):
-        """Перевіряє, чи відповідають дані рядка схемі таблиці"""
-        if len(row_data) != len(self.schema):
-            raise Exception("Row length does not match table schema.")
-        for (field_name, field_type), value in zip(self.schema, row_data):
-            if field_type == str and len(value) > 1:  # Для char обмежуємо до 1 символу
-                raise Exception(f"Invalid type for field '{field_name}'. Expected char, got string with length > 1.")
-            if not isinstance(value, field_type) and not (
-                    field_type == DateInterval and isinstance(value, DateInterval)):
-                raise Exception(
-                    f"Invalid type for field '{field_name}'. Expected {field_type.__name__}, got {type(value).__name__}.")
-
-    def add_row(self, row_data):
-        """Додає рядок у таблицю після валідації"""
-        self.validate_row(row_data)
-        self.rows.append(row_data)
-
-    def edit_row(self, row_index, new_data):
-        """Редагує рядок за індексом"""
-        old_data = self.rows[row_index]
-        try:
-            self.validate_row(new_data)
-            self.rows[row_index] = new_data
-            return old_data  # Повертаємо старі дані
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            return None  # Якщо валідація не пройшла
-
-    def delete_row(self, row_index):
-        """Видаляє рядок за індексом"""
-        if row_index < 0 or row_index >= len(self.rows):
-            raise Exception("Invalid row index.")
-        del self.rows[row_index]
-
-    def view_table(self):
-        """Повертає усі рядки таблиці"""
-        return self.rows
-
-    def get_schema(self):
-        """Повертає схему таблиці"""
-        return self.schema
-
-    def difference(self, other_table):
-        """Повертає різницю між двома таблицями"""
-        if self.schema != other_table.schema:
-            raise Exception("Schemas do not match. Cannot compute difference.")
-
-        diff = []
-        for row in self.rows:
-            if row not in other_table.rows:
-                diff.append(row)
-        return diff
-
-
-# Клас для бази даних
-class Database:
-    def __init__(self, name):
-        self.name = name
-        self.tables = {}
-
-    def create_table(self, table_name, schema):
-        """Створює таблицю з переданою схемою"""
-        if table_name in self.tables:
-            raise Exception(f"Table '{table_name}' already exists.")
-        self.tables[table_name] = Table(table_name, schema)
-
-    def drop_table(self, table_name):
-        """Видаляє таблицю з бази"""
-        if table_name not in self.tables:
-            raise Exception(f"Table '{table_name}' does not exist.")
-        del self.tables[table_name]
-
-    def save_to_disk(self, filename):
-        """Зберігає базу даних у файл"""
-        with open(filename, 'wb') as f:
-            pickle.dump(self, f)
-
-    @staticmethod
-    def load_from_disk(filename):
-        """Зчитує базу даних із файлу"""
-        with open(filename, 'rb') as f:
-            return pickle.load(f)
-
-
-# Простий GUI для роботи з базою даних і таблицями
-class DatabaseGUI:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Database Manager")
-        self.database = None
-        self.save_directory = self.get_default_save_directory()
-
-        # Поле для назви бази даних
-        self.db_name_label = tk.Label(root, text="Database Name:")
-        self.db_name_label.grid(row=0, column=0)
-
-        self.db_name_entry = tk.Entry(root)
-        self.db_name_entry.grid(row=0, column=1)
-
-        # Кнопка для створення бази даних
-        self.create_db_button = tk.Button(root, text="Create Database", command=self.create_database)
-        self.create_db_button.grid(row=1, column=0, columnspan=2)
-
-        # Поле для назви таблиці
-        self.table_name_label = tk.Label(root, text="Table Name:")
-        self.table_name_label.grid(row=2, column=0)
-
-        self.table_name_entry = tk.Entry(root)
-        self.table_name_entry.grid(row=2, column=1)
-
-        # Кнопка для створення таблиці
-        self.create_table_button = tk.Button(root, text="Create Table", command=self.create_table)
-        self.create_table_button.grid(row=3, column=0, columnspan=2)
-
-        # Кнопка для видалення таблиці
-        self.drop_table_button = tk.Button(root, text="Drop Table", command=self.drop_table)
-        self.drop_table_button.grid(row=4, column=0, columnspan=2)
-
-        # Кнопка для перегляду таблиці
-        self.view_table_button = tk.Button(root, text="View Table", command=self.view_table)
-        self.view_table_button.grid(row=5, column=0, columnspan=2)
-
-        # Кнопка для додавання рядка
-        self.add_row_button = tk.Button(root, text="Add Row", command=self.add_row)
-        self.add_row_button.grid(row=6, column=0, columnspan=2)
-
-        # Кнопка для редагування рядка
-        self.edit_row_button = tk.Button(root, text="Edit Row", command=self.edit_row)
-        self.edit_row_button.grid(row=7, column=0, columnspan=2)
-
-        # Кнопка для скасування редагування
-        self.undo_button = tk.Button(root, text="Undo Edit", command=self.undo_edit)
-        self.undo_button.grid(row=8, column=0, columnspan=2)
-
-        # Кнопка для збереження бази даних на диск
-        self.save_button = tk.Button(root, text="Save Database", command=self.save_database)
-        self.save_button.grid(row=9, column=0, columnspan=2)
-
-        # Кнопка для завантаження бази даних з диска
-        self.load_button = tk.Button(root, text="Load Database", command=self.load_database)
-        self.load_button.grid(row=10, column=0, columnspan=2)
-
-        # Кнопка для обчислення різниці між таблицями
-        self.difference_button = tk.Button(root, text="Difference", command=self.difference_between_tables)
-        self.difference_button.grid(row=11, column=0, columnspan=2)
-
-        # Віджет для перегляду даних таблиці
-        self.table_view = ttk.Treeview(root)
-        self.table_view.grid(row=12, column=0, columnspan=2)
-
-        # Автоматичне завантаження бази при запуску
-        self.auto_load_database()
-
-        # Для зберігання даних про редагування
-        self.last_edited_row_data = None
-        self.last_edited_row_index = None
-
-    def create_database(self):
-        db_name = self.db_name_entry.get()
-        if db_name:
-            self.database = Database(db_name)
-            messagebox.showinfo("Success", f"Database '{db_name}' created!")
-        else:
-            messagebox.showerror("Error", "Database name cannot be empty.")
-
-    def create_table(self):
-        if not self.database:
-            messagebox.showerror("Error", "Create a database first.")
-            return
-
-        table_name = self.table_name_entry.get()
-        if not table_name:
-            messagebox.showerror("Error", "Table name cannot be empty.")
-            return
-
-        schema_input = simpledialog.askstring("Schema Input", "Enter schema as 'field_name:type, field_name:type':")
-        if schema_input:
-            try:
-                schema = []
-                for field in schema_input.split(','):
-                    field_name, field_type = field.split(':')
-                    field_type = field_type.strip()
-                    if field_type == "int":
-                        schema.append((field_name.strip(), int))
-                    elif field_type == "real":
-                        schema.append((field_name.strip(), float))
-                    elif field_type == "char":
-                        schema.append((field_name.strip(), str))  # char обробляється як str з обмеженням
-                    elif field_type == "string":
-                        schema.append((field_name.strip(), str))
-                    elif field_type == "date":
-                        schema.append((field_name.strip(), date))
-                    elif field_type == "dateInvl":
-                        schema.append((field_name.strip(), DateInterval))
-                    else:
-                        raise Exception(f"Invalid type '{field_type}' for field '{field_name.strip()}'.")
-                self.database.create_table(table_name, schema)
-                messagebox.showinfo("Success", f"Table '{table_name}' created!")
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-
-    def drop_table(self):
-        if not self.database:
-            messagebox.showerror("Error", "Create a database first.")
-            return
-
-        table_name = self.table_name_entry.get()
-        if not table_name:
-            messagebox.showerror("Error", "Table name cannot be empty.")
-            return
-
-        try:
-            self.database.drop_table(table_name)
-            messagebox.showinfo("Success", f"Table '{table_name}' dropped!")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-
-    def add_row(self):
-        if not self.database:
-            messagebox.showerror("Error", "Create a database first.")
-            return
-
-        table_name = self.table_name_entry.get()
-        if not table_name:
-            messagebox.showerror("Error", "Table name cannot be empty.")
-            return
-
-        if table_name not in self.database.tables:
-            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
-            return
-
-        table = self.database.tables[table_name]
-        schema = table.get_schema()
-        row_data = []
-
-        for field in schema:
-            value = simpledialog.askstring("Input", f"Enter value for '{field[0]}' ({field[1].__name__}):")
-            if field[1] == int:
-                row_data.append(int(value))
-            elif field[1] == float:
-                row_data.append(float(value))
-            elif field[1] == str:
-                row_data.append(value)
-            elif field[1] == date:
-                year, month, day = map(int, value.split('-'))
-                row_data.append(date(year, month, day))
-            elif field[1] == DateInterval:
-                start_date_str = simpledialog.askstring("Input", "Enter start date (YYYY-MM-DD):")
-                end_date_str = simpledialog.askstring("Input", "Enter end date (YYYY-MM-DD):")
-                start_year, start_month, start_day = map(int, start_date_str.split('-'))
-                end_year, end_month, end_day = map(int, end_date_str.split('-'))
-                start_date = date(start_year, start_month, start_day)
-                end_date = date(end_year, end_month, end_day)
-                row_data.append(DateInterval(start_date, end_date))
-
-        try:
-            table.add_row(row_data)
-            messagebox.showinfo("Success", "Row added!")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-
-    def edit_row(self):
-        if not self.database:
-            messagebox.showerror("Error", "Create a database first.")
-            return
-
-        table_name = self.table_name_entry.get()
-        if not table_name:
-            messagebox.showerror("Error", "Table name cannot be empty.")
-            return
-
-        if table_name not in self.database.tables:
-            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
-            return
-
-        row_index = simpledialog.askinteger("Edit Row", "Enter row index to edit:")
-        if row_index is None or row_index < 0:
-            messagebox.showerror("Error", "Invalid row index.")
-            return
-
-        table = self.database.tables[table_name]
-        schema = table.get_schema()
-        new_row_data = []
-
-        for field in schema:
-            value = simpledialog.askstring("Input", f"Enter new value for '{field[0]}' ({field[1].__name__}):")
-            if field[1] == int:
-                new_row_data.append(int(value))
-            elif field[1] == float:
-                new_row_data.append(float(value))
-            elif field[1] == str:
-                new_row_data.append(value)
-            elif field[1] == date:
-                year, month, day = map(int, value.split('-'))
-                new_row_data.append(date(year, month, day))
-            elif field[1] == DateInterval:
-                start_date_str = simpledialog.askstring("Input", "Enter start date (YYYY-MM-DD):")
-                end_date_str = simpledialog.askstring("Input", "Enter end date (YYYY-MM-DD):")
-                start_year, start_month, start_day = map(int, start_date_str.split('-'))
-                end_year, end_month, end_day = map(int, end_date_str.split('-'))
-                start_date = date(start_year, start_month, start_day)
-                end_date = date(end_year, end_month, end_day)
-                new_row_data.append(DateInterval(start_date, end_date))
-
-        # Зберігаємо старі дані для можливості скасування
-        old_data = table.edit_row(row_index, new_row_data)
-        if old_data is not None:
-            self.last_edited_row_data = old_data
-            self.last_edited_row_index = row_index
-            messagebox.showinfo("Success", "Row edited!")
-        else:
-            messagebox.showerror("Error", "Edit failed due to validation errors.")
-
-    def undo_edit(self):
-        if self.last_edited_row_data is not None and self.last_edited_row_index is not None:
-            table_name = self.table_name_entry.get()
-            table = self.database.tables[table_name]
-            table.rows[self.last_edited_row_index] = self.last_edited_row_data
-            messagebox.showinfo("Success", "Edit undone!")
-            self.last_edited_row_data = None
-            self.last_edited_row_index = None
-        else:
-            messagebox.showerror("Error", "No edit to undo.")
-
-    def view_table(self):
-        if not self.database:
-            messagebox.showerror("Error", "Create a database first.")
-            return
-
-        table_name = self.table_name_entry.get()
-        if not table_name:
-            messagebox.showerror("Error", "Table name cannot be empty.")
-            return
-
-        if table_name not in self.database.tables:
-            messagebox.showerror("Error", f"Table '{table_name}' does not exist.")
-            return
-
-        table = self.database.tables[table_name]
-        rows = table.view_table()
-
-        # Очищення виджету перед відображенням нових даних
-        self.table_view.delete(*self.table_view.get_children())
-
-        # Відображення даних у Treeview
-        self.table_view["columns"] = [field[0] for field in table.get_schema()]
-        for field in table.get_schema():
-            self.table_view.heading(field[0], text=field[0])
-
-        for row in rows:
-            self.table_view.insert("", "end", values=row)
-
-    def save_database(self):
-        db_name = self.db_name_entry.get()
-        if not db_name:
-            messagebox.showerror("Error", "Database name cannot be empty.")
-            return
-
-        filename = os.path.join(self.save_directory, f"{db_name}.db")
-        self.database.save_to_disk(filename)
-        messagebox.showinfo("Success", f"Database saved to '{filename}'.")
-
-    def load_database(self):
-        db_name = self.db_name_entry.get()
-        if not db_name:
-            messagebox.showerror("Error", "Database name cannot be empty.")
-            return
-
-        filename = os.path.join(self.save_directory, f"{db_name}.db")
-        if os.path.exists(filename):
-            self.database = Database.load_from_disk(filename)
-            messagebox.showinfo("Success", f"Database '{db_name}' loaded!")
-        else:
-            messagebox.showerror("Error", f"Database '{db_name}' not found.")
-
-    def difference_between_tables(self):
-        if not self.database:
-            messagebox.showerror("Error", "Create a database first.")
-            return
-
-        table_name_1 = simpledialog.askstring("Table 1 Name", "Enter the first table name:")
-        table_name_2 = simpledialog.askstring("Table 2 Name", "Enter the second table name:")
-
-        if not table_name_1 or not table_name_2:
-            messagebox.showerror("Error", "Both table names must be provided.")
-            return
-
-        if table_name_1 not in self.database.tables or table_name_2 not in self.database.tables:
-            messagebox.showerror("Error", "One or both tables do not exist.")
-            return
-
-        table_1 = self.database.tables[table_name_1]
-        table_2 = self.database.tables[table_name_2]
-
-        try:
-            diff = table_1.difference(table_2)
-            if diff:
-                messagebox.showinfo("Difference", f"Rows in '{table_name_1}' not in '{table_name_2}':\n{diff}")
-            else:
-                messagebox.showinfo("Difference", "No differences found.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-
-    def get_default_save_directory(self):
-        """Повертає шлях до директорії Documents користувача"""
-        return str(Path.home() / "Documents")
-
-    def auto_load_database(self):
-        """Автоматично завантажує базу даних при запуску програми"""
-        db_name = self.db_name_entry.get() or "default_database"
-        filename = os.path.join(self.save_directory, f"{db_name}.db")
-        if os.path.exists(filename):
-            self.database = Database.load_from_disk(filename)
-            messagebox.showinfo("Success", f"Database '{db_name}' loaded!")
-
-
-# Головна частина програми
-if __name__ == "__main__":
-    root = tk.Tk()
-    db_gui = DatabaseGUI(root)
-    root.mainloop()
\ No newline at end of file
+import copy
+import json
+import os
+import shutil
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, deque
+from collections.abc import Mapping, MutableSequence
+from contextlib import contextmanager, nullcontext
+from datetime import date
+from itertools import compress, count
+from operator import itemgetter
+from weakref import WeakSet
+
+from cache import ResultCache
+from errors import DatabaseError, SchemaError, TableError, ValidationError
+from journal import UndoJournal
+
+
+# Клас для інтервалу дат
+class DateInterval:
+    def __init__(self, start_date, end_date):
+        if not isinstance(start_date, date) or not isinstance(end_date, date):
+            raise ValidationError("Both start and end must be of type 'date'.")
+        if start_date > end_date:
+            raise ValidationError("Start date cannot be after end date.")
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def __str__(self):
+        return f"{self.start_date} to {self.end_date}"
+
+    def __repr__(self):
+        return f"DateInterval({self.start_date!r}, {self.end_date!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, DateInterval):
+            return NotImplemented
+        return self.start_date == other.start_date and self.end_date == other.end_date
+
+    def __hash__(self):
+        return hash((self.start_date, self.end_date))
+
+
+def _interval(start_date, end_date, new=object.__new__):
+    """Інтервал без перевірок — для значень зі сховища, перевірених під час запису"""
+    interval = new(DateInterval)
+    interval.start_date = start_date
+    interval.end_date = end_date
+    return interval
+
+
+# Рушій множинних операцій над рядками: ключем рядка є кортеж його значень
+def _row_key(row):
+    """Повертає канонічний (хешований) ключ рядка"""
+    return tuple(row)
+
+
+def _set_difference(rows, other_rows):
+    keys = set(map(_row_key, other_rows))
+    for row in rows:
+        if _row_key(row) not in keys:
+            yield row
+
+
+def _bag_difference(rows, other_rows):
+    counts = Counter(map(_row_key, other_rows))
+    for row in rows:
+        key = _row_key(row)
+        if counts[key] > 0:
+            counts[key] -= 1
+        else:
+            yield row
+
+
+def _set_union(rows, other_rows):
+    seen = set()
+    for source in (rows, other_rows):
+        for row in source:
+            key = _row_key(row)
+            if key not in seen:
+                seen.add(key)
+                yield row
+
+
+def _bag_union(rows, other_rows):
+    yield from rows
+    yield from other_rows
+
+
+def _set_intersection(rows, other_rows):
+    keys = set(map(_row_key, other_rows))
+    seen = set()
+    for row in rows:
+        key = _row_key(row)
+        if key in keys and key not in seen:
+            seen.add(key)
+            yield row
+
+
+def _bag_intersection(rows, other_rows):
+    counts = Counter(map(_row_key, other_rows))
+    for row in rows:
+        key = _row_key(row)
+        if counts[key] > 0:
+            counts[key] -= 1
+            yield row
+
+
+# Перетворення зовнішніх (текстових або JSON) значень у значення колонок
+def parse_int(value):
+    if isinstance(value, bool) or isinstance(value, float):
+        raise ValidationError(f"Invalid int value {value!r}.")
+    return int(value)
+
+
+def parse_real(value):
+    if isinstance(value, bool):
+        raise ValidationError(f"Invalid real value {value!r}.")
+    return float(value)
+
+
+def parse_string(value):
+    if not isinstance(value, str):
+        raise ValidationError(f"Invalid string value {value!r}.")
+    return value
+
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def parse_date_interval(value):
+    """Приймає 'YYYY-MM-DD to YYYY-MM-DD', 'YYYY-MM-DD/YYYY-MM-DD' або пару дат"""
+    if isinstance(value, DateInterval):
+        return value
+    if isinstance(value, str):
+        start, separator, end = value.partition(" to ")
+        if not separator:
+            start, separator, end = value.partition("/")
+        if not separator:
+            raise ValidationError(f"Invalid date interval {value!r}.")
+        return DateInterval(date.fromisoformat(start.strip()), date.fromisoformat(end.strip()))
+    start, end = value
+    return DateInterval(parse_date(start), parse_date(end))
+
+
+# Дескриптори типів колонок
+class ColumnType:
+    """Тип колонки: назва, тип значень Python, перетворювач, обмеження довжини та діапазону значень"""
+
+    def __init__(self, name, py_type, parse, max_length=None, value_range=None):
+        self.name = name
+        self.py_type = py_type
+        self.parse = parse
+        self.max_length = max_length
+        self.value_range = value_range  # Пара (найменше, найбільше) допустимих значень
+
+    def __repr__(self):
+        return f"ColumnType({self.name!r})"
+
+    def __reduce__(self):
+        # Дескриптори — одиночні об'єкти, тому серіалізуються за назвою
+        return column_type, (self.name,)
+
+
+# Цілі зберігаються 64-бітними (колонкове сховище, бінарний формат)
+INT = ColumnType("int", int, parse_int, value_range=(-2 ** 63, 2 ** 63 - 1))
+REAL = ColumnType("real", float, parse_real)
+CHAR = ColumnType("char", str, parse_string, max_length=1)
+STRING = ColumnType("string", str, parse_string)
+DATE = ColumnType("date", date, parse_date)
+DATE_INTERVAL = ColumnType("dateInvl", DateInterval, parse_date_interval)
+
+COLUMN_TYPES = {column.name: column for column in (INT, REAL, CHAR, STRING, DATE, DATE_INTERVAL)}
+
+# Типи Python та альтернативні назви (наприклад, з database.json), що відповідають дескрипторам
+TYPE_ALIASES = {
+    **COLUMN_TYPES,
+    "str": STRING,
+    "float": REAL,
+    int: INT,
+    float: REAL,
+    str: STRING,
+    date: DATE,
+    DateInterval: DATE_INTERVAL,
+}
+
+
+def column_type(spec):
+    """Повертає дескриптор для ColumnType, типу Python або назви типу"""
+    if isinstance(spec, ColumnType):
+        return spec
+    try:
+        return TYPE_ALIASES[spec]
+    except (KeyError, TypeError):
+        raise SchemaError(f"Invalid column type {spec!r}.") from None
+
+
+def compile_validator(schema):
+    """Компілює схему в трійку функцій: швидку перевірку типів рядка, перевірку діапазонів значень
+    для пачки рядків і перевірку рядка з повідомленням про помилку"""
+    names = [field_name for field_name, _ in schema]
+    column_types = [column_type(field_type) for _, field_type in schema]
+    py_types = tuple(column.py_type for column in column_types)
+    limits = [(position, column.max_length) for position, column in enumerate(column_types)
+              if column.max_length is not None]
+    bounds = [(position, *column.value_range) for position, column in enumerate(column_types)
+              if column.value_range is not None]
+    width = len(py_types)
+
+    if limits:
+        def is_valid(row):
+            return (len(row) == width and all(map(isinstance, row, py_types))
+                    and all(len(row[position]) <= limit for position, limit in limits))
+    else:
+        def is_valid(row):
+            return len(row) == width and all(map(isinstance, row, py_types))
+
+    def in_range(rows):
+        # Діапазони перевіряються для всієї пачки по колонках — так швидше, ніж для кожного рядка
+        for position, lo, hi in bounds:
+            column = list(map(itemgetter(position), rows))
+            if column and (min(column) < lo or max(column) > hi):
+                return False
+        return True
+
+    def validate(row):
+        if is_valid(row):
+            for position, lo, hi in bounds:
+                if not lo <= row[position] <= hi:
+                    break
+            else:
+                return
+        # Повільний шлях лише для некоректних рядків: знаходимо першу помилку
+        if len(row) != width:
+            raise ValidationError("Row length does not match table schema.")
+        for field_name, column, value in zip(names, column_types, row):
+            if not isinstance(value, column.py_type):
+                raise ValidationError(
+                    f"Invalid type for field '{field_name}'. Expected {column.name}, got {type(value).__name__}.")
+            if column.max_length is not None and len(value) > column.max_length:
+                raise ValidationError(f"Invalid type for field '{field_name}'. "
+                                f"Expected {column.name}, got string with length > {column.max_length}.")
+            if column.value_range is not None and not column.value_range[0] <= value <= column.value_range[1]:
+                raise ValidationError(f"Value {value} for field '{field_name}' is out of range for {column.name}.")
+
+    return is_valid, in_range, validate
+
+
+# Типізовані колонки для колонкового сховища.
+# encode() перетворює значення у «сире» представлення колонки, не змінюючи її,
+# тому рядок можна закодувати повністю ще до вставки в колонки.
+class IntColumn:
+    typecode = "q"
+
+    def __init__(self):
+        self.values = array(self.typecode)
+
+    def encode(self, value):
+        if not INT.value_range[0] <= value <= INT.value_range[1]:
+            raise ValidationError("Integer value out of range for columnar storage.")
+        return value
+
+    def decode(self, raw):
+        return raw
+
+    def get(self, index):
+        return self.decode(self.values[index])
+
+    def decode_all(self):
+        return self.values.tolist()
+
+    def put(self, index, raw):
+        self.values[index] = raw
+
+    def insert(self, index, raw):
+        self.values.insert(index, raw)
+
+    def extend(self, raws):
+        self.values.extend(raws)
+
+    def delete(self, index):
+        del self.values[index]
+
+    def compress(self, selectors):
+        """Нова колонка лише з позначеними значеннями (словник рядків спільний, він лише доповнюється)"""
+        column = copy.copy(self)
+        column.values = array(self.typecode, compress(self.values, selectors))
+        return column
+
+    def memory_usage(self):
+        return sys.getsizeof(self.values)
+
+
+class RealColumn(IntColumn):
+    typecode = "d"
+
+    def encode(self, value):
+        return value
+
+
+def _dates(ordinals):
+    """Дати за порядковими номерами; однакові дати поділяють один об'єкт"""
+    cache = {}
+    return [cache.get(ordinal) or cache.setdefault(ordinal, date.fromordinal(ordinal)) for ordinal in ordinals]
+
+
+class DateColumn(IntColumn):
+    typecode = "i"  # Порядковий номер дня (date.toordinal)
+
+    def encode(self, value):
+        return value.toordinal()
+
+    def decode(self, raw):
+        return date.fromordinal(raw)
+
+    def decode_all(self):
+        return _dates(self.values)
+
+
+class DateIntervalColumn:
+    """Інтервали зберігаються парою масивів порядкових номерів початку й кінця"""
+
+    def __init__(self):
+        self.starts = array("i")
+        self.ends = array("i")
+
+    def encode(self, value):
+        return value.start_date.toordinal(), value.end_date.toordinal()
+
+    def get(self, index):
+        return _interval(date.fromordinal(self.starts[index]), date.fromordinal(self.ends[index]))
+
+    def decode_all(self):
+        return list(map(_interval, _dates(self.starts), _dates(self.ends)))
+
+    def put(self, index, raw):
+        self.starts[index], self.ends[index] = raw
+
+    def insert(self, index, raw):
+        self.starts.insert(index, raw[0])
+        self.ends.insert(index, raw[1])
+
+    def extend(self, raws):
+        self.starts.extend(start for start, _ in raws)
+        self.ends.extend(end for _, end in raws)
+
+    def delete(self, index):
+        del self.starts[index]
+        del self.ends[index]
+
+    def compress(self, selectors):
+        column = DateIntervalColumn()
+        column.starts = array("i", compress(self.starts, selectors))
+        column.ends = array("i", compress(self.ends, selectors))
+        return column
+
+    def memory_usage(self):
+        return sys.getsizeof(self.starts) + sys.getsizeof(self.ends)
+
+
+class StringColumn(IntColumn):
+    """Словникове кодування: кожен рядок зберігається один раз, у колонці — лише коди"""
+    typecode = "i"
+
+    def __init__(self):
+        super().__init__()
+        self.dictionary = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+    def decode(self, raw):
+        return self.dictionary[raw]
+
+    def decode_all(self):
+        return list(map(self.dictionary.__getitem__, self.values))
+
+    def memory_usage(self):
+        return (sys.getsizeof(self.values) + sys.getsizeof(self.dictionary) + sys.getsizeof(self.codes)
+                + sum(map(sys.getsizeof, self.dictionary)))
+
+
+COLUMN_CLASSES = {
+    INT: IntColumn,
+    REAL: RealColumn,
+    CHAR: StringColumn,
+    STRING: StringColumn,
+    DATE: DateColumn,
+    DATE_INTERVAL: DateIntervalColumn,
+}
+
+
+class ColumnStore(MutableSequence):
+    """Колонкове сховище рядків з тим самим інтерфейсом, що й список рядків"""
+
+    def __init__(self, schema):
+        self.names = [field_name for field_name, _ in schema]
+        self.columns = [COLUMN_CLASSES[column_type(field_type)]() for _, field_type in schema]
+        self._length = 0
+
+    @classmethod
+    def from_columns(cls, schema, columns, length):
+        """Створює сховище з уже заповнених колонок"""
+        store = cls(schema)
+        store.columns = columns
+        store._length = length
+        return store
+
+    def copy(self):
+        """Незалежна копія сховища (колонки копіюються)"""
+        store = copy.copy(self)
+        store.columns = [copy.deepcopy(column) for column in self.columns]
+        return store
+
+    def _position(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("row index out of range")
+        return index
+
+    def _encode(self, row):
+        return [column.encode(value) for column, value in zip(self.columns, row)]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        index = self._position(index)
+        return [column.get(index) for column in self.columns]
+
+    def __setitem__(self, index, row):
+        index = self._position(index)
+        for column, raw in zip(self.columns, self._encode(row)):
+            column.put(index, raw)
+
+    def __delitem__(self, index):
+        index = self._position(index)
+        for column in self.columns:
+            column.delete(index)
+        self._length -= 1
+
+    def insert(self, index, row):
+        # Та сама семантика, що й у list.insert
+        if index < 0:
+            index = max(index + self._length, 0)
+        index = min(index, self._length)
+        encoded = self._encode(row)
+        for column, raw in zip(self.columns, encoded):
+            column.insert(index, raw)
+        self._length += 1
+
+    def extend(self, rows):
+        # Спершу кодуємо всю пачку, щоб некоректне значення не лишило сховище доповненим частково
+        encoded = [self._encode(row) for row in rows]
+        for column, raws in zip(self.columns, zip(*encoded)):
+            column.extend(raws)
+        self._length += len(encoded)
+
+    def compress(self, selectors):
+        """Нове сховище лише з рядками, позначеними одиницями в байтовій масці selectors"""
+        store = copy.copy(self)
+        store.columns = [column.compress(selectors) for column in self.columns]
+        store._length = selectors.count(1)
+        return store
+
+    def memory_usage(self):
+        """Повертає кількість байтів, зайнятих кожною колонкою"""
+        return {name: column.memory_usage() for name, column in zip(self.names, self.columns)}
+
+
+def _value_size(value):
+    """Приблизний розмір значення комірки разом із вкладеними об'єктами"""
+    if isinstance(value, DateInterval):
+        return (sys.getsizeof(value) + sys.getsizeof(value.__dict__)
+                + sys.getsizeof(value.start_date) + sys.getsizeof(value.end_date))
+    return sys.getsizeof(value)
+
+
+def format_value(value):
+    """Текстове представлення значення для CSV"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, DateInterval):
+        return f"{value.start_date.isoformat()} to {value.end_date.isoformat()}"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def json_value(value):
+    """Представлення значення для JSON"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, DateInterval):
+        return [value.start_date.isoformat(), value.end_date.isoformat()]
+    return value
+
+
+def _json_rows(data, table=None, default_table=None):
+    """Записи з JSON: список записів, {"columns": [...], "rows": [...]} однієї таблиці або
+    {таблиця: {"columns": [...], "rows": [...]}} у форматі database.json.
+
+    З кількох таблиць береться table, інакше default_table (якщо вона є у файлі) або єдина таблиця.
+    """
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        raise SchemaError("Unsupported JSON layout: expected a list of records or an object with tables.")
+    if isinstance(data.get("rows"), list):
+        return data["rows"]
+    if table is None:
+        if default_table in data:
+            table = default_table
+        elif len(data) == 1:
+            table = next(iter(data))
+        else:
+            raise SchemaError(f"JSON file contains several tables ({', '.join(map(str, data))}); choose one.")
+    content = data.get(table)
+    if content is None:
+        raise SchemaError(f"Table '{table}' is not in the JSON file.")
+    if not isinstance(content, dict) or not isinstance(content.get("rows"), list):
+        raise SchemaError(f"Table '{table}' in the JSON file has no list of rows.")
+    return content["rows"]
+
+
+def read_records(f, format, header=True, table=None, default_table=None):
+    """Генерує пари (номер рядка файлу, запис) з файлу CSV, JSON-lines або JSON.
+
+    table і default_table вибирають таблицю з файлу JSON у форматі database.json (див. _json_rows).
+    """
+    if format == "csv":
+        import csv  # Модуль csv тягне за собою re; імпортуємо лише за потреби, щоб ядро швидко завантажувалось
+
+        reader = csv.reader(f)
+        if header:
+            names = next(reader, None)
+            if names is not None:
+                yield from ((reader.line_num, dict(zip(names, record))) for record in reader)
+                return
+        yield from ((reader.line_num, record) for record in reader)
+    elif format == "jsonl":
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield number, json.loads(line)
+    elif format == "json":
+        # Номер запису — його порядковий номер у списку рядків
+        yield from enumerate(_json_rows(json.load(f), table, default_table), 1)
+    else:
+        raise DatabaseError(f"Unknown format '{format}'.")
+
+
+class LoadReport:
+    """Результат масового завантаження: кількість доданих рядків і помилки відхилених"""
+
+    def __init__(self, max_errors=100):
+        self.loaded = 0
+        self.rejected = 0
+        self.errors = []  # Пари (номер рядка, повідомлення), не більше max_errors
+        self.max_errors = max_errors
+
+    def reject(self, number, error):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((number, str(error)))
+
+    def __repr__(self):
+        return f"LoadReport(loaded={self.loaded}, rejected={self.rejected})"
+
+
+# Перетворює маску видалених рядків на маску живих
+_ALIVE = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+
+
+STORAGES = {
+    "rows": lambda schema: [],
+    "columnar": ColumnStore,
+}
+
+# Номери версій таблиць: кожен стан рядків будь-якої таблиці має власний номер
+_VERSIONS = count(1)
+
+
+# Вторинні індекси. Індекс зберігає стабільні ідентифікатори рядків і підтримується
+# таблицею інкрементально; при збереженні на диск зберігається лише його опис,
+# а самі дані перебудовуються при першому зверненні.
+class _Index:
+    """Спільна частина індексів.
+
+    Запис індексу — кортеж, останній елемент якого є ідентифікатором рядка.
+    Видалений запис лише позначається в множині removed і відкидається під час
+    запитів; структура індексу перебудовується, коли позначених записів стає
+    більше за частку purge_ratio. Так видалення коштує O(1) в середньому.
+    """
+    purge_ratio = 0.25
+
+    def __init__(self, column, field_position):
+        self.column = column
+        self.field_position = field_position
+        self.built = False
+        self.removed = set()  # Видалені записи, що ще лежать у структурі індексу
+        self.size = 0  # Кількість записів у структурі разом із видаленими
+        self._store([])
+
+    def __getstate__(self):
+        return {"column": self.column, "field_position": self.field_position}
+
+    def __setstate__(self, state):
+        self.__init__(state["column"], state["field_position"])
+
+    def build(self, items):
+        """Будує індекс з пар (ідентифікатор рядка, рядок)"""
+        entries = [self._entry(row_id, row) for row_id, row in items]
+        self._store(entries)
+        self.size = len(entries)
+        self.removed = set()
+        self.built = True
+
+    def copy(self):
+        index = object.__new__(type(self))
+        index.__dict__.update(self.__dict__)
+        index.removed = set(self.removed)
+        index._copy_store()
+        return index
+
+    def insert(self, row_id, row):
+        entry = self._entry(row_id, row)
+        if entry in self.removed:
+            # Запис ще не вичищено зі структури — досить зняти позначку
+            self.removed.discard(entry)
+        else:
+            self._insert(entry)
+            self.size += 1
+
+    def remove(self, row_id, row):
+        self.removed.add(self._entry(row_id, row))
+        if len(self.removed) > self.size * self.purge_ratio:
+            entries = [entry for entry in self._all_entries() if entry not in self.removed]
+            self._store(entries)
+            self.size = len(entries)
+            self.removed = set()
+
+    def _live(self, entries):
+        """Ідентифікатори рядків для невидалених записів"""
+        if self.removed:
+            removed = self.removed
+            return [entry[-1] for entry in entries if entry not in removed]
+        return [entry[-1] for entry in entries]
+
+
+class HashIndex(_Index):
+    """Хеш-індекс для пошуку за рівністю: значення -> відсортовані ідентифікатори рядків"""
+    kind = "hash"
+
+    def _entry(self, row_id, row):
+        return row[self.field_position], row_id
+
+    def _store(self, entries):
+        groups = {}
+        for value, row_id in entries:
+            groups.setdefault(value, []).append(row_id)
+        for row_ids in groups.values():
+            row_ids.sort()
+        self.entries = groups
+
+    def _copy_store(self):
+        self.entries = {value: list(row_ids) for value, row_ids in self.entries.items()}
+
+    def _insert(self, entry):
+        value, row_id = entry
+        insort(self.entries.setdefault(value, []), row_id)
+
+    def _all_entries(self):
+        return [(value, row_id) for value, row_ids in self.entries.items() for row_id in row_ids]
+
+    def lookup(self, value):
+        row_ids = self.entries.get(value, ())
+        if self.removed:
+            removed = self.removed
+            return [row_id for row_id in row_ids if (value, row_id) not in removed]
+        return list(row_ids)
+
+
+class SortedIndex(_Index):
+    """Відсортований індекс для діапазонних запитів: список пар (значення, ідентифікатор рядка)"""
+    kind = "sorted"
+    supported_types = (int, float, date)
+
+    def _entry(self, row_id, row):
+        return row[self.field_position], row_id
+
+    def _store(self, entries):
+        entries.sort()
+        self.entries = entries
+
+    def _copy_store(self):
+        self.entries = list(self.entries)
+
+    def _insert(self, entry):
+        insort(self.entries, entry)
+
+    def _all_entries(self):
+        return self.entries
+
+    def ordered(self):
+        """Ідентифікатори всіх рядків, упорядковані за значенням"""
+        return self._live(self.entries)
+
+    def range(self, lo=None, hi=None):
+        start = 0 if lo is None else bisect_left(self.entries, (lo,))
+        stop = len(self.entries) if hi is None else bisect_right(self.entries, (hi, float("inf")))
+        return self._live(self.entries[start:stop])
+
+    def lookup(self, value):
+        return sorted(self.range(value, value))
+
+
+class IntervalIndex(_Index):
+    """Індекс інтервалів дат для запитів на перетин і вкладеність.
+
+    Інтервали розкладені по групах за довжиною: у групі k довжина (у днях) лежить
+    у межах [2^(k-1), 2^k). Усередині групи записи (початок, кінець, ідентифікатор)
+    відсортовані за початком, тож для кожної групи вікно кандидатів знаходиться
+    бінарним пошуком, а зайвих кандидатів не більше, ніж вміщує вікно шириною 2^(k-1).
+    """
+    kind = "interval"
+    supported_types = (DateInterval,)
+
+    def _entry(self, row_id, row):
+        interval = row[self.field_position]
+        return interval.start_date.toordinal(), interval.end_date.toordinal(), row_id
+
+    def _store(self, entries):
+        buckets = {}  # Рівень довжини -> відсортований список записів
+        for entry in entries:
+            buckets.setdefault((entry[1] - entry[0]).bit_length(), []).append(entry)
+        for bucket in buckets.values():
+            bucket.sort()
+        self.buckets = buckets
+
+    def _copy_store(self):
+        self.buckets = {level: list(entries) for level, entries in self.buckets.items()}
+
+    def _insert(self, entry):
+        insort(self.buckets.setdefault((entry[1] - entry[0]).bit_length(), []), entry)
+
+    def _all_entries(self):
+        return [entry for entries in self.buckets.values() for entry in entries]
+
+    def overlaps(self, start, end):
+        """Ідентифікатори рядків з інтервалами, що перетинаються з [start, end]"""
+        lo, hi = start.toordinal(), end.toordinal()
+        candidates = []
+        for level, entries in self.buckets.items():
+            first = bisect_left(entries, (lo - (1 << level) + 1,))
+            last = bisect_right(entries, (hi, float("inf")))
+            candidates.extend(entry for entry in entries[first:last] if entry[1] >= lo)
+        result = self._live(candidates)
+        result.sort()
+        return result
+
+    def contains(self, day):
+        """Ідентифікатори рядків з інтервалами, що містять дату day"""
+        return self.overlaps(day, day)
+
+    def within(self, start, end):
+        """Ідентифікатори рядків з інтервалами, що повністю лежать у межах [start, end]"""
+        lo, hi = start.toordinal(), end.toordinal()
+        candidates = []
+        for level, entries in self.buckets.items():
+            min_length = (1 << level) >> 1
+            first = bisect_left(entries, (lo,))
+            last = bisect_right(entries, (hi - min_length, float("inf")))
+            candidates.extend(entry for entry in entries[first:last] if entry[1] <= hi)
+        result = self._live(candidates)
+        result.sort()
+        return result
+
+
+INDEX_KINDS = {
+    "hash": HashIndex,
+    "sorted": SortedIndex,
+    "interval": IntervalIndex,
+}
+
+
+# Клас для таблиці
+class Table:
+    def __init__(self, name, schema, storage="rows"):
+        if storage not in STORAGES:
+            raise SchemaError(f"Unknown storage '{storage}'.")
+        self.name = name
+        self.schema = schema  # Список пар (ім'я атрибуту, тип атрибуту)
+        self.column_types = [column_type(field_type) for _, field_type in schema]
+        self.storage = storage
+        self.indexes = {}  # Ім'я колонки -> індекс
+        self.version = next(_VERSIONS)
+        self._changes = None  # Журнал змін рядків, якщо його ведуть (див. track_changes)
+        self._readers = None  # Знімки, які бачать цю версію таблиці (див. Database.snapshot)
+        self.rows = STORAGES[storage](schema)
+        self._listeners = []  # Підписники на зміни рядків
+        self._is_valid, self._in_range, self._validate = compile_validator(schema)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attribute in ("_listeners", "_is_valid", "_in_range", "_validate", "version", "_changes", "_readers"):
+            del state[attribute]
+        # Знімок може записуватись у фоні, тому видалені рядки відкидаємо в копії
+        state["_rows"], state["_ids"] = self.compacted()
+        state["_dead"], state["_dead_count"], state["_dead_slots"] = None, 0, None
+        return state
+
+    def __setstate__(self, state):
+        # Таблиці, збережені попередніми версіями, не мають сховища, індексів і дескрипторів типів
+        state.setdefault("storage", "rows")
+        state.setdefault("indexes", {})
+        state.setdefault("column_types", [column_type(field_type) for _, field_type in state["schema"]])
+        # До появи ідентифікаторів рядки зберігались в атрибуті rows
+        rows = state.pop("rows", None)
+        state.setdefault("_dead_slots", None)
+        self.__dict__.update(state)
+        self.version = next(_VERSIONS)
+        self._changes = None
+        self._readers = None
+        if rows is not None:
+            self.rows = rows
+        self._listeners = []
+        self._is_valid, self._in_range, self._validate = compile_validator(self.schema)
+
+    def _notify(self, operation, *args):
+        for listener in self._listeners:
+            listener(self, operation, args)
+
+    # Версія таблиці змінюється з кожною зміною рядків. Номери версій унікальні в межах
+    # процесу, тож пара (таблиця, версія) однозначно задає вміст рядків — на цьому
+    # побудований кеш результатів (див. cache). Для інкрементного оновлення кешованих
+    # результатів таблиця може вести обмежений журнал змін рядків.
+    change_log_size = 1024
+
+    def _changed(self, removed=(), added=()):
+        """Нова версія таблиці; removed і added — пари (ідентифікатор, рядок)"""
+        version = next(_VERSIONS)
+        if self._changes is not None:
+            self._changes.append((self.version, version, tuple(removed), tuple(added)))
+        self.version = version
+
+    def track_changes(self):
+        """Вмикає журнал змін рядків, з якого changes_since бере зміни між версіями"""
+        if self._changes is None:
+            self._changes = deque(maxlen=self.change_log_size)
+
+    def changes_since(self, version):
+        """Зміни рядків після версії version: пари (видалені, додані) списків (ідентифікатор, рядок).
+
+        Видалені рядки — стан до змін, додані — поточний стан; змінений рядок є в обох.
+        Повертає None, якщо журнал змін не охоплює цю версію.
+        """
+        if version == self.version:
+            return [], []
+        if self._changes is None:
+            return None
+        entries = []
+        for entry in reversed(self._changes):
+            entries.append(entry)
+            if entry[0] == version:
+                break
+        else:
+            return None
+        before, after = {}, {}
+        for _, _, removed, added in reversed(entries):
+            for row_id, row in removed:
+                before.setdefault(row_id, row)
+                after[row_id] = None
+            for row_id, row in added:
+                before.setdefault(row_id, None)
+                after[row_id] = row
+        return ([(row_id, row) for row_id, row in before.items() if row is not None],
+                [(row_id, row) for row_id, row in after.items() if row is not None])
+
+    def _field_position(self, column):
+        for position, (field_name, _) in enumerate(self.schema):
+            if field_name == column:
+                return position
+        raise SchemaError(f"Column '{column}' does not exist.")
+
+    # Кожен рядок має стабільний ідентифікатор, що не змінюється при видаленні інших
+    # рядків. Фізичне сховище _rows може містити видалені рядки, позначені в масці
+    # _dead, а зростаючий масив _ids зберігає ідентифікатор кожної комірки сховища.
+    # Видалення лише ставить позначку, а сховище ущільнюється, коли частка видалених
+    # рядків перевищує compact_ratio або коли потрібен список рядків (table.rows).
+    # Для доступу за позицією без ущільнення ведеться відсортований список комірок
+    # видалених рядків _dead_slots (None — ще не побудований).
+    compact_ratio = 0.25
+
+    @property
+    def rows(self):
+        """Рядки таблиці у порядку позицій (видалені рядки спершу прибираються)"""
+        if self._dead_count:
+            self.compact()
+        self._sync_ids()
+        return self._rows
+
+    @rows.setter
+    def rows(self, rows):
+        self._unshare()
+        self._rows = rows
+        self._next_id = 0
+        self._renumber()
+
+    def _renumber(self):
+        """Призначає всім рядкам нові ідентифікатори; індекси перебудуються при наступному запиті"""
+        self.version = next(_VERSIONS)
+        if self._changes is not None:
+            self._changes.clear()
+        self._ids = array("q", range(self._next_id, self._next_id + len(self._rows)))
+        self._next_id += len(self._rows)
+        self._dead = None
+        self._dead_count = 0
+        self._dead_slots = None
+        for index in self.indexes.values():
+            index.built = False
+
+    def _sync_ids(self):
+        """Узгоджує ідентифікатори з рядками, доданими чи видаленими напряму через table.rows"""
+        missing = len(self._rows) - len(self._ids)
+        if missing > 0:
+            self._ids.extend(range(self._next_id, self._next_id + missing))
+            if self._dead is not None:
+                self._dead.extend(bytes(missing))
+            self._next_id += missing
+            self._changed(added=() if self._changes is None else
+                          zip(self._ids[-missing:], self._rows[len(self._rows) - missing:]))
+        elif missing < 0:
+            self._renumber()
+
+    def compacted(self):
+        """Повертає сховище та ідентифікатори без видалених рядків, не змінюючи таблицю"""
+        self._sync_ids()
+        if not self._dead_count:
+            return self._rows, self._ids
+        alive = self._dead.translate(_ALIVE)
+        if isinstance(self._rows, ColumnStore):
+            rows = self._rows.compress(alive)
+        else:
+            rows = list(compress(self._rows, alive))
+        return rows, array("q", compress(self._ids, alive))
+
+    def compact(self):
+        """Фізично прибирає видалені рядки; ідентифікатори рядків та індекси не змінюються"""
+        self._rows, self._ids = self.compacted()
+        self._dead = None
+        self._dead_count = 0
+        self._dead_slots = None
+
+    def _slot(self, row_id):
+        """Комірка сховища живого рядка з ідентифікатором row_id"""
+        self._sync_ids()
+        ids = self._ids
+        if ids and ids[-1] - ids[0] == len(ids) - 1:
+            # Видалені рядки лишаються у сховищі до ущільнення, тож пропусків в ідентифікаторах зазвичай немає
+            slot = row_id - ids[0]
+        else:
+            slot = bisect_left(ids, row_id)
+        if not 0 <= slot < len(ids) or ids[slot] != row_id or (self._dead is not None and self._dead[slot]):
+            raise DatabaseError(f"Row {row_id} does not exist.")
+        return slot
+
+    def _position_slot(self, row_index):
+        """Комірка сховища рядка в позиції row_index (від'ємні позиції рахуються з кінця)"""
+        self._sync_ids()
+        size = len(self._rows) - self._dead_count
+        if not -size <= row_index < size:
+            raise DatabaseError("Invalid row index.")
+        position = row_index % size
+        if not self._dead_count:
+            return position
+        dead = self._dead_slots
+        if dead is None:
+            dead = self._dead_slots = list(compress(range(len(self._dead)), self._dead))
+        # dead[i] - i — кількість живих рядків перед i-ю видаленою коміркою; рахуємо
+        # видалені комірки, що передують рядку, і зсуваємо позицію на їхню кількість
+        lo, hi = 0, len(dead)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if dead[middle] - middle <= position:
+                lo = middle + 1
+            else:
+                hi = middle
+        return position + lo
+
+    def _positions(self, row_ids):
+        """Переводить ідентифікатори живих рядків у їхні поточні позиції"""
+        if self._dead_count:
+            self.compact()
+        ids = self._ids
+        if not ids:
+            return []
+        first = ids[0]
+        if ids[-1] - first == len(ids) - 1:
+            # Без пропусків в ідентифікаторах позиція — просто зсув
+            return [row_id - first for row_id in row_ids]
+        return [bisect_left(ids, row_id) for row_id in row_ids]
+
+    def _items(self):
+        """Пари (ідентифікатор, рядок) для живих рядків без ущільнення сховища"""
+        self._sync_ids()
+        if not self._dead_count:
+            return zip(self._ids, self._rows)
+        return ((row_id, row) for row_id, row, dead in zip(self._ids, self._rows, self._dead) if not dead)
+
+    def row_ids(self):
+        """Повертає ідентифікатори рядків у порядку їхніх позицій"""
+        return [row_id for row_id, _ in self._items()]
+
+    def get_row(self, row_id):
+        """Повертає рядок за ідентифікатором"""
+        return self._rows[self._slot(row_id)]
+
+    def rows_by_ids(self, row_ids):
+        """Генерує рядки за ідентифікаторами (зі сховища таблиці на момент виклику)"""
+        rows = self._rows
+        return (rows[slot] for slot in [self._slot(row_id) for row_id in row_ids])
+
+    def iter_rows(self):
+        """Ітератор по рядках таблиці, що не ущільнює сховище"""
+        self._sync_ids()
+        if not self._dead_count:
+            return iter(self._rows)
+        return compress(self._rows, self._dead.translate(_ALIVE))
+
+    def _built_indexes(self):
+        """Повертає індекси, які потрібно підтримувати при зміні рядків"""
+        return [index for index in self.indexes.values() if index.built]
+
+    def get_index(self, column):
+        """Повертає індекс колонки (перебудувавши його за потреби) або None"""
+        index = self.indexes.get(column)
+        if index is not None and not index.built:
+            if self._readers:
+                # Знімки читають таблицю без блокування, тож спільний індекс не будується на місці
+                index = type(index)(index.column, index.field_position)
+            index.build(self._items())
+        return index
+
+    def create_index(self, column, kind="hash"):
+        """Створює вторинний індекс на колонці"""
+        if kind not in INDEX_KINDS:
+            raise SchemaError(f"Unknown index kind '{kind}'.")
+        if column in self.indexes:
+            raise SchemaError(f"Index on column '{column}' already exists.")
+        field_position = self._field_position(column)
+        index_class = INDEX_KINDS[kind]
+        field_type = self.column_types[field_position].py_type
+        supported_types = getattr(index_class, "supported_types", None)
+        if supported_types is not None and field_type not in supported_types:
+            raise SchemaError(f"Index kind '{kind}' is not supported for column '{column}'.")
+        index = index_class(column, field_position)
+        index.build(self._items())
+        self._unshare()
+        self.indexes[column] = index
+        self._notify("create_index", column, kind)
+        return index
+
+    def drop_index(self, column):
+        """Видаляє індекс з колонки"""
+        if column not in self.indexes:
+            raise SchemaError(f"Index on column '{column}' does not exist.")
+        self._unshare()
+        index = self.indexes.pop(column)
+        self._notify("drop_index", column, index.kind)
+
+    # Запити повертають позиції рядків, а з by_id=True — їхні ідентифікатори
+    def lookup(self, column, value, by_id=False):
+        """Повертає позиції рядків, у яких значення колонки дорівнює value"""
+        index = self.get_index(column)
+        if index is not None and hasattr(index, "lookup"):
+            row_ids = index.lookup(value)
+        else:
+            field_position = self._field_position(column)
+            row_ids = [row_id for row_id, row in self._items() if row[field_position] == value]
+        return row_ids if by_id else self._positions(row_ids)
+
+    def range(self, column, lo=None, hi=None, by_id=False):
+        """Повертає позиції рядків зі значенням колонки в межах [lo, hi], впорядковані за значенням"""
+        index = self.get_index(column)
+        if isinstance(index, SortedIndex):
+            row_ids = index.range(lo, hi)
+        else:
+            field_position = self._field_position(column)
+            matches = [(row[field_position], row_id) for row_id, row in self._items()
+                       if (lo is None or lo <= row[field_position]) and (hi is None or row[field_position] <= hi)]
+            row_ids = [row_id for _, row_id in sorted(matches)]
+        return row_ids if by_id else self._positions(row_ids)
+
+    def _interval_query(self, column, query, start, end, by_id):
+        index = self.get_index(column)
+        if isinstance(index, IntervalIndex):
+            row_ids = getattr(index, query)(start, end)
+        else:
+            field_position = self._field_position(column)
+            if query == "overlaps":
+                matches = lambda interval: interval.start_date <= end and interval.end_date >= start
+            else:
+                matches = lambda interval: interval.start_date >= start and interval.end_date <= end
+            row_ids = [row_id for row_id, row in self._items() if matches(row[field_position])]
+        return row_ids if by_id else self._positions(row_ids)
+
+    def overlaps(self, column, start, end, by_id=False):
+        """Повертає позиції рядків, інтервал яких перетинається з [start, end]"""
+        return self._interval_query(column, "overlaps", start, end, by_id)
+
+    def contains(self, column, day, by_id=False):
+        """Повертає позиції рядків, інтервал яких містить дату day"""
+        return self._interval_query(column, "overlaps", day, day, by_id)
+
+    def within(self, column, start, end, by_id=False):
+        """Повертає позиції рядків, інтервал яких лежить у межах [start, end]"""
+        return self._interval_query(column, "within", start, end, by_id)
+
+    def validate_row(self, row_data):
+        """Перевіряє, чи відповідають дані рядка схемі таблиці"""
+        self._validate(row_data)
+
+    def validate_rows(self, rows):
+        """Перевіряє пачку рядків; повертає пари (позиція, повідомлення) для некоректних"""
+        is_valid, in_range = self._is_valid, self._in_range
+        suspects = [position for position, row in enumerate(rows) if not is_valid(row)]
+        if not in_range([row for row in rows if is_valid(row)] if suspects else rows):
+            # Значення поза діапазоном трапляються рідко — тоді перевіряємо кожен рядок окремо
+            suspects = [position for position, row in enumerate(rows) if not (is_valid(row) and in_range((row,)))]
+        errors = []
+        for position in suspects:
+            try:
+                self._validate(rows[position])
+            except ValidationError as e:
+                errors.append((position, str(e)))
+        return errors
+
+    def add_row(self, row_data):
+        """Додає рядок у таблицю після валідації; повертає ідентифікатор рядка"""
+        self.validate_row(row_data)
+        self._unshare()
+        self._sync_ids()
+        row_id = self._next_id
+        self._rows.append(row_data)
+        self._ids.append(row_id)
+        if self._dead is not None:
+            self._dead.append(0)
+        self._next_id += 1
+        for index in self._built_indexes():
+            index.insert(row_id, row_data)
+        if self._changes is None:
+            self.version = next(_VERSIONS)
+        else:
+            self._changed(added=((row_id, row_data),))
+        self._notify("add_row", row_data, row_id)
+        return row_id
+
+    def restore_row(self, row_id, row_data):
+        """Повертає видалений рядок з тим самим ідентифікатором на його місце (для скасування видалення)"""
+        self.validate_row(row_data)
+        self._unshare()
+        self._sync_ids()
+        slot = bisect_left(self._ids, row_id)
+        if slot < len(self._ids) and self._ids[slot] == row_id:
+            if self._dead is None or not self._dead[slot]:
+                raise DatabaseError(f"Row {row_id} already exists.")
+            self._rows[slot] = row_data
+            self._dead[slot] = 0
+            self._dead_count -= 1
+        else:
+            self._rows.insert(slot, row_data)
+            self._ids.insert(slot, row_id)
+            if self._dead is not None:
+                self._dead.insert(slot, 0)
+            self._next_id = max(self._next_id, row_id + 1)
+        self._dead_slots = None
+        for index in self._built_indexes():
+            index.insert(row_id, row_data)
+        self._changed(added=((row_id, row_data),))
+        self._notify("restore_row", row_id, row_data)
+
+    def edit_row(self, row_index, new_data, by_id=False):
+        """Редагує рядок за позицією (або за ідентифікатором, якщо by_id) і повертає старі дані.
+
+        Некоректний рядок спричиняє ValidationError.
+        """
+        slot = self._slot(row_index) if by_id else self._position_slot(row_index)
+        old_data = self._rows[slot]
+        self.validate_row(new_data)
+        self._unshare()
+        self._rows[slot] = new_data
+        row_id = self._ids[slot]
+        for index in self._built_indexes():
+            index.remove(row_id, old_data)
+            index.insert(row_id, new_data)
+        if self._changes is None:
+            self.version = next(_VERSIONS)
+        else:
+            self._changed(((row_id, old_data),), ((row_id, new_data),))
+        self._notify("edit_row", row_id, new_data, old_data)
+        return old_data
+
+    def delete_row(self, row_index, by_id=False):
+        """Видаляє рядок за позицією (або за ідентифікатором, якщо by_id) і повертає його дані"""
+        if by_id:
+            slot = self._slot(row_index)
+        elif row_index < 0:
+            raise DatabaseError("Invalid row index.")
+        else:
+            slot = self._position_slot(row_index)
+        self._unshare()
+        row_id = self._ids[slot]
+        row_data = self._rows[slot]
+        if slot == len(self._rows) - 1:
+            # Останній рядок прибираємо одразу
+            del self._rows[slot]
+            del self._ids[slot]
+            if self._dead is not None:
+                del self._dead[slot]
+        else:
+            if self._dead is None:
+                self._dead = bytearray(len(self._rows))
+            self._dead[slot] = 1
+            self._dead_count += 1
+            if self._dead_slots is not None:
+                insort(self._dead_slots, slot)
+        for index in self._built_indexes():
+            index.remove(row_id, row_data)
+        if self._changes is None:
+            self.version = next(_VERSIONS)
+        else:
+            self._changed(removed=((row_id, row_data),))
+        self._notify("delete_row", row_id, row_data)
+        if self._dead_count > len(self._rows) * self.compact_ratio:
+            self.compact()
+        return row_data
+
+    def add_rows(self, rows, each=False):
+        """Додає пачку рядків; якщо хоч один некоректний, не додається жоден.
+
+        Повертає ідентифікатори доданих рядків (range). З each=True про кожен рядок
+        повідомляється окремою подією add_row, тож кожен рядок скасовується окремо.
+        """
+        rows = list(rows)
+        errors = self.validate_rows(rows)
+        if errors:
+            position, message = errors[0]
+            raise ValidationError(f"Row {position}: {message}")
+        return self._append_rows(rows, each)
+
+    def _append_rows(self, rows, each=False):
+        """Додає вже перевірені рядки однією пачкою; повертає їхні ідентифікатори"""
+        self._unshare()
+        self._sync_ids()
+        first_id = self._next_id
+        self._rows.extend(rows)
+        self._ids.extend(range(first_id, first_id + len(rows)))
+        if self._dead is not None:
+            self._dead.extend(bytes(len(rows)))
+        self._next_id += len(rows)
+        for index in self._built_indexes():
+            for row_id, row in enumerate(rows, first_id):
+                index.insert(row_id, row)
+        self._changed(added=zip(range(first_id, first_id + len(rows)), rows))
+        if each:
+            for row_id, row in enumerate(rows, first_id):
+                self._notify("add_row", row, row_id)
+        else:
+            self._notify("add_rows", rows, first_id)
+        return range(first_id, first_id + len(rows))
+
+    def bulk_load(self, source, format="csv", header=True, batch_size=10_000, max_errors=100, source_table=None):
+        """Масово завантажує рядки з файлу або з ітерованого набору записів.
+
+        Записи можуть бути списками значень у порядку схеми або словниками за іменами
+        колонок. Некоректні рядки не зупиняють завантаження, а потрапляють у звіт.
+        source_table — таблиця файлу JSON у форматі database.json; за замовчуванням
+        береться таблиця з тим самим ім'ям або єдина таблиця файлу.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, newline="", encoding="utf-8") as f:
+                records = read_records(f, format, header, source_table, self.name)
+                return self._load_records(records, batch_size, max_errors)
+        return self._load_records(enumerate(source, 1), batch_size, max_errors)
+
+    def _load_records(self, records, batch_size, max_errors):
+        report = LoadReport(max_errors)
+        names = [field_name for field_name, _ in self.schema]
+        converters = [column.parse for column in self.column_types]
+        batch, numbers = [], []
+        for number, record in records:
+            try:
+                if isinstance(record, dict):
+                    missing = [name for name in names if name not in record]
+                    if missing:
+                        raise ValidationError(f"Missing value for column '{missing[0]}'.")
+                    record = [record[name] for name in names]
+                if len(record) != len(converters):
+                    raise ValidationError("Row length does not match table schema.")
+                batch.append([convert(value) for convert, value in zip(converters, record)])
+                numbers.append(number)
+            except Exception as e:
+                report.reject(number, e)
+                continue
+            if len(batch) >= batch_size:
+                self._load_batch(batch, numbers, report)
+                batch, numbers = [], []
+        if batch:
+            self._load_batch(batch, numbers, report)
+        return report
+
+    def _load_batch(self, batch, numbers, report):
+        errors = self.validate_rows(batch)
+        for position, message in errors:
+            report.reject(numbers[position], message)
+        if errors:
+            invalid = {position for position, _ in errors}
+            batch = [row for position, row in enumerate(batch) if position not in invalid]
+            numbers = [number for position, number in enumerate(numbers) if position not in invalid]
+        try:
+            self._append_rows(batch)
+        except ValidationError:
+            # Сховище відхилило значення, яке пропустив валідатор: додаємо рядки поодинці,
+            # щоб відхилити лише некоректні (пачка не додається частково, див. ColumnStore.extend)
+            for row, number in zip(batch, numbers):
+                try:
+                    self._append_rows([row])
+                except ValidationError as e:
+                    report.reject(number, e)
+                else:
+                    report.loaded += 1
+            return
+        report.loaded += len(batch)
+
+    def export(self, target, format="csv", header=True):
+        """Потоково записує рядки таблиці у файл CSV або JSON-lines; повертає кількість рядків"""
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, "w", newline="", encoding="utf-8") as f:
+                return self.export(f, format, header)
+        count = 0
+        if format == "csv":
+            import csv
+
+            writer = csv.writer(target)
+            if header:
+                writer.writerow([field_name for field_name, _ in self.schema])
+            for row in self.iter_rows():
+                writer.writerow([format_value(value) for value in row])
+                count += 1
+        elif format == "jsonl":
+            for row in self.iter_rows():
+                target.write(json.dumps([json_value(value) for value in row], ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            raise DatabaseError(f"Unknown format '{format}'.")
+        return count
+
+    def view_table(self):
+        """Повертає усі рядки таблиці"""
+        return self.rows
+
+    def ordered_positions(self, column, descending=False):
+        """Повертає позиції рядків, упорядковані за колонкою (з відсортованого індексу, якщо він є)"""
+        index = self.get_index(column)
+        if isinstance(index, SortedIndex):
+            positions = self._positions(index.ordered())
+        else:
+            field_position = self._field_position(column)
+            values = [row[field_position] for row in self.rows]
+            if self.column_types[field_position] is DATE_INTERVAL:
+                values = [(interval.start_date, interval.end_date) for interval in values]
+            positions = sorted(range(len(values)), key=values.__getitem__)
+        if descending:
+            positions.reverse()
+        return positions
+
+    def page(self, offset, limit, order=None):
+        """Повертає сторінку рядків; order — список позицій, що задає порядок рядків"""
+        if order is None:
+            return list(self.rows[offset:offset + limit])
+        rows = self.rows
+        return [rows[position] for position in order[offset:offset + limit]]
+
+    def query(self):
+        """Повертає лінивий запит до таблиці (див. query.Query)"""
+        from query import Query
+
+        return Query(self)
+
+    def copy(self):
+        """Нова версія таблиці: об'єкти рядків спільні, а сховище та індекси скопійовані"""
+        table = object.__new__(Table)
+        table.__dict__.update(self.__dict__)
+        table._copy_storage()
+        table._listeners = []
+        table._readers = None
+        return table
+
+    def _copy_storage(self):
+        self._rows = self._rows.copy()
+        self._ids = self._ids[:]
+        if self._dead is not None:
+            self._dead = bytearray(self._dead)
+        if self._dead_slots is not None:
+            self._dead_slots = self._dead_slots[:]
+        if self._changes is not None:
+            self._changes = self._changes.copy()
+        self.indexes = {column: index.copy() for column, index in self.indexes.items()}
+
+    # Знімок бази (Database.snapshot) бачить опубліковані таблиці без копіювання. Перед
+    # першою зміною такої таблиці знімки отримують її поточну версію, а сама таблиця
+    # далі працює з копіями сховища та індексів, як копія в транзакції; тож посилання
+    # на таблицю лишаються дійсними, а копіювання відбувається, лише поки є знімки.
+    # Таблиця, яку бачать знімки, не має видалених рядків (її ущільнено при створенні
+    # знімка), а її індекси не будуються на місці.
+
+    def _share(self, snapshot):
+        """Позначає, що знімок бачить цю версію таблиці"""
+        if not self._readers:
+            # Поки жоден знімок не читає таблицю, її ще можна ущільнити
+            if self._dead_count:
+                self.compact()
+            self._readers = WeakSet()
+        self._readers.add(snapshot)
+
+    def _unshare(self):
+        """Відокремлює від змін таблиці знімки, які бачать її поточну версію"""
+        readers = self._readers
+        if not readers:
+            return
+        version = object.__new__(Table)
+        version.__dict__.update(self.__dict__)
+        version._listeners = []
+        for snapshot in readers:
+            snapshot._versions[self.name] = version
+        self._readers = None
+        self._copy_storage()
+
+    def stats(self):
+        """Кількість живих і ще не прибраних видалених рядків, сховище та індекси таблиці"""
+        self._sync_ids()
+        return {
+            "rows": len(self._rows) - self._dead_count,
+            "deleted": self._dead_count,
+            "storage": self.storage,
+            "indexes": {column: index.kind for column, index in self.indexes.items()},
+        }
+
+    def get_schema(self):
+        """Повертає схему таблиці"""
+        return self.schema
+
+    def memory_usage(self):
+        """Повертає приблизний обсяг пам'яті (у байтах) для кожної колонки"""
+        if isinstance(self.rows, ColumnStore):
+            return self.rows.memory_usage()
+        usage = {field_name: 0 for field_name, _ in self.schema}
+        for row in self.rows:
+            for (field_name, _), value in zip(self.schema, row):
+                usage[field_name] += _value_size(value)
+        # Самі списки рядків (разом із вказівниками на комірки)
+        usage["(rows)"] = sys.getsizeof(self.rows) + sum(map(sys.getsizeof, self.rows))
+        return usage
+
+    def _check_same_schema(self, other_table, operation):
+        names = [field_name for field_name, _ in self.schema]
+        other_names = [field_name for field_name, _ in other_table.schema]
+        if names != other_names or self.column_types != other_table.column_types:
+            raise SchemaError(f"Schemas do not match. Cannot compute {operation}.")
+
+    def iter_difference(self, other_table, bag=False):
+        """Генерує рядки цієї таблиці, яких немає в іншій.
+
+        Без bag кожен рядок перевіряється лише на наявність в іншій таблиці
+        (дублікати цієї таблиці зберігаються); з bag=True віднімається мультимножина.
+        """
+        self._check_same_schema(other_table, "difference")
+        engine = _bag_difference if bag else _set_difference
+        return engine(self.rows, other_table.rows)
+
+    def iter_union(self, other_table, bag=False):
+        """Генерує об'єднання двох таблиць (bag=True — без усунення дублікатів)"""
+        self._check_same_schema(other_table, "union")
+        engine = _bag_union if bag else _set_union
+        return engine(self.rows, other_table.rows)
+
+    def iter_intersection(self, other_table, bag=False):
+        """Генерує перетин двох таблиць (bag=True — з урахуванням кратності)"""
+        self._check_same_schema(other_table, "intersection")
+        engine = _bag_intersection if bag else _set_intersection
+        return engine(self.rows, other_table.rows)
+
+    def difference(self, other_table, bag=False):
+        """Повертає різницю між двома таблицями"""
+        return list(self.iter_difference(other_table, bag))
+
+    def union(self, other_table, bag=False):
+        """Повертає об'єднання двох таблиць"""
+        return list(self.iter_union(other_table, bag))
+
+    def intersection(self, other_table, bag=False):
+        """Повертає перетин двох таблиць"""
+        return list(self.iter_intersection(other_table, bag))
+
+
+class Transaction(Mapping):
+    """Транзакція з копіюванням під час запису.
+
+    Таблиця копіюється при першому зверненні до неї в транзакції, зміни
+    виконуються над копіями, а події накопичуються. При фіксації новий словник
+    таблиць публікується однією заміною атрибута Database.tables, тож читачі,
+    що взяли знімок раніше, бачать попередню версію повністю. Старі версії
+    звільняє збирач сміття, коли на них не лишається посилань.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.base = database.tables  # Опублікована версія на початку транзакції
+        self.working = database.tables.copy()
+        self.owned = set()  # Таблиці, які належать лише цій транзакції
+        self.restored = set()
+        self.superseded = []  # Опубліковані таблиці, замінені або видалені транзакцією
+        self.events = []
+
+    @property
+    def tables(self):
+        return self
+
+    def __getitem__(self, table_name):
+        table = self.working[table_name]
+        if table_name not in self.owned:
+            self.superseded.append(table)
+            table = table.copy()
+            table._listeners.append(self._table_changed)
+            self.working[table_name] = table
+            self.owned.add(table_name)
+        return table
+
+    def __contains__(self, table_name):
+        return table_name in self.working
+
+    def __iter__(self):
+        return iter(self.working)
+
+    def __len__(self):
+        return len(self.working)
+
+    def _table_changed(self, table, operation, args):
+        self.events.append((operation, (table.name, *args)))
+
+    def create_table(self, table_name, schema, storage="rows"):
+        if table_name in self.working:
+            raise TableError(f"Table '{table_name}' already exists.")
+        table = Table(table_name, schema, storage)
+        table._listeners.append(self._table_changed)
+        self.working[table_name] = table
+        self.owned.add(table_name)
+        self.events.append(("create_table", (table_name, schema, storage)))
+
+    def drop_table(self, table_name):
+        if table_name not in self.working:
+            raise TableError(f"Table '{table_name}' does not exist.")
+        table = self.working.pop(table_name)
+        if table_name in self.owned:
+            self.owned.discard(table_name)
+            table._listeners.remove(self._table_changed)
+        else:
+            self.superseded.append(table)
+        self.events.append(("drop_table", (table_name, table)))
+
+    def restore_table(self, table):
+        # Відновлена таблиця може бути в старих знімках, тому до змін її буде скопійовано
+        if table.name in self.working:
+            raise TableError(f"Table '{table.name}' already exists.")
+        self.working[table.name] = table
+        self.restored.add(table.name)
+        self.events.append(("restore_table", (table.name, table)))
+
+    def commit(self):
+        """Публікує нову версію таблиць і передає накопичені зміни підписникам бази"""
+        database = self.database
+        if database.tables is not self.base:
+            raise DatabaseError("Tables were changed outside the transaction.")
+        for table in self.superseded:
+            if database._table_changed in table._listeners:
+                table._listeners.remove(database._table_changed)
+        for table_name in self.owned:
+            table = self.working[table_name]
+            table._listeners.remove(self._table_changed)
+            # Читачі знімка не повинні ущільнювати спільну версію, тож ущільнюємо її до публікації
+            table.compact()
+        for table_name in self.owned | self.restored:
+            if table_name in self.working:
+                database._attach(self.working[table_name])
+        database.tables = self.working
+        with database.undo_group(), database._logged_atomically():
+            for operation, args in self.events:
+                database._notify(operation, *args)
+
+
+def _peek(tables, table_name):
+    """Таблиця зі словника таблиць без декодування з файлу (None, якщо її ще не декодовано)"""
+    peek = getattr(tables, "peek", None)
+    return tables.get(table_name) if peek is None else peek(table_name)
+
+
+class Snapshot(Mapping):
+    """Таблиці бази на момент знімка (див. Database.snapshot)"""
+
+    def __init__(self, tables):
+        self._tables = tables  # Опублікований словник таблиць
+        self._versions = {}  # Версії таблиць, змінених після знімка (див. Table._unshare)
+
+    # Знімки порівнюються за тотожністю: їх зберігають слабкі множини таблиць і бази
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __getitem__(self, table_name):
+        table = self._versions.get(table_name)
+        return self._tables[table_name] if table is None else table
+
+    def __contains__(self, table_name):
+        return table_name in self._tables
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    def sees(self, table):
+        """Чи бачить знімок саме цю версію таблиці"""
+        name = table.name
+        return name not in self._versions and name in self._tables and _peek(self._tables, name) is table
+
+
+# Клас для бази даних
+class Database:
+    def __init__(self, name):
+        self.name = name
+        self.tables = {}
+        self._listeners = []  # Підписники на зміни: listener(operation, args)
+        self._wal = None
+        self._snapshots = WeakSet()  # Знімки, які ще використовуються
+        self.log_generation = 0  # Покоління знімка; журнал WAL доповнює знімок того самого покоління
+        self._transaction = None
+        self.journal = UndoJournal(self)
+        self._listeners.append(self.journal.record)
+        self.cache = ResultCache()  # Кеш результатів запитів і множинних операцій (див. cache)
+        # Блокування єдиного записувача: під ним виконуються транзакції, фонове
+        # збереження та зміни з інтерфейсу; читачі знімків його не беруть
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attribute in ("_listeners", "_wal", "_snapshots", "_transaction", "journal", "cache", "lock"):
+            del state[attribute]
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("log_generation", 0)
+        self.__dict__.update(state)
+        self._listeners = []
+        self._wal = None
+        self._snapshots = WeakSet()
+        self._transaction = None
+        self.journal = UndoJournal(self)
+        self._listeners.append(self.journal.record)
+        self.cache = ResultCache()
+        self.lock = threading.RLock()
+        for table in self.tables.values():
+            self._attach(table)
+
+    def _attach(self, table):
+        """Підписує базу на зміни рядків таблиці (і знімки, що бачать щойно декодовану таблицю)"""
+        if self._table_changed not in table._listeners:
+            table._listeners.append(self._table_changed)
+        if self._snapshots:
+            with self.lock:
+                for snapshot in self._snapshots:
+                    if snapshot.sees(table):
+                        table._share(snapshot)
+
+    def _notify(self, operation, *args):
+        for listener in self._listeners:
+            listener(operation, args)
+
+    def _table_changed(self, table, operation, args):
+        self._notify(operation, table.name, *args)
+
+    @contextmanager
+    def transaction(self):
+        """Атомарна зміна кількох рядків і таблиць: with db.transaction() as tx: tx["users"].add_row(...)
+
+        Якщо блок завершується винятком, жодна зміна не публікується. Вкладена
+        транзакція стає частиною зовнішньої.
+        """
+        with self.lock:
+            if self._transaction is not None:
+                yield self._transaction
+                return
+            transaction = self._transaction = Transaction(self)
+            try:
+                yield transaction
+                transaction.commit()
+            finally:
+                self._transaction = None
+
+    def snapshot(self, table_names=None):
+        """Знімок таблиць на момент виклику; читання знімка не блокує записувача.
+
+        Знімок не змінюють ні транзакції, ні зміни таблиць поза ними, зокрема
+        скасування: таблиця, яку бачить знімок, перед першою зміною передає йому
+        свою поточну версію. Зміни в обхід методів таблиці (table.rows[i] = ...)
+        знімок бачить. table_names обмежує знімок переліченими таблицями, тож зміни
+        інших таблиць не копіюють їхнього сховища.
+        """
+        with self.lock:
+            tables = self.tables
+            if table_names is not None:
+                tables = {table_name: tables[table_name] for table_name in table_names}
+            snapshot = Snapshot(tables)
+            for table_name in tables:
+                table = _peek(tables, table_name)
+                if table is not None:
+                    table._share(snapshot)
+            self._snapshots.add(snapshot)
+            return snapshot
+
+    def create_table(self, table_name, schema, storage="rows"):
+        """Створює таблицю з переданою схемою"""
+        with self.transaction() as transaction:
+            transaction.create_table(table_name, schema, storage)
+
+    def drop_table(self, table_name):
+        """Видаляє таблицю з бази"""
+        with self.transaction() as transaction:
+            transaction.drop_table(table_name)
+
+    def restore_table(self, table):
+        """Повертає в базу раніше видалену таблицю разом із її рядками та індексами"""
+        with self.transaction() as transaction:
+            transaction.restore_table(table)
+
+    # Скасування та повторення змін
+
+    def undo(self):
+        """Скасовує останню зміну або групу змін.
+
+        Обернені операції виконуються над опублікованими таблицями на місці, тож
+        посилання на таблиці лишаються дійсними; таблиці копіюються, лише якщо їх
+        бачать знімки (див. snapshot).
+        """
+        with self.lock, self._logged_atomically():
+            self._check_no_transaction("undo")
+            self.journal.undo()
+
+    def redo(self):
+        """Повторює останню скасовану зміну або групу змін"""
+        with self.lock, self._logged_atomically():
+            self._check_no_transaction("redo")
+            self.journal.redo()
+
+    def _check_no_transaction(self, operation):
+        # Зміни транзакції потрапляють у журнал лише при фіксації, тож їх ще нема що скасовувати
+        if self._transaction is not None:
+            raise DatabaseError(f"Cannot {operation} inside a transaction.")
+
+    def undo_group(self):
+        """Контекст, зміни всередині якого скасовуються як одна операція"""
+        return self.journal.group()
+
+    def _logged_atomically(self):
+        """Контекст, зміни всередині якого потрапляють у журнал WAL одним записом"""
+        return nullcontext() if self._wal is None else self._wal.commit()
+
+    # Статистика та профілювання
+
+    def stats(self):
+        """Статистика бази: таблиці, журнали скасування і WAL, кеш результатів та лічильники профілювання"""
+        from metrics import summary
+
+        tables = self.tables
+        return {
+            "database": self.name,
+            "tables": {table_name: tables[table_name].stats() for table_name in tables},
+            "undo": {"entries": len(self.journal.undo_stack), "redo_entries": len(self.journal.redo_stack),
+                     "bytes": self.journal.size},
+            "wal": None if self._wal is None else {"pending": self._wal.pending, "records": self._wal.records},
+            "cache": self.cache.stats(),
+            **summary(),
+        }
+
+    def dump_stats(self, filename, format=None):
+        """Записує stats() у файл: текст Prometheus (.prom, .txt) або JSON"""
+        from metrics import dump
+
+        dump(self.stats(), filename, format)
+
+    def import_json(self, filename):
+        """Імпортує таблиці з файлу у форматі database.json ({таблиця: {columns, rows}})"""
+        with open(filename, encoding="utf-8") as f:
+            data = json.load(f)
+        reports = {}
+        with self.undo_group():
+            for table_name, content in data.items():
+                schema = [(field_name, column_type(type_name)) for field_name, type_name in content["columns"]]
+                self.create_table(table_name, schema)
+                reports[table_name] = self.tables[table_name].bulk_load(content["rows"])
+        return reports
+
+    def enable_wal(self, filename, group_commit=64, checkpoint_interval=10_000, checkpoint=True):
+        """Вмикає журнал попереднього запису (WAL) поруч зі знімком filename.
+
+        Кожна зміна дописується в журнал filename + '.wal', який синхронізується
+        з диском пакетами по group_commit записів; після checkpoint_interval записів
+        журнал стискається у новий знімок.
+        """
+        from wal import WriteAheadLog
+
+        if self._wal is not None:
+            raise DatabaseError("Write-ahead log is already enabled.")
+        self._wal = WriteAheadLog(self, filename, group_commit, checkpoint_interval)
+        if checkpoint:
+            self._wal.checkpoint()
+        self._listeners.append(self._wal.record)
+
+    def disable_wal(self):
+        """Синхронізує і закриває журнал попереднього запису"""
+        if self._wal is None:
+            raise DatabaseError("Write-ahead log is not enabled.")
+        self._listeners.remove(self._wal.record)
+        self._wal.close()
+        self._wal = None
+
+    @property
+    def wal_filename(self):
+        """Файл знімка, до якого прив'язано журнал WAL, або None"""
+        return None if self._wal is None else self._wal.filename
+
+    def dump_bytes(self, compression=None, progress=None):
+        """Серіалізує узгоджений знімок бази у бінарному форматі (під блокуванням).
+
+        progress(частка) повідомляє, яку частину колонок уже закодовано.
+        """
+        from dbformat import dump_database
+
+        with self.lock:
+            self.log_generation += 1
+            return dump_database(self, compression, progress=progress)
+
+    def checkpoint(self):
+        """Записує знімок бази та очищає журнал"""
+        if self._wal is None:
+            raise DatabaseError("Write-ahead log is not enabled.")
+        self._wal.checkpoint()
+
+    def write_snapshot(self, filename, compression=None):
+        """Атомарно записує повний знімок бази у файл (compression — zlib або lzma).
+
+        Кожен знімок отримує нове покоління: журнал WAL попереднього покоління поруч
+        із файлом уже врахований у знімку, і під час завантаження він пропускається.
+        """
+        from dbformat import write_database
+
+        self.log_generation += 1
+        try:
+            write_database(self, filename, compression)
+        except BaseException:
+            # Файл лишився попереднім, тож і журнал WAL доповнює попереднє покоління
+            self.log_generation -= 1
+            raise
+
+    def save_to_disk(self, filename, compression=None):
+        """Зберігає базу даних у файл у бінарному форматі з лінивим читанням"""
+        if self._wal is not None and os.path.abspath(filename) == os.path.abspath(self._wal.filename):
+            # У режимі WAL усі зміни вже в журналі — досить дописати його на диск
+            self._wal.sync()
+            return
+        with self.lock:
+            self.write_snapshot(filename, compression)
+
+    @staticmethod
+    def load_from_disk(filename, wal=False, decode_workers=None, convert=True, **wal_options):
+        """Зчитує базу даних із файлу (разом із журналом змін, якщо він є).
+
+        Крім бінарного формату читаються файли database.json та файли pickle попередніх
+        версій; останні (якщо convert) одразу перезаписуються у бінарному форматі, а
+        вихідний файл зберігається поруч із суфіксом .bak. Якщо базу не вдається
+        записати в бінарному форматі (наприклад, через завеликі для нього числа), вона
+        повертається без перетворення, а файл лишається як був.
+        decode_workers — кількість процесів для паралельного декодування блоків.
+        """
+        from dbformat import detect_format, open_database, read_json_database, read_legacy_database
+        from wal import WriteAheadLog
+
+        format = detect_format(filename)
+        if format == "binary":
+            database = open_database(filename, decode_workers)
+        elif format == "json":
+            database = read_json_database(filename)
+        else:
+            database = read_legacy_database(filename)
+        WriteAheadLog.replay(database, filename + ".wal")
+        database.journal.clear()  # Відтворені зміни журналу не скасовуються
+        if format == "pickle" and convert:
+            # Новий знімок уже містить відтворені зміни, тож журнал стає журналом попереднього покоління
+            backup = filename + ".bak"
+            try:
+                shutil.copy2(filename, backup)
+                database.write_snapshot(filename)
+            except (DatabaseError, OSError, ValueError, TypeError, OverflowError):
+                # write_snapshot замінює файл лише після успішного запису
+                if os.path.exists(backup):
+                    os.remove(backup)
+        if wal:
+            database.enable_wal(filename, checkpoint=False, **wal_options)
+        return database
+
+
+# Головна частина програми: графічний інтерфейс імпортується лише тут
+if __name__ == "__main__":
+    from gui import main
+
+    main()
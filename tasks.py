@@ -0,0 +1,190 @@
+"""Фонове виконання довгих операцій, щоб не блокувати цикл подій Tk.
+
+Введення-виведення (збереження, завантаження) виконується в пулі потоків,
+обчислення (різниця таблиць) — у пулі процесів. Результати, помилки та прогрес
+передаються назад через чергу, яку потік інтерфейсу розбирає методом poll()
+(для Tk — через root.after, див. TaskExecutor.attach).
+"""
+import os
+import pickle
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from task import Database, Table
+
+
+class Task:
+    """Фонове завдання: прогрес, скасування та майбутній результат"""
+
+    def __init__(self, name, executor, on_progress=None):
+        self.name = name
+        self.future = None
+        self._executor = executor
+        self._on_progress = on_progress
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Скасовує завдання: ще не розпочате не виконається, розпочате має перевіряти cancelled"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, fraction, message=""):
+        """Повідомляє прогрес (викликається з фонового потоку)"""
+        if self._on_progress is not None:
+            self._executor.post(self._on_progress, fraction, message)
+
+
+class TaskExecutor:
+    def __init__(self, io_workers=2, cpu_workers=None):
+        self._io_pool = ThreadPoolExecutor(io_workers, thread_name_prefix="db-io")
+        self._cpu_pool = None  # Пул процесів створюється при першому обчислювальному завданні
+        self._cpu_workers = cpu_workers
+        self._events = queue.SimpleQueue()
+        self.active = set()
+
+    def post(self, callback, *args):
+        """Ставить зворотний виклик у чергу потоку інтерфейсу"""
+        self._events.put((callback, args))
+
+    def submit_io(self, name, func, *args, on_done=None, on_error=None, on_progress=None):
+        """Виконує func(task, *args) у пулі потоків"""
+        task = Task(name, self, on_progress)
+        return self._track(task, self._io_pool.submit(func, task, *args), on_done, on_error)
+
+    def submit_cpu(self, name, func, *args, on_done=None, on_error=None):
+        """Виконує func(*args) у пулі процесів; аргументи й результат мають серіалізуватися"""
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(self._cpu_workers)
+        task = Task(name, self)
+        return self._track(task, self._cpu_pool.submit(func, *args), on_done, on_error)
+
+    def _track(self, task, future, on_done, on_error):
+        task.future = future
+        self.active.add(task)
+        future.add_done_callback(lambda future: self.post(self._finish, task, on_done, on_error))
+        return task
+
+    def _finish(self, task, on_done, on_error):
+        self.active.discard(task)
+        if task.cancelled or task.future.cancelled():
+            return
+        error = task.future.exception()
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+        elif on_done is not None:
+            on_done(task.future.result())
+
+    def poll(self, limit=100):
+        """Виконує накопичені зворотні виклики; викликається з потоку інтерфейсу"""
+        for _ in range(limit):
+            try:
+                callback, args = self._events.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+
+    def attach(self, root, interval=50):
+        """Періодично розбирає чергу подій у циклі Tk"""
+        def tick():
+            self.poll()
+            root.after(interval, tick)
+
+        root.after(interval, tick)
+
+    def shutdown(self, wait=False):
+        for task in list(self.active):
+            task.cancel()
+        self._io_pool.shutdown(wait=wait, cancel_futures=True)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# Завдання
+
+# Частка прогресу збереження, що припадає на кодування знімка (решта — запис у файл)
+ENCODE_SHARE = 0.8
+
+
+def save_job(task, database, filename, chunk_size=1 << 20):
+    """Зберігає знімок бази частинами, повідомляючи прогрес; скасоване збереження не змінює файл"""
+    if database.wal_filename is not None and os.path.abspath(filename) == os.path.abspath(database.wal_filename):
+        database.save_to_disk(filename)
+        return filename
+    data = database.dump_bytes(progress=lambda fraction: task.report(ENCODE_SHARE * fraction, "Encoding"))
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as f:
+        for offset in range(0, len(data), chunk_size):
+            if task.cancelled:
+                break
+            f.write(data[offset:offset + chunk_size])
+            written = min(offset + chunk_size, len(data)) / len(data)
+            task.report(ENCODE_SHARE + (1 - ENCODE_SHARE) * written, "Saving")
+        f.flush()
+        os.fsync(f.fileno())
+    if task.cancelled:
+        os.remove(temp_filename)
+        return None
+    os.replace(temp_filename, filename)
+    return filename
+
+
+def load_job(task, filename):
+    return Database.load_from_disk(filename)
+
+
+def table_snapshot(table):
+    """Дешевий знімок рядків таблиці для фонової серіалізації; викликається під блокуванням бази.
+
+    Копіюється лише список рядків: рядки не змінюються на місці, а замінюються, тож їх можна ділити.
+    """
+    rows, _ = table.compacted()
+    return table.name, table.schema, rows.copy()
+
+
+def difference_payload_job(task, snapshot, other_snapshot, chunk_rows=2000):
+    """Серіалізує пару знімків (див. table_snapshot) для difference_job у пулі потоків.
+
+    Рядки серіалізуються невеликими частинами, щоб потік інтерфейсу отримував GIL між ними.
+    """
+    total = max(len(snapshot[2]) + len(other_snapshot[2]), 1)
+    header, chunks, done = [], [], 0
+    for name, schema, rows in (snapshot, other_snapshot):
+        rows = iter(rows)
+        count = 0
+        while chunk := list(islice(rows, chunk_rows)):
+            if task.cancelled:
+                return None
+            chunks.append(pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL))
+            count += 1
+            done += len(chunk)
+            task.report(done / total, "Preparing")
+        header.append((name, schema, count))
+    return [pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL), *chunks]
+
+
+def difference_job(payload):
+    """Обчислює різницю таблиць у окремому процесі.
+
+    payload — результат difference_payload_job або серіалізована pickle пара таблиць.
+    """
+    if isinstance(payload, bytes):
+        table, other_table = pickle.loads(payload)
+    else:
+        header, *chunks = payload
+        chunks = iter(chunks)
+        tables = []
+        for name, schema, count in pickle.loads(header):
+            table = Table(name, schema)
+            for chunk in islice(chunks, count):
+                table._append_rows(pickle.loads(chunk))  # Рядки вже перевірені у вихідній таблиці
+            tables.append(table)
+        table, other_table = tables
+    return table.difference(other_table)
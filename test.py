@@ -1,90 +1,1607 @@
-import unittest
-from datetime import date
-
-from task.py import Database, Table, DateInterval
-
-class TestDatabaseFunctions(unittest.TestCase):
-
-    def test_create_table(self):
-        # Створюємо базу даних та таблицю
-        db = Database("TestDB")
-        schema = [("id", int), ("name", str), ("dob", date)]
-        db.create_table("users", schema)
-
-        # Перевіряємо, чи таблиця була створена
-        self.assertIn("users", db.tables)
-        self.assertEqual(db.tables["users"].name, "users")
-        self.assertEqual(db.tables["users"].get_schema(), schema)
-
-    def test_add_row(self):
-        # Створюємо базу даних та таблицю
-        db = Database("TestDB")
-        schema = [("id", int), ("name", str), ("dob", date)]
-        db.create_table("users", schema)
-        table = db.tables["users"]
-
-        # Додаємо рядок у таблицю
-        row_data = [1, "John Doe", date(1990, 5, 15)]
-        table.add_row(row_data)
-
-        # Перевіряємо, чи рядок додано
-        self.assertEqual(len(table.rows), 1)
-        self.assertEqual(table.rows[0], row_data)
-
-    def test_edit_row(self):
-        # Створюємо базу даних та таблицю
-        db = Database("TestDB")
-        schema = [("id", int), ("name", str), ("dob", date)]
-        db.create_table("users", schema)
-        table = db.tables["users"]
-
-        # Додаємо рядок у таблицю
-        row_data = [1, "John Doe", date(1990, 5, 15)]
-        table.add_row(row_data)
-
-        # Редагуємо рядок
-        new_row_data = [1, "John Doe", date(1992, 8, 23)]
-        old_data = table.edit_row(0, new_row_data)
-
-        # Перевіряємо, чи редагування успішне
-        self.assertEqual(old_data, row_data)  # Перевіряємо старі дані
-        self.assertEqual(table.rows[0], new_row_data)  # Перевіряємо нові дані
-
-    def test_delete_row(self):
-        # Створюємо базу даних та таблицю
-        db = Database("TestDB")
-        schema = [("id", int), ("name", str), ("dob", date)]
-        db.create_table("users", schema)
-        table = db.tables["users"]
-
-        # Додаємо рядок у таблицю
-        row_data = [1, "John Doe", date(1990, 5, 15)]
-        table.add_row(row_data)
-
-        # Видаляємо рядок
-        table.delete_row(0)
-
-        # Перевіряємо, чи рядок видалено
-        self.assertEqual(len(table.rows), 0)
-
-    def test_difference_between_tables(self):
-        # Створюємо базу даних та таблиці
-        db = Database("TestDB")
-        schema = [("id", int), ("name", str), ("dob", date)]
-        db.create_table("users", schema)
-        db.create_table("employees", schema)
-
-        users_table = db.tables["users"]
-        employees_table = db.tables["employees"]
-
-        # Додаємо різні дані в таблиці
-        users_table.add_row([1, "John Doe", date(1990, 5, 15)])
-        employees_table.add_row([2, "Jane Smith", date(1988, 4, 11)])
-
-        # Перевіряємо різницю
-        diff = users_table.difference(employees_table)
-        self.assertEqual(len(diff), 1)
-        self.assertEqual(diff[0], [1, "John Doe", date(1990, 5, 15)])
-
-if __name__ == '__main__':
-    unittest.main()
+import asyncio
+import io
+import json
+import os
+import pickle
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import date, timedelta
+
+import bench
+import cli
+import client
+import metrics
+import server
+from errors import DatabaseError, SchemaError, StorageError, TableError, ValidationError
+from task import CHAR, STRING, Database, Table, DateInterval
+from tasks import TaskExecutor, difference_job, difference_payload_job, load_job, save_job, table_snapshot
+
+# Бюджет часу імпорту ядра (без графічного інтерфейсу), секунди
+IMPORT_TIME_BUDGET = 0.25
+
+
+class TestDatabaseFunctions(unittest.TestCase):
+
+    def test_create_table(self):
+        # Створюємо базу даних та таблицю
+        db = Database("TestDB")
+        schema = [("id", int), ("name", str), ("dob", date)]
+        db.create_table("users", schema)
+
+        # Перевіряємо, чи таблиця була створена
+        self.assertIn("users", db.tables)
+        self.assertEqual(db.tables["users"].name, "users")
+        self.assertEqual(db.tables["users"].get_schema(), schema)
+
+    def test_add_row(self):
+        # Створюємо базу даних та таблицю
+        db = Database("TestDB")
+        schema = [("id", int), ("name", str), ("dob", date)]
+        db.create_table("users", schema)
+        table = db.tables["users"]
+
+        # Додаємо рядок у таблицю
+        row_data = [1, "John Doe", date(1990, 5, 15)]
+        table.add_row(row_data)
+
+        # Перевіряємо, чи рядок додано
+        self.assertEqual(len(table.rows), 1)
+        self.assertEqual(table.rows[0], row_data)
+
+    def test_edit_row(self):
+        # Створюємо базу даних та таблицю
+        db = Database("TestDB")
+        schema = [("id", int), ("name", str), ("dob", date)]
+        db.create_table("users", schema)
+        table = db.tables["users"]
+
+        # Додаємо рядок у таблицю
+        row_data = [1, "John Doe", date(1990, 5, 15)]
+        table.add_row(row_data)
+
+        # Редагуємо рядок
+        new_row_data = [1, "John Doe", date(1992, 8, 23)]
+        old_data = table.edit_row(0, new_row_data)
+
+        # Перевіряємо, чи редагування успішне
+        self.assertEqual(old_data, row_data)  # Перевіряємо старі дані
+        self.assertEqual(table.rows[0], new_row_data)  # Перевіряємо нові дані
+
+    def test_delete_row(self):
+        # Створюємо базу даних та таблицю
+        db = Database("TestDB")
+        schema = [("id", int), ("name", str), ("dob", date)]
+        db.create_table("users", schema)
+        table = db.tables["users"]
+
+        # Додаємо рядок у таблицю
+        row_data = [1, "John Doe", date(1990, 5, 15)]
+        table.add_row(row_data)
+
+        # Видаляємо рядок
+        table.delete_row(0)
+
+        # Перевіряємо, чи рядок видалено
+        self.assertEqual(len(table.rows), 0)
+
+    def test_difference_between_tables(self):
+        # Створюємо базу даних та таблиці
+        db = Database("TestDB")
+        schema = [("id", int), ("name", str), ("dob", date)]
+        db.create_table("users", schema)
+        db.create_table("employees", schema)
+
+        users_table = db.tables["users"]
+        employees_table = db.tables["employees"]
+
+        # Додаємо різні дані в таблиці
+        users_table.add_row([1, "John Doe", date(1990, 5, 15)])
+        employees_table.add_row([2, "Jane Smith", date(1988, 4, 11)])
+
+        # Перевіряємо різницю
+        diff = users_table.difference(employees_table)
+        self.assertEqual(len(diff), 1)
+        self.assertEqual(diff[0], [1, "John Doe", date(1990, 5, 15)])
+
+    def test_difference_with_date_intervals(self):
+        # Інтервали з однаковими датами мають вважатися рівними
+        db = Database("TestDB")
+        schema = [("id", int), ("period", DateInterval)]
+        db.create_table("a", schema)
+        db.create_table("b", schema)
+
+        db.tables["a"].add_row([1, DateInterval(date(2024, 1, 1), date(2024, 1, 5))])
+        db.tables["a"].add_row([2, DateInterval(date(2024, 2, 1), date(2024, 2, 5))])
+        db.tables["b"].add_row([1, DateInterval(date(2024, 1, 1), date(2024, 1, 5))])
+
+        diff = db.tables["a"].difference(db.tables["b"])
+        self.assertEqual(diff, [[2, DateInterval(date(2024, 2, 1), date(2024, 2, 5))]])
+
+    def test_union_and_intersection(self):
+        db = Database("TestDB")
+        schema = [("id", int), ("dob", date)]
+        db.create_table("a", schema)
+        db.create_table("b", schema)
+
+        for row in ([1, date(2000, 1, 1)], [2, date(2000, 1, 2)], [2, date(2000, 1, 2)]):
+            db.tables["a"].add_row(row)
+        for row in ([2, date(2000, 1, 2)], [3, date(2000, 1, 3)]):
+            db.tables["b"].add_row(row)
+
+        union = db.tables["a"].union(db.tables["b"])
+        self.assertEqual(union, [[1, date(2000, 1, 1)], [2, date(2000, 1, 2)], [3, date(2000, 1, 3)]])
+        self.assertEqual(db.tables["a"].intersection(db.tables["b"]), [[2, date(2000, 1, 2)]])
+        self.assertEqual(len(db.tables["a"].union(db.tables["b"], bag=True)), 5)
+
+    def test_bag_difference_and_intersection(self):
+        # Мультимножинні варіанти враховують кількість однакових рядків
+        db = Database("TestDB")
+        schema = [("id", int)]
+        db.create_table("a", schema)
+        db.create_table("b", schema)
+
+        for value in (1, 1, 1, 2):
+            db.tables["a"].add_row([value])
+        for value in (1, 3):
+            db.tables["b"].add_row([value])
+
+        self.assertEqual(db.tables["a"].difference(db.tables["b"]), [[2]])
+        self.assertEqual(db.tables["a"].difference(db.tables["b"], bag=True), [[1], [1], [2]])
+        self.assertEqual(db.tables["a"].intersection(db.tables["b"], bag=True), [[1]])
+
+    def test_set_operations_require_same_schema(self):
+        db = Database("TestDB")
+        db.create_table("a", [("id", int)])
+        db.create_table("b", [("name", str)])
+
+        with self.assertRaises(Exception):
+            db.tables["a"].iter_union(db.tables["b"])
+
+    def test_result_cache_versions_hits_and_eviction(self):
+        from cache import ResultCache
+
+        db = Database("TestDB")
+        db.create_table("a", [("id", int), ("name", str)])
+        db.create_table("b", [("id", int), ("name", str)])
+        a, b = db.tables["a"], db.tables["b"]
+        a.add_rows([[i, f"n{i % 3}"] for i in range(10)])
+        b.add_rows([[i, f"n{i % 3}"] for i in range(5)])
+
+        # Кожна зміна рядків дає таблиці нову версію
+        version = a.version
+        a.edit_row(0, [0, "x"])
+        self.assertGreater(a.version, version)
+
+        cache = db.cache
+        query = a.query().where("name", "in", ["n1", "n2"]).select("id")
+        self.assertEqual(cache.query(query), query.all())
+        self.assertEqual(cache.query(a.query().where("name", "in", ["n1", "n2"]).select("id")), query.all())
+        self.assertEqual(cache.union(a, b), a.union(b))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+        a.delete_row(1)
+        self.assertEqual(cache.query(query), query.all())
+        self.assertEqual(cache.stats()["misses"], 3)
+        self.assertEqual(db.stats()["cache"]["entries"], 3)
+        self.assertIn("cache: 3 entries", metrics.format_text(db.stats()))
+        self.assertIn('itlab_cache_requests_total{result="miss"} 3', metrics.format_prometheus(db.stats()))
+
+        # Найдавніше використані результати витісняються при переповненні
+        small = ResultCache(max_entries=2)
+        for columns in (["id"], ["name"], ["id"], ["id", "name"], ["id"], ["name"]):
+            small.query(a.query().select(*columns))
+        self.assertEqual((small.stats()["hits"], small.stats()["evictions"]), (2, 2))
+        limited = ResultCache(max_bytes=2000)
+        limited.difference(a, b)
+        limited.union(a, b)
+        self.assertLessEqual(limited.size, 2000)
+
+    def test_cached_difference_follows_changes(self):
+        db = Database("TestDB")
+        schema = [("id", int), ("period", DateInterval)]
+        db.create_table("a", schema)
+        db.create_table("b", schema, "columnar")
+        day = date(2024, 1, 1)
+        rows = [[i % 7, DateInterval(day, day + timedelta(days=i % 5))] for i in range(60)]
+        db.tables["a"].add_rows(rows)
+        db.tables["b"].add_rows(rows[::3])
+        rng = random.Random(5)
+        for step in range(40):
+            a, b = db.tables["a"], db.tables["b"]
+            table = rng.choice([a, b])
+            choice = rng.random()
+            if choice < 0.3:
+                table.add_row(rng.choice(rows))
+            elif choice < 0.55:
+                table.edit_row(rng.randrange(len(table.rows)), rng.choice(rows))
+            elif choice < 0.8:
+                table.delete_row(rng.randrange(len(table.rows)))
+            elif choice < 0.9:
+                with db.transaction() as tx:
+                    tx[table.name].add_row(rng.choice(rows))
+            else:
+                db.undo()
+            a, b = db.tables["a"], db.tables["b"]
+            for bag in (False, True):
+                self.assertEqual(db.cache.difference(a, b, bag), a.difference(b, bag))
+                self.assertEqual(db.cache.difference(b, a, bag), b.difference(a, bag))
+        stats = db.cache.stats()
+        self.assertGreater(stats["updates"], 100)
+        self.assertEqual(stats["misses"], 4)
+
+        # Зміни, яких немає в журналі змін таблиці, означають повне обчислення
+        a = db.tables["a"]
+        a.rows = a.rows[:10]
+        self.assertIsNone(a.changes_since(a.version - 1))
+        self.assertEqual(db.cache.difference(a, db.tables["b"]), a.difference(db.tables["b"]))
+        self.assertEqual(db.cache.stats()["misses"], 5)
+
+    def test_columnar_storage(self):
+        # Колонкове сховище має поводитися так само, як список рядків
+        db = Database("TestDB")
+        schema = [("id", int), ("score", float), ("name", str), ("dob", date), ("period", DateInterval)]
+        db.create_table("users", schema, storage="columnar")
+        table = db.tables["users"]
+
+        period = DateInterval(date(2024, 1, 1), date(2024, 1, 5))
+        table.add_row([1, 1.5, "J", date(1990, 5, 15), period])
+        table.add_row([2, 2.5, "K", date(1991, 6, 16), period])
+        table.add_row([3, 3.5, "J", date(1992, 7, 17), period])
+
+        old_data = table.edit_row(1, [20, 0.5, "L", date(2000, 1, 1), period])
+        self.assertEqual(old_data, [2, 2.5, "K", date(1991, 6, 16), period])
+        table.delete_row(0)
+
+        self.assertEqual(list(table.view_table()), [
+            [20, 0.5, "L", date(2000, 1, 1), period],
+            [3, 3.5, "J", date(1992, 7, 17), period],
+        ])
+        self.assertEqual(set(table.memory_usage()), {"id", "score", "name", "dob", "period"})
+
+        restored = pickle.loads(pickle.dumps(table))
+        self.assertEqual(list(restored.rows), list(table.rows))
+
+
+    def test_indexes_follow_row_changes(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("dob", date)])
+        table = db.tables["users"]
+        table.create_index("id", kind="hash")
+        table.create_index("dob", kind="sorted")
+
+        for i, day in enumerate((5, 1, 3, 1)):
+            table.add_row([i, date(2000, 1, day)])
+
+        self.assertEqual(table.lookup("id", 2), [2])
+        self.assertEqual(table.lookup("dob", date(2000, 1, 1)), [1, 3])
+        self.assertEqual(table.range("dob", date(2000, 1, 2), date(2000, 1, 5)), [2, 0])
+
+        # Після видалення позиції наступних рядків зсуваються
+        table.delete_row(1)
+        self.assertEqual(table.lookup("id", 3), [2])
+        self.assertEqual(table.range("dob", hi=date(2000, 1, 3)), [2, 1])
+
+        table.edit_row(0, [10, date(2000, 1, 2)])
+        self.assertEqual(table.lookup("id", 0), [])
+        self.assertEqual(table.lookup("id", 10), [0])
+        self.assertEqual(table.range("dob"), [2, 0, 1])
+
+        # Запити без індексу дають той самий результат
+        table.drop_index("dob")
+        self.assertEqual(table.range("dob"), [2, 0, 1])
+
+    def test_indexes_rebuilt_after_load(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("score", float)])
+        table = db.tables["users"]
+        table.create_index("score", kind="sorted")
+        table.add_row([1, 2.5])
+        table.add_row([2, 0.5])
+
+        path = os.path.join(tempfile.mkdtemp(), "test.db")
+        db.save_to_disk(path)
+        loaded = Database.load_from_disk(path).tables["users"]
+
+        self.assertFalse(loaded.indexes["score"].built)
+        self.assertEqual(loaded.range("score", 0.0, 1.0), [1])
+        self.assertTrue(loaded.indexes["score"].built)
+
+    def test_sorted_index_requires_ordered_type(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("period", DateInterval)])
+
+        with self.assertRaises(Exception):
+            db.tables["users"].create_index("period", kind="sorted")
+
+
+    def test_interval_index_matches_scan(self):
+        # Результати індексу мають збігатися з повним переглядом таблиці
+        rng = random.Random(7)
+        db = Database("TestDB")
+        db.create_table("bookings", [("id", int), ("period", DateInterval)])
+        db.create_table("plain", [("id", int), ("period", DateInterval)])
+        indexed, plain = db.tables["bookings"], db.tables["plain"]
+        indexed.create_index("period", kind="interval")
+
+        def random_interval():
+            start = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+            return DateInterval(start, start + timedelta(days=rng.choice((0, 1, 3, 10, 40, 200))))
+
+        for i in range(300):
+            row = [i, random_interval()]
+            indexed.add_row(row)
+            plain.add_row(row)
+        for _ in range(50):
+            position = rng.randrange(len(plain.rows))
+            indexed.delete_row(position)
+            plain.delete_row(position)
+            position = rng.randrange(len(plain.rows))
+            row = [-1, random_interval()]
+            indexed.edit_row(position, row)
+            plain.edit_row(position, row)
+
+        for _ in range(50):
+            query = random_interval()
+            start, end = query.start_date, query.end_date
+            self.assertEqual(indexed.overlaps("period", start, end), plain.overlaps("period", start, end))
+            self.assertEqual(indexed.within("period", start, end), plain.within("period", start, end))
+            self.assertEqual(indexed.contains("period", start), plain.contains("period", start))
+
+    def test_row_ids_survive_deletes(self):
+        # Ідентифікатори рядків не зсуваються при видаленні, а індекси відповідають повному перегляду
+        rng = random.Random(11)
+        schema = [("id", int), ("dob", date), ("period", DateInterval)]
+        for storage in ("rows", "columnar"):
+            indexed, plain = Table("indexed", schema, storage), Table("plain", schema, storage)
+            indexed.create_index("id")
+            indexed.create_index("dob", kind="sorted")
+            indexed.create_index("period", kind="interval")
+            expected = {}
+            for i in range(400):
+                start = date(2024, 1, 1) + timedelta(days=rng.randrange(100))
+                row = [i % 37, start, DateInterval(start, start + timedelta(days=rng.randrange(20)))]
+                expected[indexed.add_row(row)] = row
+                plain.add_row(row)
+            self.assertEqual(sorted(expected), list(range(400)))
+
+            for row_id in rng.sample(sorted(expected), 150):
+                self.assertEqual(indexed.delete_row(row_id, by_id=True), expected.pop(row_id))
+                plain.delete_row(row_id, by_id=True)
+                if row_id % 3 == 0:
+                    survivor = rng.choice(sorted(expected))
+                    new_row = [-1, date(2030, 1, 1), DateInterval(date(2030, 1, 1), date(2030, 1, 5))]
+                    indexed.edit_row(survivor, new_row, by_id=True)
+                    plain.edit_row(survivor, new_row, by_id=True)
+                    expected[survivor] = new_row
+            with self.assertRaises(DatabaseError):
+                indexed.delete_row(max(set(range(400)) - set(expected)), by_id=True)
+
+            self.assertEqual(indexed.row_ids(), sorted(expected))
+            self.assertEqual([indexed.get_row(row_id) for row_id in sorted(expected)], list(indexed.rows))
+            for value in (-1, 0, 5):
+                self.assertEqual(indexed.lookup("id", value, by_id=True), plain.lookup("id", value, by_id=True))
+                self.assertEqual(indexed.lookup("id", value), plain.lookup("id", value))
+            lo, hi = date(2024, 1, 10), date(2024, 2, 10)
+            self.assertEqual(sorted(indexed.range("dob", lo, hi, by_id=True)),
+                             sorted(plain.range("dob", lo, hi, by_id=True)))
+            self.assertEqual(indexed.overlaps("period", lo, hi, by_id=True),
+                             plain.overlaps("period", lo, hi, by_id=True))
+            self.assertEqual(indexed.ordered_positions("dob"), plain.ordered_positions("dob"))
+            # Нові рядки не перевикористовують ідентифікатори видалених
+            self.assertEqual(indexed.add_row([1, lo, DateInterval(lo, hi)]), 400)
+
+    def test_positional_changes_skip_tombstones(self):
+        # Позиції рахуються лише за живими рядками, а сховище при цьому не ущільнюється
+        rng = random.Random(5)
+        for storage in ("rows", "columnar"):
+            table = Table("numbers", [("id", int)], storage)
+            table.compact_ratio = 0.9
+            table.add_rows([[i] for i in range(300)])
+            expected = [[i] for i in range(300)]
+            for step in range(200):
+                position = rng.randrange(-len(expected), len(expected))
+                if step % 4 == 3:
+                    self.assertEqual(table.edit_row(position, [-step]), expected[position])
+                    expected[position] = [-step]
+                elif step % 10 == 9:
+                    expected.append([1000 + step])
+                    table.add_row(expected[-1])
+                else:
+                    self.assertEqual(table.delete_row(position % len(expected)), expected.pop(position))
+            self.assertGreater(table.stats()["deleted"], 100)
+            self.assertEqual(list(table.iter_rows()), expected)
+            with self.assertRaises(DatabaseError):
+                table.edit_row(len(expected), [0])
+            self.assertEqual(list(table.rows), expected)
+            self.assertEqual(table.stats()["deleted"], 0)
+
+    def test_row_ids_persist_through_undo_wal_and_snapshots(self):
+        path = os.path.join(tempfile.mkdtemp(), "ids.db")
+        db = Database("TestDB")
+        db.create_table("users", [("id", int)])
+        db.enable_wal(path, group_commit=1)
+        users = db.tables["users"]
+        users.add_rows([[i] for i in range(10)])
+        users.delete_row(3, by_id=True)
+        users.delete_row(9, by_id=True)
+        db.undo()
+        db.undo()
+        users = db.tables["users"]
+        self.assertEqual(users.row_ids(), list(range(10)))
+        db.redo()
+        users = db.tables["users"]
+        users.delete_row(6, by_id=True)
+        users.edit_row(7, [70], by_id=True)
+        expected_ids = [0, 1, 2, 4, 5, 7, 8, 9]
+        self.assertEqual(users.row_ids(), expected_ids)
+
+        # Відтворення журналу дає ті самі ідентифікатори
+        replayed = Database.load_from_disk(path).tables["users"]
+        self.assertEqual(replayed.row_ids(), expected_ids)
+        self.assertEqual(replayed.get_row(7), [70])
+        db.disable_wal()
+
+        for compression in (None, "zlib"):
+            filename = f"{path}.{compression}"
+            db.save_to_disk(filename, compression)
+            loaded = Database.load_from_disk(filename).tables["users"]
+            self.assertEqual(loaded.row_ids(), expected_ids)
+            self.assertEqual(list(loaded.rows), users.rows)
+            self.assertEqual(loaded.add_row([10]), 10)
+
+    def test_write_ahead_log_replay(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("dob", date)])
+        db.enable_wal(path, group_commit=2)
+
+        # Зміни після контрольної точки потрапляють лише в журнал
+        snapshot_size = os.path.getsize(path)
+        db.create_table("tmp", [("id", int)])
+        db.drop_table("tmp")
+        for i in range(5):
+            db.tables["users"].add_row([i, date(2000, 1, i + 1)])
+        db.tables["users"].edit_row(0, [10, date(2001, 1, 1)])
+        db.tables["users"].delete_row(1)
+        db.save_to_disk(path)
+        self.assertEqual(os.path.getsize(path), snapshot_size)
+
+        loaded = Database.load_from_disk(path)
+        self.assertEqual(loaded.tables["users"].rows, db.tables["users"].rows)
+        self.assertNotIn("tmp", loaded.tables)
+
+        # Контрольна точка переносить зміни у знімок і очищає журнал
+        db.checkpoint()
+        self.assertEqual(os.path.getsize(path + ".wal"), 0)
+        self.assertEqual(Database.load_from_disk(path).tables["users"].rows, db.tables["users"].rows)
+        db.disable_wal()
+
+    def test_write_ahead_log_skips_log_already_in_snapshot(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.enable_wal(path)
+        db.create_table("t", [("id", int)])
+        db.tables["t"].add_row([1])
+
+        # Збій після заміни знімка, але до очищення журналу
+        with open(path + ".wal", "rb") as f:
+            log = f.read()
+        db.checkpoint()
+        with open(path + ".wal", "wb") as f:
+            f.write(log)
+        loaded = Database.load_from_disk(path, wal=True)
+        self.assertEqual(loaded.tables["t"].rows, [[1]])
+        loaded.tables["t"].add_row([2])
+        loaded.disable_wal()
+        self.assertEqual(Database.load_from_disk(path).tables["t"].rows, [[1], [2]])
+        db.disable_wal()
+
+        # Знімок, записаний без журналу, теж робить старий журнал застарілим
+        loaded = Database.load_from_disk(path)
+        loaded.tables["t"].add_row([3])
+        loaded.save_to_disk(path)
+        self.assertEqual(Database.load_from_disk(path).tables["t"].rows, [[1], [2], [3]])
+
+        # Журнал новішого покоління не застосовується до старішого знімка
+        older = path + ".old"
+        shutil.copy(path, older)
+        loaded = Database.load_from_disk(path, wal=True)
+        loaded.checkpoint()
+        loaded.tables["t"].add_row([4])
+        loaded.disable_wal()
+        shutil.copy(path + ".wal", older + ".wal")
+        with self.assertRaisesRegex(StorageError, "newer than the database snapshot"):
+            Database.load_from_disk(older)
+
+    def test_write_ahead_log_ignores_torn_tail(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.create_table("users", [("id", int)])
+        db.enable_wal(path)
+        db.tables["users"].add_row([1])
+        db.tables["users"].add_row([2])
+        db.disable_wal()
+
+        # Імітуємо збій посеред запису останньої зміни
+        with open(path + ".wal", "r+b") as f:
+            f.truncate(os.path.getsize(path + ".wal") - 3)
+
+        loaded = Database.load_from_disk(path, wal=True)
+        self.assertEqual(loaded.tables["users"].rows, [[1]])
+        loaded.tables["users"].add_row([3])
+        loaded.disable_wal()
+        self.assertEqual(Database.load_from_disk(path).tables["users"].rows, [[1], [3]])
+
+    def test_write_ahead_log_drops_torn_transaction(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.enable_wal(path)
+        db.create_table("accounts", [("id", int), ("balance", int)])
+        db.tables["accounts"].add_rows([[1, 100], [2, 0]])
+        with db.transaction() as tx:
+            tx["accounts"].edit_row(0, [1, 50])
+            tx["accounts"].edit_row(1, [2, 50])
+        self.assertEqual(Database.load_from_disk(path).tables["accounts"].rows, [[1, 50], [2, 50]])
+        db.undo()
+        db.disable_wal()
+        self.assertEqual(Database.load_from_disk(path).tables["accounts"].rows, [[1, 100], [2, 0]])
+
+        # Збій посеред запису скасування: транзакцію не відтворено навіть частково
+        with open(path + ".wal", "r+b") as f:
+            f.truncate(os.path.getsize(path + ".wal") - 3)
+        self.assertEqual(Database.load_from_disk(path).tables["accounts"].rows, [[1, 50], [2, 50]])
+
+        # Збій посеред запису самої транзакції
+        with open(path + ".wal", "r+b") as f:
+            f.truncate(os.path.getsize(path + ".wal") - 3)
+        self.assertEqual(Database.load_from_disk(path).tables["accounts"].rows, [[1, 100], [2, 0]])
+
+    def test_write_ahead_log_checkpoint_inside_transaction(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.create_table("users", [("id", int)])
+        db.enable_wal(path, checkpoint_interval=3)
+
+        # Поріг контрольної точки припадає на середину запису транзакції
+        for count in (6, 7):
+            with db.transaction() as tx:
+                tx.create_table(f"logs{count}", [("message", str)])
+                for i in range(count):
+                    tx["users"].add_row([i])
+                tx[f"logs{count}"].add_row(["done"])
+            loaded = Database.load_from_disk(path)
+            self.assertEqual(loaded.tables["users"].rows, db.tables["users"].rows)
+            self.assertEqual(loaded.tables[f"logs{count}"].rows, [["done"]])
+        self.assertLess(os.path.getsize(path + ".wal"), 100)
+        db.disable_wal()
+
+    def test_write_ahead_log_keeps_indexes(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("dob", date)])
+        db.tables["users"].add_row([1, date(1990, 5, 15)])
+        db.enable_wal(path)
+        users = db.tables["users"]
+        users.create_index("id")
+        users.create_index("dob", kind="sorted")
+        with db.transaction() as tx:
+            tx["users"].drop_index("id")
+            tx["users"].create_index("id", kind="sorted")
+        db.save_to_disk(path)
+
+        loaded = Database.load_from_disk(path)
+        self.assertEqual({column: index.kind for column, index in loaded.tables["users"].indexes.items()},
+                         {"id": "sorted", "dob": "sorted"})
+        self.assertEqual(loaded.tables["users"].range("dob", date(1990, 1, 1)), [0])
+
+        # Зміни індексів скасовуються як і зміни рядків
+        db.undo()
+        self.assertEqual(db.tables["users"].indexes["id"].kind, "hash")
+        db.undo()
+        db.save_to_disk(path)
+        self.assertEqual(list(Database.load_from_disk(path).tables["users"].indexes), ["id"])
+        db.disable_wal()
+
+    def _binary_database_file(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("name", str), ("dob", date)])
+        db.create_table("bookings", [("id", int), ("score", float), ("period", DateInterval)], storage="columnar")
+        db.tables["users"].rows.extend([[1, "Ann", date(1990, 5, 15)], [2, "Bob", date(1991, 1, 1)]])
+        db.tables["bookings"].add_row([7, 0.5, DateInterval(date(2024, 1, 1), date(2024, 1, 9))])
+        db.tables["bookings"].create_index("period", kind="interval")
+
+        path = os.path.join(tempfile.mkdtemp(), "binary.db")
+        db.save_to_disk(path)
+        return db, path
+
+    def test_binary_format_loads_tables_lazily(self):
+        db, path = self._binary_database_file()
+        loaded = Database.load_from_disk(path)
+
+        self.assertEqual(sorted(loaded.tables), ["bookings", "users"])
+        self.assertFalse(loaded.tables.is_loaded("users"))
+        self.assertEqual(loaded.tables["users"].rows, db.tables["users"].rows)
+        self.assertTrue(loaded.tables.is_loaded("users"))
+        self.assertFalse(loaded.tables.is_loaded("bookings"))
+
+        bookings = loaded.tables["bookings"]
+        self.assertEqual(list(bookings.rows), list(db.tables["bookings"].rows))
+        self.assertEqual(bookings.contains("period", date(2024, 1, 3)), [0])
+
+        # Завантажені таблиці далі працюють як звичайні
+        bookings.add_row([8, 1.5, DateInterval(date(2024, 2, 1), date(2024, 2, 2))])
+        self.assertEqual(bookings.contains("period", date(2024, 2, 1)), [1])
+
+    def test_binary_format_detects_damage(self):
+        _, path = self._binary_database_file()
+        with open(path, "rb") as f:
+            data = bytearray(f.read())
+
+        # Зіпсований байт у першому сегменті
+        data[40] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(data)
+        loaded = Database.load_from_disk(path)
+        with self.assertRaisesRegex(Exception, "Corrupt segment"):
+            loaded.tables["users"]
+
+        # Обрізаний файл втрачає каталог
+        with open(path, "wb") as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaisesRegex(Exception, "Truncated"):
+            Database.load_from_disk(path)
+
+        with open(path, "wb") as f:
+            f.write(data[:10])
+        with self.assertRaisesRegex(Exception, "Truncated"):
+            Database.load_from_disk(path)
+
+    def test_binary_format_encodes_and_compresses_blocks(self):
+        from dbformat import write_database
+
+        schema = [(column.name, column) for column in bench.GENERATORS]
+        db = Database("TestDB")
+        db.create_table("rows", schema)
+        db.create_table("columns", schema, storage="columnar")
+        rows = bench.generate_rows(300, schema=schema)
+        rows[5][0], rows[6][0] = -2 ** 63, 2 ** 63 - 1  # Крайні значення потребують найширших блоків
+        for table in db.tables.values():
+            table.add_rows(rows)
+        for row_id in (3, 4, 150):
+            db.tables["rows"].delete_row(row_id, by_id=True)
+        directory = tempfile.mkdtemp()
+
+        pickle_path = os.path.join(directory, "snapshot.pickle")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(db, f)
+        for compression in (None, "zlib", "lzma"):
+            path = os.path.join(directory, f"snapshot.{compression}")
+            write_database(db, path, compression, block_rows=64)
+            self.assertLess(os.path.getsize(path), os.path.getsize(pickle_path))
+            for workers in ((None, 2) if compression == "zlib" else (None,)):
+                loaded = Database.load_from_disk(path, decode_workers=workers)
+                for name, table in db.tables.items():
+                    self.assertEqual(list(loaded.tables[name].rows), list(table.rows))
+                    self.assertEqual(loaded.tables[name].row_ids(), table.row_ids())
+                # Нові рядки продовжують нумерацію ідентифікаторів
+                self.assertEqual(loaded.tables["rows"].add_row(rows[0]), 300)
+
+        with self.assertRaisesRegex(Exception, "Unknown compression"):
+            db.save_to_disk(os.path.join(directory, "snapshot.bz2"), compression="bz2")
+
+    def test_legacy_pickle_is_converted_safely(self):
+        from dbformat import detect_format, migrate
+
+        db, _ = self._binary_database_file()
+        db.tables["users"].create_index("id")
+        directory = tempfile.mkdtemp()
+
+        # Старі файли записувались графічним інтерфейсом, запущеним як __main__
+        path = os.path.join(directory, "legacy.db")
+        legacy = pickle.dumps(db, protocol=0).replace(b"ctask\n", b"c__main__\n")
+        with open(path, "wb") as f:
+            f.write(legacy)
+        loaded = Database.load_from_disk(path)
+        self.assertEqual(detect_format(path), "binary")
+        for name in ("users", "bookings"):
+            self.assertEqual(list(loaded.tables[name].rows), list(db.tables[name].rows))
+        self.assertEqual(loaded.tables["users"].lookup("id", 2), [1])
+        with open(path + ".bak", "rb") as f:
+            self.assertEqual(f.read(), legacy)
+
+        # Базу, яку не можна записати в бінарному форматі, повертаємо без перетворення
+        big = Database("big")
+        big.create_table("numbers", [("id", int)])
+        # Такі значення приймали попередні версії, у яких рядки не перевірялись
+        big.tables["numbers"].rows = [[2 ** 70]]
+        big_path = os.path.join(directory, "big.db")
+        with open(big_path, "wb") as f:
+            f.write(pickle.dumps(big))
+        loaded = Database.load_from_disk(big_path, wal=True)
+        self.assertEqual(loaded.tables["numbers"].rows, [[2 ** 70]])
+        loaded.tables["numbers"].add_row([1])
+        loaded.disable_wal()
+        self.assertEqual(detect_format(big_path), "pickle")
+        self.assertEqual(sorted(os.listdir(directory)), ["big.db", "big.db.wal", "legacy.db", "legacy.db.bak"])
+        self.assertEqual(Database.load_from_disk(big_path).tables["numbers"].rows, [[2 ** 70], [1]])
+
+        # Файл, що намагається викликати функцію, не виконується
+        marker = os.path.join(directory, "marker")
+        open(marker, "w").close()
+
+        class Payload:
+            def __reduce__(self):
+                return os.remove, (marker,)
+
+        with open(path, "wb") as f:
+            pickle.dump(Payload(), f)
+        with self.assertRaisesRegex(DatabaseError, "posix.remove|os.remove|nt.remove"):
+            Database.load_from_disk(path)
+        self.assertTrue(os.path.exists(marker))
+
+        path = os.path.join(directory, "shop.json")
+        with open(path, "w") as f:
+            json.dump({"items": {"columns": [["id", "int"], ["sold", "date"]], "rows": [[1, "2024-01-02"]]}}, f)
+        loaded = Database.load_from_disk(path)
+        self.assertEqual((loaded.name, loaded.tables["items"].rows), ("shop", [[1, date(2024, 1, 2)]]))
+
+        self.assertEqual(migrate({"tables": [{"rows": 3}]}, 1), {"tables": [{"rows": 3, "next_id": 3}]})
+
+    def test_write_ahead_log_records_are_json(self):
+        path = os.path.join(tempfile.mkdtemp(), "db.bin")
+        db = Database("TestDB")
+        db.enable_wal(path, group_commit=1)
+        db.create_table("bookings", [("id", int), ("day", date), ("period", DateInterval)], storage="columnar")
+        period = DateInterval(date(2024, 1, 1), date(2024, 1, 9))
+        db.tables["bookings"].add_rows([[1, date(2024, 1, 1), period], [2, date(2024, 1, 2), period]])
+        db.tables["bookings"].create_index("period", kind="interval")
+        db.tables["bookings"].delete_row(0)
+        db.drop_table("bookings")
+        db.undo()
+        db.disable_wal()
+
+        with open(path + ".wal", "rb") as f:
+            data = f.read()
+        self.assertNotIn(b"\x80", data)
+        self.assertIn(b'["create_table",["bookings",[["id","int"],["day","date"],["period","dateInvl"]],"columnar"]]',
+                      data)
+        self.assertIn(b'[2,738887,[738886,738894]]', data)
+
+        # Записи журналів попередніх версій (pickle) відтворюються тим самим обмеженим читанням
+        from wal import RECORD_HEADER
+        payload = pickle.dumps(("add_row", ("bookings", [3, date(2024, 1, 3), period])), protocol=2)
+        with open(path + ".wal", "ab") as f:
+            f.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+
+        table = Database.load_from_disk(path).tables["bookings"]
+        self.assertEqual(table.row_ids(), [1, 2])
+        self.assertEqual(list(table.rows), [[2, date(2024, 1, 2), period], [3, date(2024, 1, 3), period]])
+        self.assertEqual(table.overlaps("period", date(2024, 1, 5), date(2024, 1, 5)), [0, 1])
+
+        from wal import decode_record
+        for payload in (b'["add_row",["bookings",[1]]] []', b'5', b'["add_row"]'):
+            with self.assertRaises(StorageError):
+                decode_record(payload)
+
+
+    def test_bulk_load_reports_bad_rows(self):
+        db = Database("TestDB")
+        db.create_table("bookings", [("id", int), ("day", date), ("period", DateInterval)])
+        table = db.tables["bookings"]
+        table.create_index("id")
+
+        path = os.path.join(tempfile.mkdtemp(), "rows.csv")
+        with open(path, "w", newline="") as f:
+            f.write("period,id,day\n"
+                    "2024-01-01 to 2024-01-03,1,2024-05-01\n"
+                    "2024-01-05/2024-01-02,2,2024-05-02\n"
+                    "2024-02-01/2024-02-03,x,2024-05-03\n"
+                    "2024-03-01 to 2024-03-01,4,2024-05-04\n")
+
+        report = table.bulk_load(path, format="csv", batch_size=1)
+        self.assertEqual((report.loaded, report.rejected), (2, 2))
+        self.assertEqual([number for number, _ in report.errors], [3, 4])
+        self.assertEqual(table.rows[1], [4, date(2024, 5, 4), DateInterval(date(2024, 3, 1), date(2024, 3, 1))])
+        self.assertEqual(table.lookup("id", 4), [1])
+
+    def test_bulk_load_rejects_out_of_range_ints(self):
+        records = [[1], [2 ** 70], [3], ["-9223372036854775809"], [5]]
+        for storage in ("rows", "columnar"):
+            table = Table("numbers", [("id", int)], storage)
+            report = table.bulk_load(records)
+            self.assertEqual((report.loaded, report.rejected), (3, 2))
+            self.assertEqual([number for number, _ in report.errors], [2, 4])
+            self.assertEqual((list(table.rows), table.row_ids()), ([[1], [3], [5]], [0, 1, 2]))
+
+        # Якщо значення відхиляє лише сховище, решта пачки все одно додається
+        table = Table("numbers", [("id", int)], "columnar")
+        table._in_range = lambda rows: True
+        table._validate = lambda row: None
+        report = table.bulk_load(records)
+        self.assertEqual((report.loaded, report.rejected), (3, 2))
+        self.assertEqual([number for number, _ in report.errors], [2, 4])
+        self.assertEqual(list(table.rows), [[1], [3], [5]])
+
+    def test_export_and_reload_jsonl(self):
+        db = Database("TestDB")
+        schema = [("id", int), ("score", float), ("period", DateInterval)]
+        db.create_table("a", schema)
+        db.create_table("b", schema)
+        db.tables["a"].add_row([1, 0.25, DateInterval(date(2024, 1, 1), date(2024, 1, 2))])
+        db.tables["a"].add_row([2, 1.0, DateInterval(date(2024, 2, 1), date(2024, 2, 2))])
+
+        for file_format in ("jsonl", "csv"):
+            path = os.path.join(tempfile.mkdtemp(), "rows." + file_format)
+            self.assertEqual(db.tables["a"].export(path, format=file_format), 2)
+            db.tables["b"].rows.clear()
+            report = db.tables["b"].bulk_load(path, format=file_format)
+            self.assertEqual(report.rejected, 0)
+            self.assertEqual(db.tables["b"].rows, db.tables["a"].rows)
+
+    def test_import_json_layout(self):
+        path = os.path.join(tempfile.mkdtemp(), "database.json")
+        with open(path, "w") as f:
+            json.dump({"Users": {"columns": [["ID", "int"], ["Age", "int"], ["Born", "date"]],
+                                 "rows": [[1, 31, "1993-02-01"], [2, "old", "1950-01-01"]]}}, f)
+
+        db = Database("TestDB")
+        reports = db.import_json(path)
+        self.assertEqual(reports["Users"].loaded, 1)
+        self.assertEqual(db.tables["Users"].rows, [[1, 31, date(1993, 2, 1)]])
+
+    def test_bulk_load_database_json_layout(self):
+        # Файл у форматі database.json з кількома таблицями
+        path = os.path.join(tempfile.mkdtemp(), "database.json")
+        with open(path, "w") as f:
+            json.dump({"Users": {"columns": [["ID", "int"], ["Name", "str"]], "rows": [[1, "Ann"], [2, "Bob"]]},
+                       "Admins": {"columns": [["ID", "int"], ["Name", "str"]], "rows": [[7, "Eve"]]}}, f)
+        schema = [("ID", int), ("Name", str)]
+
+        users = Table("Users", schema)
+        self.assertEqual(users.bulk_load(path, format="json").loaded, 2)
+        self.assertEqual(users.rows, [[1, "Ann"], [2, "Bob"]])
+        people = Table("people", schema)
+        self.assertEqual(people.bulk_load(path, format="json", source_table="Admins").loaded, 1)
+        self.assertEqual(people.rows, [[7, "Eve"]])
+        with self.assertRaises(SchemaError):
+            people.bulk_load(path, format="json")
+        with self.assertRaises(SchemaError):
+            people.bulk_load(path, format="json", source_table="Guests")
+
+        # Файл бази з репозиторію — одна таблиця, ім'я якої не збігається з іменем цільової
+        imported = Table("imported", [("ID", int), ("Name", str), ("Age", int)])
+        report = imported.bulk_load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.json"),
+                                    format="json")
+        self.assertEqual((report.loaded, report.rejected), (1, 0))
+        self.assertEqual(imported.rows, [[1, "John Smith", 31]])
+
+        with open(path, "w") as f:
+            json.dump("rows", f)
+        with self.assertRaises(SchemaError):
+            people.bulk_load(path, format="json")
+
+
+    def test_char_and_string_columns(self):
+        db = Database("TestDB")
+        db.create_table("users", [("initial", CHAR), ("name", STRING), ("nick", str)])
+        table = db.tables["users"]
+
+        table.add_row(["J", "John Doe", "Johnny"])
+        with self.assertRaisesRegex(Exception, "Expected char"):
+            table.add_row(["Jo", "John Doe", "Johnny"])
+        with self.assertRaisesRegex(Exception, "Expected string, got int"):
+            table.add_row(["J", 5, "Johnny"])
+
+        # Дескриптори типів зберігаються як одиночні об'єкти
+        restored = pickle.loads(pickle.dumps(table))
+        self.assertIs(restored.column_types[0], CHAR)
+        self.assertEqual(restored.column_types[2], STRING)
+        with self.assertRaises(Exception):
+            restored.add_row(["Jo", "John Doe", "Johnny"])
+
+    def test_validate_rows_batch(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("initial", CHAR), ("dob", date)])
+        table = db.tables["users"]
+
+        rows = [[1, "A", date(2000, 1, 1)], [2, "BB", date(2000, 1, 2)], [3, "C"], [4, "D", "2000-01-04"]]
+        errors = table.validate_rows(rows)
+        self.assertEqual([position for position, _ in errors], [1, 2, 3])
+
+        with self.assertRaises(Exception):
+            table.add_rows(rows)
+        self.assertEqual(len(table.rows), 0)
+        table.add_rows([rows[0]])
+        self.assertEqual(table.rows, [rows[0]])
+
+    def test_int_range_is_validated_before_storage(self):
+        for storage in ("rows", "columnar"):
+            table = Table("numbers", [("id", int), ("score", int)], storage)
+            table.create_index("id")
+            table.add_row([1, 1])
+            rows = [[2, 2], [3, 3], [2 ** 70, 4], [5, -2 ** 63 - 1], [2 ** 63 - 1, -2 ** 63]]
+            self.assertEqual([position for position, _ in table.validate_rows(rows)], [2, 3])
+            with self.assertRaises(ValidationError):
+                table.add_rows(rows)
+            with self.assertRaises(ValidationError):
+                table.add_row([2 ** 63, 0])
+            with self.assertRaises(ValidationError):
+                table.edit_row(0, [0, -2 ** 64])
+            # Жодна зі змін не застосована частково
+            self.assertEqual(list(table.rows), [[1, 1]])
+            self.assertEqual(table.row_ids(), [0])
+            self.assertEqual(table.add_rows([rows[0], rows[4]]), range(1, 3))
+            self.assertEqual(table.lookup("id", 2 ** 63 - 1), [2])
+
+        # Колонкове сховище кодує всю пачку до вставки
+        table = Table("numbers", [("id", int)], "columnar")
+        with self.assertRaises(ValidationError):
+            table._append_rows([[1], [2 ** 64]])
+        self.assertEqual((len(table.rows), table.row_ids()), (0, []))
+
+    def test_import_repository_database_json(self):
+        db = Database("TestDB")
+        reports = db.import_json(os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.json"))
+        self.assertEqual(reports["Users"].rejected, 0)
+        self.assertEqual(db.tables["Users"].rows, [[1, "John Smith", 31]])
+
+
+    def _staff_database(self):
+        db = Database("TestDB")
+        db.create_table("staff", [("id", int), ("dept", str), ("salary", float), ("hired", date)])
+        db.create_table("depts", [("dept", str), ("floor", int)])
+        staff = db.tables["staff"]
+        staff.add_rows([
+            [1, "dev", 100.0, date(2020, 1, 1)],
+            [2, "dev", 120.0, date(2021, 1, 1)],
+            [3, "ops", 90.0, date(2019, 1, 1)],
+            [4, "hr", 70.0, date(2022, 1, 1)],
+        ])
+        db.tables["depts"].add_rows([["dev", 3], ["ops", 1]])
+        return db
+
+    def test_query_filter_project_sort(self):
+        staff = self._staff_database().tables["staff"]
+        query = staff.query().where("salary", ">", 80.0).select("id", "salary").order_by("salary", descending=True)
+
+        self.assertEqual(query.columns, ["id", "salary"])
+        self.assertEqual(query.all(), [[2, 120.0], [1, 100.0], [3, 90.0]])
+        self.assertEqual(staff.query().where(lambda row: row["dept"] == "hr").select("id").all(), [[4]])
+        self.assertEqual(staff.query().order_by("hired").limit(2).select("id").all(), [[3], [1]])
+
+    def test_query_aggregates(self):
+        staff = self._staff_database().tables["staff"]
+
+        by_dept = staff.query().group_by("dept").agg(n="count", total=("sum", "salary"), top=("max", "salary"))
+        self.assertEqual(by_dept.order_by("dept").all(), [
+            ["dev", 2, 220.0, 120.0],
+            ["hr", 1, 70.0, 70.0],
+            ["ops", 1, 90.0, 90.0],
+        ])
+        self.assertEqual(staff.query().agg(avg=("avg", "salary")).all(), [[95.0]])
+        self.assertEqual(staff.query().where("id", ">", 10).agg(n="count").all(), [[0]])
+
+    def test_query_uses_indexes_and_hash_join(self):
+        db = self._staff_database()
+        staff = db.tables["staff"]
+        self.assertTrue(staff.query().where("id", "==", 2).explain().startswith("Scan staff"))
+
+        staff.create_index("id")
+        staff.create_index("hired", kind="sorted")
+        query = staff.query().where("id", "in", [2, 4]).select("id")
+        self.assertIn("IndexLookup staff.id", query.explain())
+        self.assertEqual(query.all(), [[2], [4]])
+
+        query = staff.query().where("hired", ">", date(2020, 1, 1)).select("id")
+        self.assertIn("IndexRange staff.hired", query.explain())
+        self.assertEqual(query.all(), [[2], [4]])
+
+        joined = staff.query().join(db.tables["depts"], on="dept").select("id", "floor")
+        self.assertIn("HashJoin", joined.explain())
+        self.assertEqual(joined.order_by("id").all(), [[1, 3], [2, 3], [3, 1]])
+        self.assertIn("depts.dept", staff.query().join(db.tables["depts"], on="dept").columns)
+
+
+    def test_pages_and_ordered_positions(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("score", float)], storage="columnar")
+        table = db.tables["users"]
+        table.add_rows([[i, float((i * 7) % 10)] for i in range(10)])
+
+        self.assertEqual(table.page(8, 5), [[8, 6.0], [9, 3.0]])
+        order = table.ordered_positions("score", descending=True)
+        self.assertEqual(table.page(0, 2, order), [[7, 9.0], [4, 8.0]])
+
+        # Відсортований індекс дає той самий порядок без повного сортування
+        table.create_index("score", kind="sorted")
+        self.assertEqual(table.ordered_positions("score", descending=True), order)
+
+
+    def _wait(self, executor, *tasks):
+        # Імітація циклу подій інтерфейсу
+        while any(not task.future.done() for task in tasks) or executor.active:
+            executor.poll()
+            time.sleep(0.01)
+
+    def test_background_save_load_and_difference(self):
+        executor = TaskExecutor(cpu_workers=1)
+        self.addCleanup(executor.shutdown, True)
+        db = Database("TestDB")
+        schema = [("id", int)]
+        db.create_table("a", schema)
+        db.create_table("b", schema)
+        db.tables["a"].add_rows([[1], [2], [3]])
+        db.tables["b"].add_rows([[2]])
+
+        path = os.path.join(tempfile.mkdtemp(), "background.db")
+        results, progress = {}, []
+        save = executor.submit_io("save", save_job, db, path, on_done=lambda result: results.update(save=result),
+                                  on_progress=lambda fraction, message: progress.append(fraction))
+        self._wait(executor, save)
+        self.assertEqual(results["save"], path)
+        self.assertEqual(progress[-1], 1.0)
+
+        load = executor.submit_io("load", load_job, path, on_done=lambda result: results.update(load=result))
+        payload = pickle.dumps((db.tables["a"], db.tables["b"]))
+        diff = executor.submit_cpu("diff", difference_job, payload, on_done=lambda result: results.update(diff=result))
+        self._wait(executor, load, diff)
+        self.assertEqual(results["load"].tables["a"].rows, [[1], [2], [3]])
+        self.assertEqual(results["diff"], [[1], [3]])
+
+    def test_background_difference_from_snapshots_and_save_progress(self):
+        executor = TaskExecutor(cpu_workers=1)
+        self.addCleanup(executor.shutdown, True)
+        db = Database("TestDB")
+        schema = [("id", int), ("dob", date)]
+        db.create_table("a", schema)
+        db.create_table("b", schema, storage="columnar")
+        db.tables["a"].add_rows([[i, date(2000, 1, 1 + i % 28)] for i in range(50)])
+        db.tables["b"].add_rows([[i, date(2000, 1, 1 + i % 28)] for i in range(0, 50, 2)])
+        db.tables["a"].delete_row(1)
+
+        # Знімки беруться під блокуванням, а зміни після цього в них не потрапляють
+        with db.lock:
+            snapshots = (table_snapshot(db.tables["a"]), table_snapshot(db.tables["b"]))
+        db.tables["a"].add_row([99, date(2001, 1, 1)])
+        results, progress = {}, []
+        prepare = executor.submit_io("prepare", difference_payload_job, *snapshots, 7,
+                                     on_done=lambda payload: results.update(payload=payload),
+                                     on_progress=lambda fraction, message: progress.append(fraction))
+        self._wait(executor, prepare)
+        self.assertEqual(len(progress), 7 + 4)
+        diff = executor.submit_cpu("diff", difference_job, results["payload"],
+                                   on_done=lambda result: results.update(diff=result))
+        self._wait(executor, diff)
+        self.assertEqual(results["diff"], [[i, date(2000, 1, 1 + i % 28)] for i in range(3, 50, 2)])
+
+        # Прогрес збереження зростає ще під час кодування знімка
+        progress.clear()
+        path = os.path.join(tempfile.mkdtemp(), "progress.db")
+        save = executor.submit_io("save", save_job, db, path,
+                                  on_progress=lambda fraction, message: progress.append((fraction, message)))
+        self._wait(executor, save)
+        encoding = [fraction for fraction, message in progress if message == "Encoding"]
+        self.assertEqual(len(encoding), 4)
+        self.assertEqual(encoding, sorted(encoding))
+        self.assertLess(encoding[0], encoding[-1])
+        self.assertEqual(progress[-1], (1.0, "Saving"))
+
+    def test_background_task_cancellation_and_errors(self):
+        executor = TaskExecutor()
+        self.addCleanup(executor.shutdown, True)
+        started = threading.Event()
+
+        def wait_for_cancel(task):
+            started.set()
+            while not task.cancelled:
+                time.sleep(0.01)
+            return "finished"
+
+        done, errors = [], []
+        task = executor.submit_io("wait", wait_for_cancel, on_done=done.append)
+        started.wait()
+        task.cancel()
+        failing = executor.submit_io("fail", lambda task: 1 / 0, on_error=errors.append)
+        self._wait(executor, task, failing)
+
+        # Результат скасованого завдання відкидається, помилка передається в колбек
+        self.assertEqual(done, [])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+
+
+    def test_undo_redo_row_changes(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("dob", date)])
+        users = db.tables["users"]
+        users.create_index("id", kind="sorted")
+        for i in range(4):
+            users.add_row([i, date(2000, 1, i + 1)])
+        expected = [list(row) for row in users.rows]
+
+        users.edit_row(1, [10, date(2001, 1, 1)])
+        users.delete_row(0)
+        db.undo()
+        db.undo()
+        self.assertEqual(users.rows, expected)
+        self.assertEqual(users.lookup("id", 0), [0])
+        self.assertEqual(users.lookup("id", 3), [3])
+
+        db.redo()
+        self.assertEqual(users.rows[1], [10, date(2001, 1, 1)])
+        db.redo()
+        self.assertEqual(users.lookup("id", 10), [0])
+        self.assertFalse(db.journal.can_redo())
+
+        # Нова зміна після скасування очищає стек повторення
+        db.undo()
+        users.add_row([5, date(2000, 2, 1)])
+        self.assertFalse(db.journal.can_redo())
+
+    def test_undo_drop_table_and_groups(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int)])
+        users = db.tables["users"]
+        with db.undo_group():
+            report = users.bulk_load([[i] for i in range(10)], batch_size=3)
+            users.add_row([99])
+        self.assertEqual(report.loaded, 10)
+        db.drop_table("users")
+
+        db.undo()
+        self.assertIs(db.tables["users"], users)
+        users.add_row([100])
+        db.undo()
+        db.undo()  # Уся група скасовується однією дією
+        self.assertEqual(users.rows, [])
+        db.undo()
+        self.assertNotIn("users", db.tables)
+        with self.assertRaises(Exception):
+            db.undo()
+
+        db.redo()
+        db.redo()
+        self.assertEqual(len(db.tables["users"].rows), 11)
+
+    def test_undo_journal_is_bounded_and_logged(self):
+        path = os.path.join(tempfile.mkdtemp(), "wal.db")
+        db = Database("TestDB")
+        db.create_table("users", [("id", int)])
+        db.journal.max_entries = 5
+        for i in range(10):
+            db.tables["users"].add_row([i])
+        self.assertEqual(len(db.journal.undo_stack), 5)
+
+        db.journal.max_bytes = 0
+        db.tables["users"].add_row([10])
+        self.assertEqual(len(db.journal.undo_stack), 0)
+        self.assertEqual(db.journal.size, 0)
+
+        # Скасування потрапляє в журнал попереднього запису як звичайні зміни
+        db.journal.max_bytes = 2 ** 20
+        db.enable_wal(path)
+        db.tables["users"].delete_row(3)
+        db.drop_table("users")
+        db.undo()
+        db.undo()
+        db.disable_wal()
+        loaded = Database.load_from_disk(path)
+        self.assertEqual(loaded.tables["users"].rows, [[i] for i in range(11)])
+        self.assertFalse(loaded.journal.can_undo())
+
+    def test_transaction_commit_and_rollback(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int)])
+        db.tables["users"].create_index("id")
+        db.tables["users"].add_row([1])
+        snapshot = db.snapshot()
+
+        with db.transaction() as tx:
+            tx["users"].add_row([2])
+            tx["users"].edit_row(0, [10])
+            tx.create_table("logs", [("message", str)])
+            tx["logs"].add_row(["edited"])
+            # До фіксації зміни не видно ні в базі, ні в знімку
+            self.assertEqual(db.tables["users"].rows, [[1]])
+            self.assertNotIn("logs", db.tables)
+        self.assertEqual(db.tables["users"].rows, [[10], [2]])
+        self.assertEqual(db.tables["users"].lookup("id", 10), [0])
+        self.assertEqual(snapshot["users"].rows, [[1]])
+        self.assertNotIn("logs", snapshot)
+
+        with self.assertRaises(ZeroDivisionError):
+            with db.transaction() as tx:
+                tx["users"].delete_row(0)
+                tx.drop_table("logs")
+                1 / 0
+        self.assertEqual(db.tables["users"].rows, [[10], [2]])
+        self.assertIn("logs", db.tables)
+
+        # Зміни опублікованої версії доходять до бази, транзакція скасовується як одна дія
+        db.tables["users"].add_row([3])
+        db.undo()
+        db.undo()
+        self.assertEqual(db.tables["users"].rows, [[1]])
+        self.assertNotIn("logs", db.tables)
+        with self.assertRaises(DatabaseError):
+            with db.transaction():
+                db.redo()
+        self.assertTrue(db.journal.can_redo())
+
+    def test_transactions_on_lazily_opened_database(self):
+        db, path = self._binary_database_file()
+        loaded = Database.load_from_disk(path)
+        snapshot = loaded.snapshot()
+        with loaded.transaction() as tx:
+            tx["users"].add_row([3, "Cid", date(1992, 2, 2)])
+        self.assertFalse(loaded.tables.is_loaded("bookings"))
+        self.assertEqual(len(loaded.tables["users"].rows), 3)
+        self.assertEqual(snapshot["users"].rows, db.tables["users"].rows)
+        self.assertEqual(snapshot["bookings"].rows, loaded.tables["bookings"].rows)
+
+    def test_snapshot_is_isolated_from_undo_and_direct_writes(self):
+        db = Database("TestDB")
+        db.create_table("accounts", [("id", int), ("balance", int)])
+        db.create_table("log", [("message", str)])
+        accounts = db.tables["accounts"]
+        accounts.add_rows([[1, 100], [2, 0]])
+        accounts.create_index("id")
+        with db.undo_group():
+            accounts.edit_row(0, [1, 50])
+            accounts.edit_row(1, [2, 50])
+            db.tables["log"].add_row(["transfer"])
+
+        snapshot = db.snapshot()
+        db.undo()
+        self.assertIs(db.tables["accounts"], accounts)
+        self.assertEqual((accounts.rows, db.tables["log"].rows), ([[1, 100], [2, 0]], []))
+        self.assertEqual((snapshot["accounts"].rows, snapshot["log"].rows), ([[1, 50], [2, 50]], [["transfer"]]))
+        self.assertEqual(snapshot["accounts"].lookup("id", 2), [1])
+
+        snapshot = db.snapshot()
+        accounts.add_row([3, 0])
+        accounts.delete_row(0)
+        self.assertEqual(snapshot["accounts"].rows, [[1, 100], [2, 0]])
+        self.assertEqual(snapshot["accounts"].lookup("id", 1), [0])
+        self.assertEqual(accounts.rows, [[2, 0], [3, 0]])
+        self.assertEqual(accounts.lookup("id", 3), [1])
+
+        # Читання знімка не будує індексів спільної версії таблиці
+        accounts.rows = [[5, 0], [6, 0]]
+        snapshot = db.snapshot()
+        self.assertIs(snapshot["accounts"], accounts)
+        self.assertEqual(snapshot["accounts"].lookup("id", 6), [1])
+        self.assertFalse(accounts.indexes["id"].built)
+        del snapshot
+        self.assertEqual(accounts.lookup("id", 6), [1])
+        self.assertTrue(accounts.indexes["id"].built)
+
+        # Таблиця, декодована з файлу вже після знімка, теж відокремлюється від змін
+        _, path = self._binary_database_file()
+        loaded = Database.load_from_disk(path)
+        snapshot = loaded.snapshot()
+        loaded.tables["users"].delete_row(0)
+        self.assertEqual([row[0] for row in snapshot["users"].rows], [1, 2])
+        self.assertEqual([row[0] for row in loaded.tables["users"].rows], [2])
+
+    def test_snapshot_readers_see_consistent_versions(self):
+        db = Database("TestDB")
+        db.create_table("accounts", [("id", int), ("balance", int)])
+        db.create_table("transfers", [("source", int), ("target", int), ("amount", int)])
+        db.create_table("meta", [("transfers", int)])
+        db.tables["accounts"].add_rows([[i, 100] for i in range(20)])
+        db.tables["meta"].add_row([0])
+        db.journal.max_entries = 10
+
+        done = threading.Event()
+        failures = []
+        checked = []
+
+        def reader():
+            count = 0
+            while not done.is_set() or count == 0:
+                snapshot = db.snapshot()
+                total = sum(balance for _, balance in snapshot["accounts"].rows)
+                transfers = len(snapshot["transfers"].rows)
+                if total != 2000 or transfers != snapshot["meta"].rows[0][0]:
+                    failures.append((total, transfers))
+                count += 1
+            checked.append(count)
+
+        def writer():
+            rng = random.Random(7)
+            for number in range(1, 301):
+                with db.transaction() as tx:
+                    accounts = tx["accounts"]
+                    source, target = rng.sample(range(20), 2)
+                    amount = rng.randint(1, 50)
+                    accounts.edit_row(source, [source, accounts.rows[source][1] - amount])
+                    accounts.edit_row(target, [target, accounts.rows[target][1] + amount])
+                    tx["transfers"].add_row([source, target, amount])
+                    tx["meta"].edit_row(0, [number])
+            done.set()
+
+        threads = [threading.Thread(target=reader) for _ in range(8)] + [threading.Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(len(checked), 8)
+        self.assertEqual(len(db.tables["transfers"].rows), 300)
+        self.assertEqual(sum(balance for _, balance in db.tables["accounts"].rows), 2000)
+
+    def test_typed_exceptions(self):
+        db = Database("TestDB")
+        db.create_table("users", [("id", int), ("dob", date)])
+        db.tables["users"].add_row([1, date(2000, 1, 1)])
+        with self.assertRaises(ValidationError):
+            db.tables["users"].edit_row(0, ["one", date(2000, 1, 1)])
+        self.assertEqual(db.tables["users"].rows, [[1, date(2000, 1, 1)]])
+        with self.assertRaises(DatabaseError):
+            db.tables["users"].edit_row(5, [2, date(2000, 1, 1)])
+        with self.assertRaises(TableError):
+            db.drop_table("missing")
+        with self.assertRaises(SchemaError):
+            db.tables["users"].create_index("missing")
+
+    def test_profiling_counts_operations_and_bytes(self):
+        original = Table.__dict__["add_row"]
+        metrics.registry.reset()
+        metrics.enable()
+        try:
+            self.assertIsNot(Table.__dict__["add_row"], original)
+            directory = tempfile.mkdtemp()
+            db = Database("TestDB")
+            db.create_table("users", [("id", int), ("dob", date)])
+            db.create_table("old", [("id", int), ("dob", date)])
+            for i in range(5):
+                db.tables["users"].add_row([i, date(2000, 1, i + 1)])
+            with self.assertRaises(ValidationError):
+                db.tables["users"].add_row(["x", date(2000, 1, 1)])
+            db.tables["users"].difference(db.tables["old"])
+            paths = {compression: os.path.join(directory, f"stats.{compression}") for compression in (None, "zlib")}
+            for compression, path in paths.items():
+                db.save_to_disk(path, compression)
+            Database.load_from_disk(paths[None]).tables["users"]
+            json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.json")
+            Database.load_from_disk(json_path)
+
+            stats = db.stats()
+            operations = stats["operations"]
+            self.assertTrue(stats["profiling"])
+            self.assertEqual(stats["tables"]["users"]["rows"], 5)
+            self.assertEqual(operations["Table.add_row"]["count"], 6)
+            self.assertEqual(operations["Table.add_row"]["errors"], 1)
+            self.assertEqual(operations["Table.add_row"]["buckets"][-1], ["+Inf", 6])
+            self.assertEqual(operations["Table.difference"]["count"], 1)
+            self.assertEqual(operations["Database.load_from_disk"]["count"], 2)
+            self.assertEqual(stats["bytes_written"]["Database.save_to_disk"],
+                             sum(os.path.getsize(path) for path in paths.values()))
+            self.assertEqual(stats["bytes_read"]["Database.load_from_disk"], os.path.getsize(json_path))
+            self.assertGreater(stats["bytes_read"]["_PendingTable._decode"], 0)
+
+            db.dump_stats(os.path.join(directory, "stats.prom"))
+            with open(os.path.join(directory, "stats.prom")) as f:
+                text = f.read()
+            self.assertIn('itlab_operation_seconds_count{operation="Table.add_row"} 6', text)
+            self.assertIn('itlab_operation_errors_total{operation="Table.add_row"} 1', text)
+            self.assertIn('itlab_table_rows{database="TestDB",table="users"} 5', text)
+            db.dump_stats(os.path.join(directory, "stats.json"))
+            with open(os.path.join(directory, "stats.json")) as f:
+                self.assertEqual(json.load(f)["operations"]["Table.add_row"]["count"], 6)
+        finally:
+            metrics.disable()
+        # Вимкнене профілювання повертає оригінальні методи
+        self.assertIs(Table.__dict__["add_row"], original)
+        self.assertFalse(Database("TestDB").stats()["profiling"])
+
+    def test_core_imports_headless_within_budget(self):
+        code = ("import sys, time; start = time.perf_counter(); import task, cli; "
+                "print(time.perf_counter() - start, 'tkinter' in sys.modules)")
+        directory = os.path.dirname(os.path.abspath(__file__))
+        elapsed, tkinter_loaded = subprocess.run([sys.executable, "-c", code], cwd=directory, check=True,
+                                                 capture_output=True, text=True).stdout.split()
+        self.assertEqual(tkinter_loaded, "False")
+        self.assertLess(float(elapsed), IMPORT_TIME_BUDGET)
+
+    def test_command_line_interface(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "cli.db")
+        source = os.path.join(directory, "users.csv")
+        with open(source, "w") as f:
+            f.write("id,name,dob\n1,Ann,1990-05-15\n2,Bob,1991-01-01\nx,Bad,2000-01-01\n3,Cid,1985-03-03\n")
+
+        def run(*args):
+            out, err = io.StringIO(), io.StringIO()
+            with redirect_stdout(out), redirect_stderr(err):
+                code = cli.main(list(args))
+            return code, out.getvalue(), err.getvalue()
+
+        self.assertEqual(run("create-table", path, "users", "id:int", "name:string", "dob:date")[0], 0)
+        self.assertEqual(run("create-table", path, "old", "id:int", "name:string", "dob:date")[0], 0)
+        code, out, err = run("import", path, "users", source)
+        self.assertEqual((code, out.strip()), (1, "Loaded 3 rows, rejected 1."))
+        self.assertIn("line 4", err)
+
+        code, out, _ = run("query", path, "users", "--where", "dob < 1991-01-01", "--select", "name",
+                           "--order-by", "name", "--desc")
+        self.assertEqual(out.split(), ["name", "Cid", "Ann"])
+        self.assertEqual(run("diff", path, "users", "old")[1].split()[1:], ["1,Ann,1990-05-15", "2,Bob,1991-01-01",
+                                                                            "3,Cid,1985-03-03"])
+        self.assertEqual(run("compact", path, "--compression", "zlib")[0], 0)
+        self.assertIn("users\trows=3", run("stats", path)[1])
+        profile = os.path.join(directory, "profile.prom")
+        code, out, _ = run("--profile", profile, "stats", path, "--json")
+        self.assertEqual(json.loads(out)["tables"]["users"]["rows"], 3)
+        with open(profile) as f:
+            self.assertIn('itlab_operation_seconds_count{operation="Database.load_from_disk"} 1', f.read())
+        code, _, err = run("query", path, "missing")
+        self.assertEqual((code, err.strip()), (1, "error: Table 'missing' does not exist."))
+
+    def test_benchmark_suite_and_regression_check(self):
+        results = bench.bench_suite([300], operations=20, deletes=5, queries=5, verbose=False)
+        for name in ("add_row", "edit_row", "delete_row", "difference", "save_binary", "load_pickle",
+                     "peak_memory_load_binary", "query_lookup", "query_group"):
+            self.assertGreater(results[f"{name}/300"]["value"], 0)
+        path = os.path.join(tempfile.mkdtemp(), "bench.json")
+        bench.write_results(results, path)
+        with open(path) as f:
+            baseline = json.load(f)["results"]
+        self.assertEqual(bench.compare_results(baseline, results), [])
+
+        # Пропускна здатність, що впала, і час, що виріс, більше ніж на поріг — регресії
+        current = json.loads(json.dumps(baseline))
+        current["add_row/300"]["value"] *= 0.5
+        current["difference/300"]["value"] *= 1.1
+        current["load_pickle/300"]["value"] *= 2
+        self.assertEqual([name for name, *_ in bench.compare_results(baseline, current, threshold=0.2)],
+                         ["add_row/300", "load_pickle/300"])
+
+    def test_network_server_pipelining_and_streams(self):
+        async def scenario(address):
+            db = Database("NetDB")
+            db.create_table("users", [("id", int), ("name", str), ("dob", date)])
+            db.create_table("banned", [("id", int), ("name", str), ("dob", date)])
+            db.tables["banned"].add_row([2, "user2", date(1990, 1, 3)])
+            database_server = server.DatabaseServer(db, chunk_rows=5)
+            if isinstance(address, str):
+                await database_server.start(path=address)
+                options = {"path": address}
+            else:
+                await database_server.start(port=0)
+                options = {"port": database_server.address[1]}
+            try:
+                async with client.Client(pool_size=1, stream_buffer=1, **options) as db_client:
+                    self.assertEqual(await db_client.ping(), "pong")
+                    # Конвеєрні add_row з одного з'єднання виконуються пачкою і по порядку
+                    ids = await asyncio.gather(*(db_client.add_row("users", [i, f"user{i}", f"1990-01-{i + 1:02}"])
+                                                 for i in range(20)))
+                    self.assertEqual(ids, list(range(ids[0], ids[0] + 20)))
+                    self.assertEqual(len(db_client.connections), 1)
+                    self.assertEqual(len(await db_client.add_rows("users", [[20, "x", "2000-01-01"]] * 3)), 3)
+                    self.assertEqual(await db_client.get_row("users", ids[2]), [2, "user2", "1990-01-03"])
+
+                    with self.assertRaises(TableError):
+                        await db_client.add_row("missing", [1])
+                    with self.assertRaises(ValidationError):
+                        await db_client.add_row("users", [1, "Ann", "not a date"])
+                    with self.assertRaises(ValidationError):
+                        await db_client.add_rows("users", [[1, "Ann", "2000-01-01"], [2]])
+                    self.assertEqual(len(db.tables["users"].rows), 23)
+
+                    rows = await db_client.query("users", where=[["id", "<", 3]], select=["name"],
+                                                 order_by=["id"], descending=True)
+                    self.assertEqual(rows, [["user2"], ["user1"], ["user0"]])
+                    # Перерваний потік не заважає наступним запитам того ж з'єднання
+                    async for row in db_client.iter_query("users"):
+                        break
+                    self.assertEqual(len(await db_client.query("users", limit=12)), 12)
+                    difference = await db_client.difference("users", "banned")
+                    self.assertEqual(len(difference), 22)
+                    self.assertEqual(len(await db_client.difference("users", "banned")), 22)
+                    stats = await db_client.stats()
+                    self.assertGreaterEqual(stats["cache"]["hits"], 1)
+                    self.assertEqual(stats["server"]["connections"], 1)
+            finally:
+                await database_server.close()
+
+        asyncio.run(scenario(("127.0.0.1", 0)))
+        if hasattr(socket, "AF_UNIX"):
+            asyncio.run(scenario(os.path.join(tempfile.mkdtemp(), "db.sock")))
+
+    def test_network_server_reports_errors_inside_add_row_batches(self):
+        async def scenario():
+            db = Database("NetDB")
+            db.create_table("numbers", [("id", int)], storage="columnar")
+            database_server = server.DatabaseServer(db)
+            await database_server.start(port=0)
+            try:
+                async with client.Client(port=database_server.address[1], pool_size=1) as db_client:
+                    values = [1, 2, 2 ** 70, 4]
+                    results = await asyncio.gather(*(db_client.add_row("numbers", [value]) for value in values),
+                                                   return_exceptions=True)
+                    self.assertEqual(results[:2] + results[3:], [0, 1, 2])
+                    self.assertIsInstance(results[2], ValidationError)
+                    # Запити пачки скасовуються окремо, як і надіслані поодинці
+                    await db_client.undo()
+                    self.assertEqual(db.tables["numbers"].row_ids(), [0, 1])
+
+                    # Значення, яке відхиляє лише сховище, не обриває з'єднання і не додається частково
+                    table = db.tables["numbers"]
+                    table._in_range = lambda rows: True
+                    table._validate = lambda row: None
+                    results = await asyncio.gather(*(db_client.add_row("numbers", [value]) for value in values),
+                                                   return_exceptions=True)
+                    self.assertEqual(results[:2] + results[3:], [3, 4, 5])
+                    self.assertIsInstance(results[2], ValidationError)
+                    self.assertEqual(await db_client.ping(), "pong")
+                    self.assertEqual(len(db_client.connections), 1)
+                    await db_client.undo()
+                self.assertEqual(list(table.rows), [[1], [2]] * 2)
+                self.assertEqual(table.row_ids(), [0, 1, 3, 4])
+            finally:
+                await database_server.close()
+
+        asyncio.run(scenario())
+
+    def test_network_server_streams_large_results_lazily(self):
+        db = Database("NetDB")
+        db.create_table("numbers", [("id", int)], storage="columnar")
+        table = db.tables["numbers"]
+        table.add_rows([i] for i in range(3 * server.CACHED_ROWS))
+        produced = []
+        iter_rows = table.iter_rows
+        table.iter_rows = lambda: (produced.append(row) or row for row in iter_rows())
+        database_server = server.DatabaseServer(db, chunk_rows=100)
+
+        class Writer:
+            def __init__(self, change_table):
+                self.change_table = change_table
+                self.rows = []
+                self.ahead = []  # Скільки рядків обчислено, але ще не надіслано, на кожній частині
+
+            def write(self, data):
+                self.rows += json.loads(data)["rows"]
+
+            async def drain(self):
+                self.ahead.append(len(produced) - len(self.rows))
+                if self.change_table:
+                    # Зміни посеред передачі не потрапляють у вже розпочатий результат
+                    table.add_row([-1])
+                    table.delete_row(0)
+
+        result = database_server.execute({"id": 1, "op": "query", "table": "numbers"})
+        writer = Writer(True)
+        asyncio.run(database_server.send_rows(writer, 1, result))
+        self.assertEqual(writer.rows, [[i] for i in range(3 * server.CACHED_ROWS)])
+        self.assertLessEqual(max(writer.ahead), server.CACHED_ROWS + 1)
+        self.assertLessEqual(max(writer.ahead[-10:]), 101)
+        self.assertEqual(len(db.cache.entries), 0)
+
+        # Короткий результат береться з кешу
+        for _ in range(2):
+            writer = Writer(False)
+            request = {"id": 2, "op": "query", "table": "numbers", "limit": 5}
+            asyncio.run(database_server.send_rows(writer, 2, database_server.execute(request)))
+        self.assertEqual(len(writer.rows), 5)
+        self.assertEqual(db.cache.hits, 1)
+
+    def test_generators_cover_every_column_type(self):
+        schema = [(column.name, column) for column in bench.GENERATORS]
+        table = Table("generated", schema, storage="columnar")
+        table.add_rows(bench.generate_rows(50, schema=schema))
+        self.assertEqual(len(table.rows), 50)
+
+if __name__ == '__main__':
+    unittest.main()
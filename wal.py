@@ -0,0 +1,359 @@
+import json
+import os
+import struct
+import zlib
+from array import array
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+from itertools import chain
+
+from errors import DatabaseError, StorageError
+from task import DATE, DATE_INTERVAL, INDEX_KINDS, DateInterval, Table, _interval, column_type
+
+
+# Заголовок запису журналу: довжина та контрольна сума CRC32 корисного навантаження
+RECORD_HEADER = struct.Struct("<II")
+
+# Скільки аргументів події потрапляє в запис (старі дані рядка для відтворення не потрібні).
+# Журнал починається записом generation — поколінням знімка, який він доповнює. Зміни
+# транзакції записуються одним записом transaction зі списком пар [операція, аргументи].
+RECORD_ARITY = {
+    "generation": 1,
+    "create_table": 3,
+    "drop_table": 1,
+    "restore_table": 2,
+    "add_row": 2,
+    "add_rows": 2,
+    "restore_row": 3,
+    "edit_row": 3,
+    "delete_row": 2,
+    "create_index": 3,
+    "drop_index": 2,
+}
+
+
+# Запис журналу — JSON [операція, аргументи]. Значення рядків записуються без типів:
+# дата — номером дня, інтервал — парою номерів днів; типи відновлюються за схемою
+# таблиці, яку запис create_table зберігає з тегами типів колонок.
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
+_DECODER = json.JSONDecoder()
+
+# Позиція рядка серед аргументів операції
+ROW_ARGUMENT = {"add_row": 1, "restore_row": 2, "edit_row": 2}
+
+_PLAIN = {
+    date: date.toordinal,
+    DateInterval: lambda interval: (interval.start_date.toordinal(), interval.end_date.toordinal()),
+}
+def _typed_interval(pair, fromordinal=date.fromordinal):
+    # Значення в журналі вже пройшли перевірку під час запису, тому інтервал створюється без перевірок
+    return _interval(fromordinal(pair[0]), fromordinal(pair[1]))
+
+
+_TYPED = {
+    DATE: date.fromordinal,
+    DATE_INTERVAL: _typed_interval,
+}
+
+
+def _same(value):
+    return value
+
+
+def _plain_row(row):
+    if _PLAIN.keys().isdisjoint(map(type, row)):
+        return row
+    return [_PLAIN.get(type(value), _same)(value) for value in row]
+
+
+@lru_cache(maxsize=64)
+def _converters(column_types):
+    """Пари (позиція, перетворювач) лише для колонок дат та інтервалів, решта значень уже має потрібний тип"""
+    return [(position, _TYPED[column]) for position, column in enumerate(column_types) if column in _TYPED]
+
+
+def _typed_rows(column_types, rows):
+    """Відновлює типи значень щойно декодованих рядків (списки змінюються на місці)"""
+    converters = _converters(tuple(column_types))
+    rows = [row if type(row) is list else list(row) for row in rows]
+    for row in rows:
+        for position, convert in converters:
+            row[position] = convert(row[position])
+    return rows
+
+
+def _table_state(table):
+    rows, ids = table.compacted()
+    return {
+        "name": table.name,
+        "schema": [[field_name, column.name] for (field_name, _), column in zip(table.schema, table.column_types)],
+        "storage": table.storage,
+        "rows": list(map(_plain_row, rows)),
+        "ids": ids.tolist(),
+        "next_id": table._next_id,
+        "indexes": [[column, index.kind] for column, index in table.indexes.items()],
+    }
+
+
+def _table_from_state(state):
+    schema = [(field_name, column_type(tag)) for field_name, tag in state["schema"]]
+    table = Table(state["name"], schema, state["storage"])
+    table.rows.extend(_typed_rows(table.column_types, state["rows"]))
+    table._sync_ids()
+    table._ids = array("q", state["ids"])
+    table._next_id = state["next_id"]
+    for column, kind in state["indexes"]:
+        table.indexes[column] = INDEX_KINDS[kind](column, table._field_position(column))
+    return table
+
+
+def _plain_args(operation, args):
+    """Аргументи події у вигляді, який записується в JSON"""
+    if operation == "create_table":
+        table_name, schema, storage = args
+        return [table_name, [[field_name, column_type(field_type).name] for field_name, field_type in schema], storage]
+    if operation == "restore_table":
+        return [args[0], _table_state(args[1])]
+    if operation == "add_rows":
+        return [args[0], list(map(_plain_row, args[1]))]
+    args = list(args)
+    if operation in ROW_ARGUMENT:
+        args[ROW_ARGUMENT[operation]] = _plain_row(args[ROW_ARGUMENT[operation]])
+    return args
+
+
+def _payload(operation, args):
+    return _ENCODER.encode([operation, _plain_args(operation, args[:RECORD_ARITY[operation]])])
+
+
+def _frame(payload):
+    payload = payload.encode("utf-8")
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_record(operation, args):
+    """Кодує одну зміну бази у запис журналу"""
+    return _frame(_payload(operation, args))
+
+
+def encode_transaction(payloads):
+    """Кодує зміни транзакції (див. _payload) одним записом журналу"""
+    return _frame(f'["transaction",[{",".join(payloads)}]]')
+
+
+def _check_record(operation, args):
+    if operation == "transaction" and isinstance(args, list):
+        for change in args:
+            if not isinstance(change, list) or len(change) != 2 or change[0] in ("generation", "transaction"):
+                raise StorageError("Malformed log record for operation 'transaction'.")
+            _check_record(*change)
+    elif not isinstance(args, list) or RECORD_ARITY.get(operation) != len(args):
+        raise StorageError(f"Malformed log record for operation '{operation}'.")
+
+
+def decode_record(payload):
+    """Повертає (операція, аргументи) запису журналу; значення рядків ще без типів"""
+    if payload[:1] == b"\x80":
+        # Журнали попередніх версій записувались через pickle
+        from dbformat import legacy_loads
+
+        operation, args = legacy_loads(payload)
+        return operation, _plain_args(operation, args)
+    text = payload.decode("utf-8")
+    try:
+        # Запис пишеться без пробілів навколо JSON, тож досить raw_decode і перевірки кінця
+        (operation, args), end = _DECODER.raw_decode(text)
+    except (ValueError, TypeError) as e:
+        raise StorageError(f"Malformed log record. {e}") from e
+    if end != len(text):
+        raise StorageError("Malformed log record: unexpected data after the record.")
+    _check_record(operation, args)
+    return operation, args
+
+
+def read_records(f):
+    """Генерує пари (операція, аргументи, зсув кінця запису) до першого пошкодженого запису"""
+    offset = f.tell()
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = f.read(length)
+        # Неповний або пошкоджений запис означає обірваний під час збою хвіст журналу
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset += RECORD_HEADER.size + length
+        operation, args = decode_record(payload)
+        yield operation, args, offset
+
+
+def _generation(record):
+    """Покоління з першого запису журналу; журнали попередніх версій не мають запису покоління"""
+    if record is None or record[0] != "generation":
+        return 0
+    generation = record[1][0]
+    if not isinstance(generation, int):
+        raise StorageError("Log generation must be an integer.")
+    return generation
+
+
+def log_generation(log_filename):
+    """Покоління знімка, який доповнює журнал"""
+    with open(log_filename, "rb") as f:
+        return _generation(next(read_records(f), None))
+
+
+def apply_record(database, operation, args):
+    """Застосовує запис журналу до бази"""
+    if operation == "transaction":
+        for change in args:
+            apply_record(database, *change)
+    elif operation == "create_table":
+        table_name, schema, storage = args
+        database.create_table(table_name, [(field_name, column_type(tag)) for field_name, tag in schema], storage)
+    elif operation == "drop_table":
+        database.drop_table(*args)
+    elif operation == "restore_table":
+        database.restore_table(_table_from_state(args[1]))
+    else:
+        table_name, *row_args = args
+        table = database.tables[table_name]
+        if operation == "add_rows":
+            row_args[0] = _typed_rows(table.column_types, row_args[0])
+        elif operation in ROW_ARGUMENT:
+            position = ROW_ARGUMENT[operation] - 1
+            row_args[position] = _typed_rows(table.column_types, [row_args[position]])[0]
+        if operation in ("edit_row", "delete_row"):
+            # Зміни існуючих рядків записуються за їхніми ідентифікаторами
+            getattr(table, operation)(*row_args, by_id=True)
+        else:
+            getattr(table, operation)(*row_args)
+
+
+class WriteAheadLog:
+    """Журнал попереднього запису: зміни дописуються у файл замість перезапису всієї бази"""
+
+    def __init__(self, database, filename, group_commit=64, checkpoint_interval=10_000):
+        if group_commit < 1 or checkpoint_interval < 1:
+            raise DatabaseError("Group commit size and checkpoint interval must be positive.")
+        self.database = database
+        self.filename = filename
+        self.log_filename = filename + ".wal"
+        self.group_commit = group_commit
+        self.checkpoint_interval = checkpoint_interval
+        self.pending = 0  # Записи, ще не синхронізовані з диском
+        self.records = 0  # Записи з моменту останньої контрольної точки
+        self.transaction = None  # Закодовані зміни транзакції, що фіксується (див. commit)
+        self.file = open(self.log_filename, "ab")
+        self.started = self.file.tell() > 0  # Чи записано вже покоління знімка на початку журналу
+        if self.started and log_generation(self.log_filename) != database.log_generation:
+            # Журнал іншого покоління не доповнює поточний знімок (див. replay)
+            self._start()
+
+    def record(self, operation, args):
+        """Дописує зміну в журнал (підписник на зміни бази)"""
+        if self.transaction is not None:
+            self.transaction.append(_payload(operation, args))
+            return
+        self._write(encode_record(operation, args), 1)
+        if self.records >= self.checkpoint_interval:
+            self.checkpoint()
+        elif self.pending >= self.group_commit:
+            self.sync()
+
+    def _write(self, record, changes):
+        if not self.started:
+            self.file.write(encode_record("generation", [self.database.log_generation]))
+            self.started = True
+        self.file.write(record)
+        self.pending += 1
+        self.records += changes
+
+    @contextmanager
+    def commit(self):
+        """Зміни всередині блоку — одна транзакція; після блоку журнал синхронізується.
+
+        Зміни записуються одним записом з однією контрольною сумою, тож після збою
+        посеред запису транзакція відкидається повністю, а не відтворюється частково.
+        Контрольна точка можлива лише після блоку: зміни транзакції опубліковано ще
+        до запису в журнал, і знімок посеред блоку вже містив би їх усі. Вкладений
+        блок стає частиною зовнішнього.
+        """
+        if self.transaction is not None:
+            yield
+            return
+        self.transaction = []
+        try:
+            yield
+        finally:
+            payloads, self.transaction = self.transaction, None
+            if len(payloads) == 1:
+                self._write(_frame(payloads[0]), 1)
+            elif payloads:
+                self._write(encode_transaction(payloads), len(payloads))
+        if self.records >= self.checkpoint_interval:
+            self.checkpoint()
+        else:
+            self.sync()
+
+    def sync(self):
+        """Скидає накопичені записи на диск"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def _start(self):
+        """Очищає журнал; покоління знімка запишеться перед першим новим записом"""
+        self.file.truncate(0)
+        self.file.seek(0)
+        self.started = False
+
+    def checkpoint(self):
+        """Записує новий знімок бази і очищає журнал.
+
+        Знімок нового покоління замінює файл раніше, ніж очищається журнал; якщо між
+        цими кроками стається збій, журнал старого покоління під час відтворення пропускається.
+        """
+        self.sync()
+        self.database.write_snapshot(self.filename)
+        self._start()
+        self.sync()
+        self.records = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    @staticmethod
+    def replay(database, log_filename):
+        """Відтворює журнал поверх знімка; обірваний хвіст журналу відкидається.
+
+        Журнал попереднього покоління вже врахований у знімку і відкидається повністю,
+        а журнал новішого покоління, ніж знімок, не може бути до нього застосований.
+        """
+        if not os.path.exists(log_filename):
+            return 0
+        count = 0
+        valid_length = 0
+        with open(log_filename, "rb") as f:
+            records = read_records(f)
+            first = next(records, None)
+            generation = _generation(first)
+            if first is not None and first[0] == "generation":
+                valid_length = first[2]
+            elif first is not None:
+                records = chain([first], records)
+            if generation > database.log_generation:
+                raise StorageError("Write-ahead log is newer than the database snapshot.")
+            if generation < database.log_generation:
+                valid_length = 0
+                records = ()
+            for operation, args, valid_length in records:
+                apply_record(database, operation, args)
+                count += 1
+        if valid_length < os.path.getsize(log_filename):
+            with open(log_filename, "r+b") as f:
+                f.truncate(valid_length)
+        return count